@@ -1,17 +1,12 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
-def normalize_id(id_value):
-    """规范化用户ID，确保格式一致"""
-    try:
-        id_str = str(id_value).strip()
-        if id_str == '-2147483648':
-            return id_str
-        return str(int(float(id_str)))
-    except:
-        return str(id_value).strip()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'create_ego_network'))
+from network_loader import normalize_ids
+from versioned_dataset import VersionedDataset
 
 def ensure_dir(directory):
     """确保目录存在，如果不存在则创建"""
@@ -37,31 +32,26 @@ class AdvancedAnomalyDetector:
             print(f"错误: 未找到文件 {merged_data_path}")
             return False
         
-        self.merged_df = pd.read_csv(merged_data_path)
-        self.merged_df['user_id'] = self.merged_df['user_id'].apply(normalize_id)
+        self.merged_df = pd.read_csv(merged_data_path, dtype={'user_id': str})
+        self.merged_df['user_id'] = normalize_ids(self.merged_df['user_id']).values
         
-        # 🔥 修改：使用新的边数据路径
-        edges_path = 'C:/Tengfei/data/data/domain_network3/user_3855570307/edges.csv'
-        if not os.path.exists(edges_path):
-            print(f"错误: 未找到文件 {edges_path}")
+        # 🔥 修改：使用新的边数据路径（版本化网络目录，读取时应用清洗、补边等增量）
+        network_dir = 'C:/Tengfei/data/data/domain_network3/user_3855570307'
+        dataset = VersionedDataset(network_dir)
+        if not os.path.exists(dataset.edges_file):
+            print(f"错误: 未找到文件 {dataset.edges_file}")
             return False
+        if dataset.versions():
+            print(f"📚 数据版本: {dataset.current_version}（共 {dataset.latest_version} 个版本）")
             
-        self.edges_df = pd.read_csv(edges_path)
-        self.edges_df['source'] = self.edges_df['source'].apply(normalize_id)
-        self.edges_df['target'] = self.edges_df['target'].apply(normalize_id)
+        self.edges_df = dataset.edges_frame()
         
         # 创建流行度映射
         self.popularity_map = dict(zip(self.merged_df['user_id'], self.merged_df['avg_popularity']))
         
         # 预处理邻居关系（用于方案三）
         print("正在预处理邻居关系...")
-        self.user_neighbors = {}
-        for _, row in self.edges_df.iterrows():
-            source = row['source']
-            target = row['target']
-            if source not in self.user_neighbors:
-                self.user_neighbors[source] = set()
-            self.user_neighbors[source].add(target)
+        self.user_neighbors = self.edges_df.groupby('source', sort=False)['target'].agg(set).to_dict()
         
         print(f"数据加载完成: {len(self.merged_df)} 个可分析用户")
         
@@ -0,0 +1,85 @@
+import numpy as np
+from scipy import sparse
+
+from parallel_runner import estimate_ego_costs
+
+# 分批做稀疏矩阵乘法时，每批目标行的估计代价（二跳规模之和）上限，用于控制中间结果的内存
+BATCH_COST = 20_000_000
+
+
+def _simple_adjacency(G):
+    """去掉自环的0/1稀疏邻接矩阵（CSR）；与eg的聚类系数一致，自环不计入"""
+    A = G.adjacency_matrix()
+    A.setdiag(0)
+    A.eliminate_zeros()
+    return A
+
+
+def _row_batches(rows, costs, batch_cost=BATCH_COST):
+    """按估计代价把目标行切成若干批"""
+    batches, current, current_cost = [], [], 0
+    for row, cost in zip(rows, costs):
+        if current and current_cost + cost > batch_cost:
+            batches.append(np.asarray(current))
+            current, current_cost = [], 0
+        current.append(row)
+        current_cost += cost
+    if current:
+        batches.append(np.asarray(current))
+    return batches
+
+
+def batch_clustering(G, users, batch_cost=BATCH_COST):
+    """在全图上一次性计算所有目标用户的局部聚类系数，返回 {user_id: 值}
+
+    口径与 eg_f.clustering(二跳网络, 中心) 一致（有向图，Fagiolo定义，忽略自环）：
+      S = A + Aᵀ，有向三角形数 t_i = (S³)_ii = Σ_j (S²)_ij · S_ij
+      c_i = t_i / (2 · (d_tot(d_tot - 1) - 2 d_bi))，t_i = 0 时为0
+    中心的聚类系数只依赖其一跳邻居之间的边，这些边都在二跳网络中，因此与逐个ego计算的结果相同。
+    只对目标行计算 S[rows] @ S，并按二跳规模估计分批以控制内存。
+    """
+    idx = G.indices_of(users)
+    present = idx >= 0
+    rows = idx[present].astype(np.int64)
+
+    A = _simple_adjacency(G)
+    S = (A + A.T).tocsr()
+    d_tot = np.asarray(A.sum(axis=1)).ravel() + np.asarray(A.sum(axis=0)).ravel()
+    d_bi = np.asarray(A.multiply(A.T).sum(axis=1)).ravel()
+
+    triangles = np.zeros(len(rows))
+    costs = estimate_ego_costs(G, G.node_ids[rows]) if len(rows) else []
+    offset = 0
+    for batch in _row_batches(rows, costs, batch_cost):
+        S_rows = S[batch]
+        triangles[offset:offset + len(batch)] = np.asarray((S_rows @ S).multiply(S_rows).sum(axis=1)).ravel()
+        offset += len(batch)
+
+    denom = 2.0 * (d_tot[rows] * (d_tot[rows] - 1) - 2 * d_bi[rows])
+    values = np.divide(triangles, denom, out=np.zeros(len(rows)), where=triangles > 0)
+    return dict(zip(np.asarray(users, dtype=object)[present].tolist(), values.tolist()))
+
+
+def batch_average_neighbor_degree(G, users):
+    """一次稀疏矩阵乘法计算所有目标用户的邻居平均度，返回 {列名: {user_id: 值}}
+
+    邻居为出边邻居（含自环），与calculate_average_neighbor_degree口径一致：
+      average_nearest_neighbor_degree：邻居在二跳网络中的出度。邻居的出边邻居离中心不超过2跳，
+        都在二跳网络内，因此等于邻居在全图中的出度；
+      average_nearest_neighbor_global_degree：邻居在全图中的总度数（出度+入度）。
+    没有出边邻居的用户两列均为0。
+    """
+    idx = G.indices_of(users)
+    present = idx >= 0
+    rows = idx[present].astype(np.int64)
+
+    degree_columns = np.column_stack([G.out_degrees, G.degrees]).astype(np.float64)
+    sums = G.adjacency_matrix()[rows] @ degree_columns
+    counts = G.out_degrees[rows].astype(np.float64)[:, None]
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    user_ids = np.asarray(users, dtype=object)[present].tolist()
+    return {
+        'average_nearest_neighbor_degree': dict(zip(user_ids, means[:, 0].tolist())),
+        'average_nearest_neighbor_global_degree': dict(zip(user_ids, means[:, 1].tolist())),
+    }
@@ -0,0 +1,209 @@
+import os
+import sys
+import traceback
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import create3
+from create3 import (ConfigError, METRIC_NAMES, EXIT_OK, EXIT_ERROR, EXIT_CONFIG, EXIT_INTERRUPTED,
+                     prepare_topic, calibrate_topic, print_eta, make_result_handler, compute_topic_sequential,
+                     record_run_results, finalize_topic, print_selected_metrics, write_run_summary,
+                     get_user_selected_metrics)
+from parallel_runner import ParallelJob, run_parallel_jobs
+
+# 多话题批量运行的配置：单话题的base_dir/output_dir由话题根目录和输出根目录推出
+DEFAULT_BATCH_CONFIG = dict(
+    create3.DEFAULT_CONFIG,
+    topics_root='C:/Tengfei/data/data/topic_networks',
+    output_root='C:/Tengfei/data/results',
+    topics=None,                     # 只运行这些话题（目录名，如 topic_孙颖莎）；None为全部
+)
+
+COMBINED_TABLE = 'combined_metrics_popularity.csv'
+
+
+def discover_topics(topics_root, names=None):
+    """找出话题根目录下所有包含edges.csv和popularity.csv的topic_*目录，返回 [(话题名, 目录)]"""
+    if not os.path.isdir(topics_root):
+        raise ConfigError(f"话题根目录不存在: {topics_root}")
+    topics = []
+    for name in sorted(os.listdir(topics_root)):
+        path = os.path.join(topics_root, name)
+        if not name.startswith('topic_') or not os.path.isdir(path):
+            continue
+        if names and name not in names:
+            continue
+        if os.path.exists(os.path.join(path, 'edges.csv')) and os.path.exists(os.path.join(path, 'popularity.csv')):
+            topics.append((name, path))
+        else:
+            print(f"⚠️ 跳过 {name}：缺少edges.csv或popularity.csv")
+    missing = set(names or []) - {name for name, _ in topics}
+    if missing:
+        raise ConfigError(f"未找到指定的话题: {sorted(missing)}")
+    return topics
+
+
+def combine_topic_tables(merged_outputs, output_path):
+    """把各话题的合并结果（CSV或Parquet）合并为一张跨话题总表CSV（增加topic列），返回行数"""
+    frames = []
+    for topic, path in merged_outputs.items():
+        if path and os.path.exists(path):
+            if path.endswith('.parquet'):
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_csv(path, dtype={'user_id': str})
+            df.insert(0, 'topic', topic)
+            frames.append(df)
+    if not frames:
+        return 0
+    combined = pd.concat(frames, ignore_index=True, sort=False)
+    combined.to_csv(output_path, index=False)
+    print(f"跨话题总表已保存到: {output_path}（{len(combined)} 行，{len(frames)} 个话题）")
+    return len(combined)
+
+
+def build_batch_arg_parser():
+    parser = create3.build_arg_parser()
+    parser.description = "对topic_networks下的多个话题网络批量计算二跳网络指标，所有话题共用一个进程池。"
+    parser.add_argument('--topics-root', help="话题网络根目录（其下为topic_*目录）")
+    parser.add_argument('--output-root', help="输出根目录，每个话题写到 <output-root>/<话题>_metrics")
+    parser.add_argument('--topics', nargs='+', help="只运行这些话题（目录名）")
+    return parser
+
+
+def run_batch(config, summary):
+    """准备所有话题 -> 共用进程池计算 -> 逐话题合并输出 -> 跨话题总表；返回是否有话题失败"""
+    topics = discover_topics(config['topics_root'], config['topics'])
+    if not topics:
+        raise ConfigError(f"{config['topics_root']} 下没有可用的话题目录")
+    print(f"发现 {len(topics)} 个话题: {', '.join(name for name, _ in topics)}")
+
+    selected_metrics = config['metrics']
+    if selected_metrics is None:
+        selected_metrics = get_user_selected_metrics()
+    if not selected_metrics:
+        raise ConfigError("未选择任何指标")
+    summary['selected_metrics'] = [METRIC_NAMES[num] for num in selected_metrics]
+    print_selected_metrics(selected_metrics)
+
+    # 逐个话题加载网络、确定待计算用户并批量预计算局部指标
+    runs = []
+    topic_summaries = summary.setdefault('topics', {})
+    for name, path in topics:
+        print(f"\n{'=' * 60}\n准备话题: {name}\n{'=' * 60}")
+        topic_config = dict(config, base_dir=path,
+                            output_dir=os.path.join(config['output_root'], f'{name}_metrics'))
+        topic_summary = topic_summaries.setdefault(name, {'base_dir': path, 'output_dir': topic_config['output_dir']})
+        try:
+            runs.append((prepare_topic(topic_config, selected_metrics, topic_summary, name=name), topic_summary))
+        except ConfigError as e:
+            print(f"❌ 话题 {name} 准备失败: {e}")
+            topic_summary.update({'status': 'config_error', 'error': str(e)})
+
+    workers = config['workers']
+    pending = [(run, topic_summary) for run, topic_summary in runs if run.users]
+    try:
+        if pending:
+            # 在剩余工作量最大的话题上校准耗时模型，用于所有话题的整体预估
+            stage_start = datetime.now()
+            largest = max(pending, key=lambda item: float(np.sum(item[0].costs)))[0]
+            model = calibrate_topic(largest, config['calibration_users'])
+            print_eta(model, np.concatenate([run.costs for run, _ in pending]), workers)
+            summary['calibration_seconds'] = (datetime.now() - stage_start).total_seconds()
+
+            stage_start = datetime.now()
+            total_users = sum(len(run.users) for run, _ in pending)
+            if workers > 1:
+                print(f"\n并行模式：{len(pending)} 个话题的 {total_users} 个用户共用 {workers} 个工作进程")
+                jobs = [ParallelJob(run.name, run.G, run.users, run.user_args, make_result_handler(run), costs=run.costs)
+                        for run, _ in pending]
+                run_parallel_jobs(jobs, workers=workers, chunk_size=config['chunk_size'])
+            else:
+                for run, _ in pending:
+                    print(f"\n{'=' * 60}\n计算话题: {run.name}\n{'=' * 60}")
+                    compute_topic_sequential(run)
+            summary['compute_seconds'] = (datetime.now() - stage_start).total_seconds()
+    finally:
+        # 中断时也把各话题缓冲中的结果写入进度文件
+        for run, topic_summary in runs:
+            run.writer.flush()
+            record_run_results(run, topic_summary, config['metric_budgets'])
+
+    # 逐话题合并影响力、写出运行摘要，再生成跨话题总表
+    merged_outputs = {}
+    any_failed = any(s.get('status') == 'config_error' for s in topic_summaries.values())
+    for run, topic_summary in runs:
+        print(f"\n{'=' * 60}\n合并话题: {run.name}\n{'=' * 60}")
+        try:
+            merged_outputs[run.name] = finalize_topic(run, topic_summary)
+            topic_summary['status'] = 'success'
+        except Exception as e:
+            print(f"❌ 话题 {run.name} 合并失败: {e}")
+            topic_summary.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+            any_failed = True
+        any_failed = any_failed or topic_summary.get('users_failed', 0) > 0
+        write_run_summary(topic_summary, os.path.join(run.output_dir, 'run_summary.json'))
+
+    combined_output = os.path.join(config['output_root'], COMBINED_TABLE)
+    summary['combined_rows'] = combine_topic_tables(merged_outputs, combined_output)
+    summary['outputs'] = {'combined_metrics_popularity': combined_output}
+    return any_failed
+
+
+def main(argv=None):
+    """批量运行入口：返回退出码（0 全部成功，1 有话题失败或运行异常，2 配置错误，130 被中断）"""
+    try:
+        config, args = create3.load_run_config(argv, parser=build_batch_arg_parser(), defaults=DEFAULT_BATCH_CONFIG)
+    except ConfigError as e:
+        print(f"❌ 配置错误: {e}")
+        return EXIT_CONFIG
+    overrides = {'topics_root': args.topics_root, 'output_root': args.output_root, 'topics': args.topics}
+    config.update({k: v for k, v in overrides.items() if v is not None})
+
+    start_time = datetime.now()
+    print(f"开始批量分析时间: {start_time}")
+    summary = {
+        'status': 'running',
+        'started_at': start_time.isoformat(timespec='seconds'),
+        'topics_root': config['topics_root'],
+        'output_root': config['output_root'],
+        'workers': config['workers'],
+        'betweenness_mode': config['betweenness_mode'],
+        'resume': config['resume'],
+    }
+    exit_code = EXIT_OK
+    try:
+        any_failed = run_batch(config, summary)
+        summary['status'] = 'partial_failure' if any_failed else 'success'
+        exit_code = EXIT_ERROR if any_failed else EXIT_OK
+    except ConfigError as e:
+        print(f"❌ {e}")
+        summary.update({'status': 'config_error', 'error': str(e)})
+        exit_code = EXIT_CONFIG
+    except KeyboardInterrupt:
+        print(f"\n\n⚠️ 程序被用户中断 (Ctrl+C)")
+        print(f"📁 数据已保存到各话题的进度文件，可以稍后继续运行")
+        summary['status'] = 'interrupted'
+        exit_code = EXIT_INTERRUPTED
+    except Exception as e:
+        print(f"\n❌ 程序发生异常: {e}")
+        traceback.print_exc()
+        summary.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+        exit_code = EXIT_ERROR
+
+    end_time = datetime.now()
+    print(f"\n总耗时: {end_time - start_time}")
+    summary.update({'exit_code': exit_code, 'finished_at': end_time.isoformat(timespec='seconds'),
+                    'duration_seconds': (end_time - start_time).total_seconds()})
+    summary_path = config['summary_path'] or os.path.join(config['output_root'], 'batch_summary.json')
+    try:
+        write_run_summary(summary, summary_path)
+    except OSError as e:
+        print(f"⚠️ 运行摘要保存失败: {e}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
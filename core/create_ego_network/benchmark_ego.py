@@ -0,0 +1,69 @@
+import io
+import time
+import contextlib
+import numpy as np
+
+from csr_graph import CSRGraph
+import create3
+
+
+def build_benchmark_graph(n_nodes, avg_degree=8, seed=42):
+    """构造平均度固定的随机有向图：全图规模变大时，单个用户的二跳网络规模基本不变"""
+    rng = np.random.default_rng(seed)
+    n_edges = n_nodes * avg_degree
+    source = rng.integers(0, n_nodes, n_edges)
+    target = rng.integers(0, n_nodes, n_edges)
+    node_ids = np.array([str(i) for i in range(n_nodes)], dtype=object)
+    return CSRGraph(node_ids, source, target)
+
+
+def full_scan_counts(G, node):
+    """旧实现：遍历全图所有节点，用has_edge判断入/出邻居，O(|V|)"""
+    center = G.index_of(node)
+    in_count = out_count = 0
+    for u in range(G.number_of_nodes()):
+        if G.has_edge(u, center):
+            in_count += 1
+        if G.has_edge(center, u):
+            out_count += 1
+    return in_count, out_count
+
+
+def time_per_user(func, G, users):
+    """返回每个用户的平均耗时（毫秒），屏蔽create3中的逐用户打印"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for user in users:
+            func(G, user)
+    return (time.perf_counter() - start) / len(users) * 1000
+
+
+def main():
+    sizes = [10_000, 100_000, 1_000_000]
+    scan_limit = 100_000   # 旧的全图扫描在更大规模上太慢，不再测
+    sample_users = 20
+
+    print("=" * 72)
+    print("二跳网络构建耗时基准：每用户耗时应与全图规模无关")
+    print("=" * 72)
+    print(f"{'全图节点数':>12} {'平均ego节点数':>14} {'ego构建(ms)':>12} {'O(degree)计数(ms)':>18} {'全图扫描计数(ms)':>18}")
+
+    for n_nodes in sizes:
+        G = build_benchmark_graph(n_nodes)
+        users = [str(u) for u in np.random.default_rng(0).integers(0, n_nodes, sample_users)]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            ego_sizes = [create3.create_ego_network_fixed(G, u, radius=2)[0].number_of_nodes() for u in users]
+
+        ego_ms = time_per_user(lambda g, u: create3.create_ego_network_fixed(g, u, radius=2), G, users)
+        count_ms = time_per_user(lambda g, u: create3.count_center_neighbors(g, u, None), G, users)
+        if n_nodes <= scan_limit:
+            scan_ms = f"{time_per_user(full_scan_counts, G, users[:3]):18.2f}"
+        else:
+            scan_ms = f"{'(跳过)':>18}"
+
+        print(f"{n_nodes:>12,} {np.mean(ego_sizes):>14.1f} {ego_ms:>12.2f} {count_ms:>18.4f} {scan_ms}")
+
+
+if __name__ == "__main__":
+    main()
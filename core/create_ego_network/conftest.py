@@ -0,0 +1,20 @@
+import os
+import sys
+import random
+import easygraph as eg
+
+from csr_graph import CSRGraph
+
+# 清洗工具在crawler/fetch下，测试删除垃圾节点时直接调用
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'crawler', 'fetch'))
+
+
+def build_random_graphs(n_nodes=60, n_edges=240, seed=7):
+    """构造同一组随机边的eg.DiGraph与CSRGraph（含重复边和自环）"""
+    rng = random.Random(seed)
+    edges = [(str(rng.randrange(n_nodes)), str(rng.randrange(n_nodes))) for _ in range(n_edges)]
+    G = eg.DiGraph()
+    for s, t in edges:
+        G.add_edge(s, t)
+    C = CSRGraph.from_edge_lists([s for s, _ in edges], [t for _, t in edges])
+    return G, C
@@ -5,31 +5,62 @@ import pandas as pd
 import numpy as np
 import easygraph as eg
 import easygraph.functions as eg_f
-from scipy import linalg
-from datetime import datetime
-from collections import defaultdict, deque
-import signal
+from scipy import sparse
+from datetime import datetime, timedelta
+from collections import defaultdict, deque, namedtuple
+import shutil
 import sys
+import argparse
+import traceback
+from csr_graph import CSRGraph, EgoView
+from network_loader import normalize_id, normalize_ids, load_edges, load_popularity, edges_to_dataframe
+from spectral import sparse_spectral_radius
+from ego_community import (modularity as ego_modularity, louvain_communities, global_partition_labels,
+                           restricted_partition_modularity)
+from ego_betweenness import ego_betweenness, approximate_ego_betweenness
+from batch_metrics import batch_clustering, batch_average_neighbor_degree
+from parallel_runner import (run_parallel, estimate_ego_costs, lpt_order, fit_runtime_model,
+                             predict_runtimes, predict_makespan)
+from metric_budget import (run_with_budget, REASON_ERROR, BETWEENNESS_FALLBACK_SAMPLES, POWER_ITERATION_TOL)
+from timing_report import peak_rss_mb, timing_record, write_timing_report
+from ego_store import EgoMembershipWriter
+from progress_index import ProgressIndex, INDEX_SUFFIX
+from streaming_merge import (PopularityLookup, stream_merge, parquet_available, MERGE_CHUNK_SIZE,
+                             MERGED_FORMATS)
+from incremental import load_edge_delta, diff_edges, affected_centres, load_user_list, plan_recompute
+from versioned_dataset import VersionedDataset
 
-def normalize_id(id_value):
-    """规范化用户ID，确保格式一致"""
-    try:
-        id_str = str(id_value).strip()
-        if id_str == '-2147483648':
-            return id_str
-        return str(int(float(id_str)))
-    except:
-        return str(id_value).strip()
-
-def signal_handler(signum, frame):
-    """处理Ctrl+C信号"""
-    print(f"\n\n⚠️ 收到中断信号 (Ctrl+C)")
-    print(f"📁 正在保存当前进度...")
-    sys.exit(0)
-
-def load_celebrity_users(base_dir):
-    """加载明星用户列表"""
-    high_fans_file = os.path.join(base_dir, 'high_fans_users.csv')
+# 谱半径的相对误差容限
+SPECTRAL_TOL = 1e-8
+# Louvain遍历顺序的随机种子（固定后结果可复现，None表示按节点顺序遍历）
+LOUVAIN_SEED = 42
+# 介数中心性计算方式：'ego' 只计算中心节点（受限最短路径计数），'approx' 为源点抽样近似，
+# 'full' 为原来的全图betweenness_centrality
+BETWEENNESS_MODE = 'ego'
+# 近似模式的抽样预算：BETWEENNESS_SAMPLES为None时按目标误差（归一化尺度）和置信度确定样本数
+BETWEENNESS_SAMPLES = None
+BETWEENNESS_EPSILON = 0.01
+BETWEENNESS_CONFIDENCE = 0.95
+# 并行计算：WORKERS为1时在主进程中顺序计算；CHUNK_SIZE为每次派发给一个工作进程的用户数
+WORKERS = 1
+CHUNK_SIZE = 4
+# 为True时，聚类系数等只依赖中心局部邻域的指标在全图上对所有用户一次性批量计算
+BATCH_LOCAL_METRICS = True
+# 预估总耗时前，先在主进程中实际计算的校准用户数（按估计代价分位数抽取，结果照常保存）
+CALIBRATION_USERS = 5
+# 为True且计算模块度时，先在全图上运行一次Louvain，每个用户另外记录全图划分限制到二跳网络上的模块度
+# （modularity_global_partition）及其局部移动细化结果（modularity_global_refined），与逐网络Louvain对照
+GLOBAL_PARTITION = False
+# 细化全图划分时的局部移动遍数，0为不细化
+PARTITION_REFINE_PASSES = 2
+
+# 指标序号 -> 写入network_metrics.jsonl的指标名
+METRIC_NAMES = {1: 'density', 2: 'clustering_coefficient', 3: 'average_nearest_neighbor_degree',
+                4: 'betweenness_centrality', 5: 'spectral_radius', 6: 'modularity'}
+
+def load_celebrity_users(dataset):
+    """加载明星用户列表（dataset为VersionedDataset，已被清洗删除的用户不计入）"""
+    high_fans_file = os.path.join(dataset.network_dir, 'high_fans_users.csv')
     
     if not os.path.exists(high_fans_file):
         print(f"⚠️ 未找到明星用户文件: {high_fans_file}")
@@ -37,8 +68,12 @@ def load_celebrity_users(base_dir):
         return set()
     
     try:
-        high_fans_df = pd.read_csv(high_fans_file)
-        celebrity_users = set(high_fans_df['user_id'].apply(normalize_id))
+        high_fans_df = pd.read_csv(high_fans_file, dtype={'user_id': str})
+        celebrity_users = set(normalize_ids(high_fans_df['user_id']))
+        removed = celebrity_users & dataset.removed_users()
+        if removed:
+            celebrity_users -= removed
+            print(f"   已排除 {len(removed)} 个被清洗删除的明星用户")
         print(f"✅ 成功加载 {len(celebrity_users)} 个明星用户")
         return celebrity_users
     except Exception as e:
@@ -46,18 +81,15 @@ def load_celebrity_users(base_dir):
         print(f"   所有用户的is_celebrity将设为False")
         return set()
 
-def load_user_categories(base_dir):
-    """🔥 新增：加载用户类别信息（A/B/C）"""
-    users_file = os.path.join(base_dir, 'users.csv')
-    
-    if not os.path.exists(users_file):
-        print(f"⚠️ 未找到用户文件: {users_file}")
+def load_user_categories(dataset):
+    """🔥 新增：加载用户类别信息（A/B/C）；dataset为VersionedDataset，读取时应用各版本的增量"""
+    if not os.path.exists(dataset.users_file):
+        print(f"⚠️ 未找到用户文件: {dataset.users_file}")
         print(f"   所有用户的category将设为Unknown")
         return {}
     
     try:
-        users_df = pd.read_csv(users_file)
-        users_df['user_id'] = users_df['user_id'].apply(normalize_id)
+        users_df = dataset.load_users()
         
         # 检查是否有category列
         if 'category' not in users_df.columns:
@@ -87,7 +119,7 @@ def get_user_selected_metrics():
     print("1. 密度 (Density)")
     print("2. 聚类系数 (Clustering Coefficient)")  
     print("3. 邻居平均度 (Average Nearest Neighbor Degree)")
-    print("4. 介数中心性 (Betweenness Centrality) - 计算较慢")
+    print(f"4. 介数中心性 (Betweenness Centrality) - {'计算较慢' if BETWEENNESS_MODE == 'full' else '只算中心节点'}")
     print("5. 谱半径 (Spectral Radius)")
     print("6. 模块度 (Modularity)")
     print("="*60)
@@ -129,7 +161,7 @@ def get_user_selected_metrics():
                 print(f"   {num}. {metric_names[num]}")
             
             # 特别提醒介数中心性的计算时间
-            if 4 in selected_numbers:
+            if 4 in selected_numbers and BETWEENNESS_MODE == 'full':
                 print(f"\n⚠️ 注意：介数中心性计算较慢，大网络可能需要很长时间")
                 confirm = input("确认要包含介数中心性吗？(y/n): ").strip().lower()
                 if confirm != 'y':
@@ -140,47 +172,16 @@ def get_user_selected_metrics():
             
         except ValueError:
             print("❌ 输入格式错误，请输入数字，用空格分隔")
-        except KeyboardInterrupt:
-            print("\n❌ 用户取消操作")
-            return []
-
-def load_existing_progress(metrics_output, ego_networks_output):
-    """加载已有进度，返回已完成的用户集合和数据"""
-    completed_users = set()
-    existing_metrics = {}
-    existing_ego_info = {}
-    
-    # 加载已有的网络指标
-    if os.path.exists(metrics_output):
-        print(f"找到已有网络指标文件: {metrics_output}")
-        with open(metrics_output, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    user_id = record["user_id"]
-                    metrics = record["network_metrics"]
-                    existing_metrics[user_id] = metrics
-                    completed_users.add(user_id)
-                except Exception as e:
-                    print(f"  - 警告：解析网络指标文件中的行时出错：{e}")
-                    continue
-    
-    # 加载已有的ego网络信息
-    if os.path.exists(ego_networks_output):
-        print(f"找到已有ego网络信息文件: {ego_networks_output}")
-        with open(ego_networks_output, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    user_id = record["user_id"]
-                    ego_info = record["ego_network_info"]
-                    existing_ego_info[user_id] = ego_info
-                except Exception as e:
-                    print(f"  - 警告：解析ego网络信息文件中的行时出错：{e}")
-                    continue
-    
-    print(f"已加载 {len(completed_users)} 个已完成用户的数据")
-    return completed_users, existing_metrics, existing_ego_info
+
+def load_existing_progress(metrics_output):
+    """加载已有进度：只读取完成索引（旧文件首次续传时扫描一次并补建索引），返回ProgressIndex
+
+    不再解析两个结果文件的全部记录；已完成用户的指标在最后合并时从磁盘流式读取。
+    """
+    print(f"找到已有网络指标文件: {metrics_output}")
+    index = ProgressIndex(metrics_output)
+    print(f"已从完成索引加载 {len(index)} 个已完成用户: {index.index_path}")
+    return index
 
 def append_to_jsonl(data, file_path, is_metrics=True):
     """追加数据到JSONL文件"""
@@ -194,8 +195,21 @@ def append_to_jsonl(data, file_path, is_metrics=True):
                 record = {"user_id": user_id, "ego_network_info": ego_info}
                 f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
-def ego_graph_fixed(G, n, radius=1, center=True, undirected=False, distance=None):
-    """修复版的ego_graph函数，真正支持双向边"""
+def ego_graph_fixed(G, n, radius=1, center=True, undirected=False, distance=None, materialize=True):
+    """修复版的ego_graph函数，真正支持双向边
+
+    对CSR图，materialize=False时返回EgoView：只记录节点集合，边数按需计数，子图按需抽取。
+    """
+    
+    if isinstance(G, CSRGraph):
+        # CSR图：直接在整数ID上做双向BFS并抽取导出子图
+        start = G.index_of(n)
+        if start < 0:
+            return None
+        nodes, _ = G.bidirectional_bfs(start, radius)
+        if not center:
+            nodes = nodes[1:]
+        return G.subgraph(nodes) if materialize else EgoView(G, nodes)
     
     if distance is not None:
         # 如果指定了距离权重，使用dijkstra算法
@@ -236,6 +250,13 @@ def ego_graph_fixed(G, n, radius=1, center=True, undirected=False, distance=None
 
 def bidirectional_bfs(G, start_node, radius):
     """双向BFS：同时沿入边和出边扩展"""
+    if isinstance(G, CSRGraph):
+        start = G.index_of(start_node)
+        if start < 0:
+            return {}
+        nodes, dists = G.bidirectional_bfs(start, radius)
+        return dict(zip(G.node_ids[nodes].tolist(), dists.tolist()))
+    
     distances = {start_node: 0}
     current_level = {start_node}
     
@@ -272,6 +293,12 @@ def calculate_global_degrees(G, center_node):
             print(f"    ⚠️ 节点 {center_node_str} 不在图中")
             return 0, 0, 0
         
+        if isinstance(G, CSRGraph):
+            i = G.index_of(center_node_str)
+            out_degree = int(G.out_degrees[i])
+            in_degree = int(G.in_degrees[i])
+            return out_degree, in_degree, out_degree + in_degree
+        
         # 🔥 关键修复：EasyGraph返回字典，需要获取指定节点的度数
         out_degree_dict = G.out_degree(center_node_str)
         in_degree_dict = G.in_degree(center_node_str)
@@ -289,20 +316,58 @@ def calculate_global_degrees(G, center_node):
         print(f"    ❌ 计算全图度数失败: {e}")
         return 0, 0, 0
 
-def calculate_spectral_radius(G):
-    """计算图的谱半径（最大特征值的绝对值）"""
-    adj_matrix = eg.to_numpy_array(G)
-    eigenvalues = linalg.eigvals(adj_matrix)
-    return float(np.max(np.abs(eigenvalues)))
+def calculate_spectral_radius(G, tol=SPECTRAL_TOL, method='arpack', deadline=None):
+    """计算图的谱半径（最大特征值的绝对值）
 
-def calculate_modularity(G):
-    """计算图的模块度"""
-    partition, modularity_value = louvain_communities_fixed(G, threshold=0.001)
+    在稀疏邻接矩阵上按强连通分量求解（ARPACK/幂迭代），只有很小的图才稠密求解，
+    tol为相对误差容限。method='power' 时大块只用幂迭代（超出预算时的降级方法）。
+    """
+    if isinstance(G, CSRGraph):
+        adj_matrix = G.adjacency_matrix()
+    else:
+        node_index = {node: i for i, node in enumerate(G.nodes)}
+        rows, cols = [], []
+        for u, v, _ in G.edges:
+            rows.append(node_index[u])
+            cols.append(node_index[v])
+        n = len(node_index)
+        adj_matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    return sparse_spectral_radius(adj_matrix, tol=tol, method=method, deadline=deadline)
+
+def calculate_modularity(G, max_levels=10, deadline=None):
+    """计算图的模块度（基于CSR数组的Louvain，有向图记录有向模块度）；max_levels=1 为单层Louvain"""
+    partition, modularity_value = louvain_communities(G, threshold=0.001, max_levels=max_levels,
+                                                      seed=LOUVAIN_SEED, deadline=deadline)
+    print(f"  - 社区数量: {len(partition)}")
     return modularity_value
 
-def calculate_betweenness_centrality(G, center_node):
-    """计算介数中心性，正确处理EasyGraph返回的结果"""
+def calculate_betweenness_centrality(G, center_node, mode=BETWEENNESS_MODE, samples=BETWEENNESS_SAMPLES,
+                                     epsilon=BETWEENNESS_EPSILON, confidence=BETWEENNESS_CONFIDENCE, deadline=None):
+    """计算介数中心性，正确处理EasyGraph返回的结果，返回 (值, 耗时, 计算方式信息)
+
+    mode='ego' 时只计算中心节点的介数（G可以是CSRGraph），结果与全图计算一致；
+    mode='approx' 时抽样源点近似，并给出置信区间（样本数覆盖全部源点时即为精确值）；
+    mode='full' 时对整个二跳网络调用eg_f.betweenness_centrality（无法中途按deadline中断）。
+    """
     bc_start = datetime.now()
+    if mode == 'ego':
+        result = ego_betweenness(G, center_node, deadline=deadline)
+        return result, datetime.now() - bc_start, {'betweenness_mode': 'ego'}
+    if mode == 'approx':
+        estimate = approximate_ego_betweenness(G, center_node, samples=samples, epsilon=epsilon,
+                                               confidence=confidence, deadline=deadline)
+        details = {
+            'betweenness_mode': 'ego' if estimate.exact else 'approx',
+            'betweenness_samples': estimate.samples,
+            'betweenness_sources': estimate.population,
+        }
+        if not estimate.exact:
+            details['betweenness_ci_low'] = estimate.ci_low
+            details['betweenness_ci_high'] = estimate.ci_high
+            details['betweenness_confidence'] = confidence
+        return estimate.value, datetime.now() - bc_start, details
+    if isinstance(G, CSRGraph):
+        G = G.to_easygraph()
     bc = eg_f.betweenness_centrality(G)
     
     # 处理EasyGraph可能返回列表或字典的情况
@@ -322,182 +387,14 @@ def calculate_betweenness_centrality(G, center_node):
         result = 0.0
     
     bc_time = datetime.now() - bc_start
-    return result, bc_time
-
-def louvain_communities_fixed(G, weight="weight", threshold=0.001, max_iterations=100, max_levels=10):
-    """修复版的Louvain社区检测算法"""
-    partition = [{u} for u in G.nodes]
-    m = G.size(weight="weight")
-    is_directed = G.is_directed()
-    
-    initial_mod = modularity_fixed(G, partition)
-    
-    level = 1
-    partition, inner_partition, improvement = _one_level_fixed(G, m, partition, is_directed)
-    
-    new_mod = modularity_fixed(G, partition)
-    mod_gain = new_mod - initial_mod
-    
-    while improvement and level < max_levels:
-        level += 1
-        
-        G_new = G.__class__()
-        node2com = {}
-        
-        for i, part in enumerate(partition):
-            G_new.add_node(i)
-            for node in part:
-                node2com[node] = i
-        
-        for edge in G.edges:
-            u, v, data = edge
-            if u in node2com and v in node2com:
-                com1 = node2com[u]
-                com2 = node2com[v]
-                edge_weight = data.get(weight, 1)
-                
-                if G_new.has_edge(com1, com2):
-                    G_new[com1][com2][weight] += edge_weight
-                else:
-                    G_new.add_edge(com1, com2, **{weight: edge_weight})
-        
-        G = G_new
-        partition = [{u} for u in G.nodes]
-        partition, inner_partition, improvement = _one_level_fixed(G, m, partition, is_directed)
-        
-        if improvement:
-            cur_mod = modularity_fixed(G, partition)
-            mod_gain = cur_mod - new_mod
-            
-            if mod_gain <= threshold:
-                break
-            new_mod = cur_mod
-    
-    return partition, new_mod
-
-def _one_level_fixed(G, m, partition, is_directed=False, max_iterations=100):
-    """修复版的_one_level函数"""
-    node2com = {u: i for i, u in enumerate(G.nodes)}
-    inner_partition = [{u} for u in G.nodes]
-    
-    degrees = dict(G.degree(weight="weight"))
-    Stot = []
-    for i in range(len(partition)):
-        Stot.append(sum(degrees.get(node, 0) for node in partition[i]))
-    
-    nbrs = {u: {v: data.get("weight", 1) for v, data in G[u].items() if v != u} for u in G}
-    rand_nodes = list(G.nodes)
-    
-    nb_moves = 1
-    iteration = 0
-    total_moves = 0
-    recent_moves = []
-    oscillation_threshold = 3
-    
-    while nb_moves > 0 and iteration < max_iterations:
-        iteration += 1
-        nb_moves = 0
-        
-        for u in rand_nodes:
-            best_mod = 0
-            best_com = node2com[u]
-            
-            weights2com = defaultdict(float)
-            for nbr, wt in nbrs.get(u, {}).items():
-                weights2com[node2com[nbr]] += wt
-            
-            degree = degrees.get(u, 0)
-            if best_com < len(Stot):
-                Stot[best_com] -= degree
-                remove_cost = -weights2com.get(best_com, 0) / m + (Stot[best_com] * degree) / (2 * m**2)
-            else:
-                remove_cost = 0
-            
-            for nbr_com, wt in weights2com.items():
-                if nbr_com < len(Stot):
-                    gain = remove_cost + wt / m - (Stot[nbr_com] * degree) / (2 * m**2)
-                    if gain > best_mod:
-                        best_mod = gain
-                        best_com = nbr_com
-            
-            if best_com < len(Stot):
-                Stot[best_com] += degree
-            
-            if best_com != node2com[u]:
-                com = G.nodes[u].get("nodes", {u})
-                if not isinstance(com, set):
-                    com = {com}
-                
-                partition[node2com[u]].difference_update(com)
-                inner_partition[node2com[u]].remove(u)
-                
-                if best_com < len(partition):
-                    partition[best_com].update(com)
-                    inner_partition[best_com].add(u)
-                
-                nb_moves += 1
-                total_moves += 1
-                node2com[u] = best_com
-        
-        old_partition = partition.copy()
-        partition = list(filter(len, partition))
-        inner_partition = list(filter(len, inner_partition))
-        
-        if len(old_partition) != len(partition):
-            new_node2com = {}
-            for i, community in enumerate(partition):
-                for node in community:
-                    new_node2com[node] = i
-            node2com = new_node2com
-            
-            new_Stot = []
-            for i in range(len(partition)):
-                new_Stot.append(sum(degrees.get(node, 0) for node in partition[i]))
-            Stot = new_Stot
-        
-        recent_moves.append(nb_moves)
-        if len(recent_moves) > oscillation_threshold:
-            recent_moves.pop(0)
-            if len(set(recent_moves)) == 1 and recent_moves[0] > 0:
-                break
-    
-    return partition, inner_partition, total_moves > 0
+    return result, bc_time, {'betweenness_mode': 'full'}
 
 def modularity_fixed(G, communities, weight="weight"):
-    """计算给定社区划分的模块度"""
+    """计算给定社区划分的模块度（向量化：社区内部边权 + 社区出/入度之积，O(m + n)）"""
     if not isinstance(communities, list):
         communities = list(communities)
 
-    directed = G.is_directed()
-    m = G.size(weight=weight)
-    if m == 0:
-        return 0
-        
-    if directed:
-        out_degree = dict(G.out_degree(weight=weight))
-        in_degree = dict(G.in_degree(weight=weight))
-        norm = 1 / m
-    else:
-        out_degree = dict(G.degree(weight=weight))
-        in_degree = out_degree
-        norm = 1 / (2 * m)
-    
-    def val(u, v):
-        try:
-            w = G[u][v].get(weight, 1)
-        except KeyError:
-            w = 0
-        if u == v and not directed:
-            w *= 2
-        return w - in_degree.get(u, 0) * out_degree.get(v, 0) * norm
-    
-    Q = 0
-    for c in communities:
-        for u in c:
-            for v in c:
-                Q += val(u, v)
-    
-    Q = Q * norm
+    Q = ego_modularity(G, communities, weight=weight)
     
     print(f"  - 社区数量: {len(communities)}")
     print(f"  - 最终模块度: {Q:.6f}")
@@ -506,6 +403,13 @@ def modularity_fixed(G, communities, weight="weight"):
 
 def calculate_average_neighbor_degree(G, node):
     """计算节点的邻居平均度数"""
+    if isinstance(G, CSRGraph):
+        # 邻居为出边邻居，邻居的度数为其在该图中的出边数，与EasyGraph版本口径一致
+        neighbors = G.neighbors(G.index_of(node))
+        if len(neighbors) == 0:
+            return 0.0
+        return float(G.out_degrees[neighbors].mean())
+    
     neighbors = list(G.neighbors(node))
     if not neighbors:
         return 0.0
@@ -517,12 +421,46 @@ def calculate_average_neighbor_degree(G, node):
     
     return sum(neighbor_degrees) / len(neighbor_degrees)
 
-def create_ego_network_fixed(G, node, radius=2):
-    """使用修复版ego_graph创建真正的双向二跳邻居网络"""
+def calculate_average_neighbor_global_degree(global_graph, node):
+    """邻居平均度的全图版本：出边邻居在全图中的总度数（出度+入度）的平均值"""
+    if isinstance(global_graph, CSRGraph):
+        neighbors = global_graph.neighbors(global_graph.index_of(node))
+        if len(neighbors) == 0:
+            return 0.0
+        return float(global_graph.degrees[neighbors].mean())
+    
+    neighbors = list(global_graph.neighbors(node))
+    if not neighbors:
+        return 0.0
+    return sum(calculate_global_degrees(global_graph, neighbor)[2] for neighbor in neighbors) / len(neighbors)
+
+def count_center_neighbors(G, node, ego_graph):
+    """直接从前驱/后继索引统计中心节点在ego网络中的入邻居和出邻居数，O(degree)"""
+    if isinstance(G, CSRGraph):
+        center = G.index_of(node)
+        in_neighbors = G.predecessors(center)
+        out_neighbors = G.successors(center)
+        if isinstance(ego_graph, (CSRGraph, EgoView)) and ego_graph.global_index is not None:
+            # ego子图的global_index已按全图ID升序排列
+            in_neighbors = in_neighbors[np.isin(in_neighbors, ego_graph.global_index, assume_unique=True)]
+            out_neighbors = out_neighbors[np.isin(out_neighbors, ego_graph.global_index, assume_unique=True)]
+        return len(in_neighbors), len(out_neighbors)
+    
+    in_count = sum(1 for u in G.predecessors(node) if u in ego_graph)
+    out_count = sum(1 for u in G.successors(node) if u in ego_graph)
+    return in_count, out_count
+
+def create_ego_network_fixed(G, node, radius=2, materialize=True):
+    """使用修复版ego_graph创建真正的双向二跳邻居网络
+
+    返回 (ego_graph, 入邻居数, 出邻居数)；邻居数只统计在ego网络中的邻居。
+    materialize=False时（仅CSR图）返回不抽取子图的EgoView。
+    """
     print(f"  - 开始创建真正的双向二跳邻居网络...")
     
     # 使用修复版的ego_graph函数，设置undirected=True以获取双向边
-    ego_graph = ego_graph_fixed(G, node, radius=radius, center=True, undirected=True)
+    ego_graph = ego_graph_fixed(G, node, radius=radius, center=True, undirected=True, materialize=materialize)
+    in_count, out_count = 0, 0
     
     if ego_graph:
         print(f"  - 双向ego_graph创建成功: {ego_graph.number_of_nodes()} 节点, {ego_graph.number_of_edges()} 边")
@@ -531,30 +469,77 @@ def create_ego_network_fixed(G, node, radius=2):
         if node in ego_graph:
             # 对于有向图，计算入邻居和出邻居
             if G.is_directed():
-                in_neighbors = []
-                out_neighbors = []
-                
-                # 在原图中查找中心节点的真实邻居
-                for u in G.nodes:
-                    if G.has_edge(u, node):  # u指向node（入邻居）
-                        in_neighbors.append(u)
-                    if G.has_edge(node, u):  # node指向u（出邻居）
-                        out_neighbors.append(u)
-                
-                # 过滤：只统计在ego_graph中的邻居
-                in_neighbors_in_ego = [n for n in in_neighbors if n in ego_graph]
-                out_neighbors_in_ego = [n for n in out_neighbors if n in ego_graph]
-                
-                print(f"  - 中心节点 {node}: 入邻居(粉丝) {len(in_neighbors_in_ego)} 个, 出邻居(关注) {len(out_neighbors_in_ego)} 个")
+                in_count, out_count = count_center_neighbors(G, node, ego_graph)
+                print(f"  - 中心节点 {node}: 入邻居(粉丝) {in_count} 个, 出邻居(关注) {out_count} 个")
             else:
-                neighbors = list(ego_graph.neighbors(node))
-                print(f"  - 中心节点 {node}: 邻居 {len(neighbors)} 个")
+                out_count = in_count = len(list(ego_graph.neighbors(node)))
+                print(f"  - 中心节点 {node}: 邻居 {out_count} 个")
     
-    return ego_graph
+    return ego_graph, in_count, out_count
 
-def calculate_network_metrics_selected(ego_graph, center_node, selected_metrics, global_graph, celebrity_users, user_categories):
-    """🔥 修改版：计算网络指标，包含全图度数、明星用户标识和用户类别"""
+def calculate_density(G):
+    """有向图密度 m / (n(n-1))，与eg.density口径一致"""
+    if isinstance(G, (CSRGraph, EgoView)):
+        n = G.number_of_nodes()
+        if n <= 1:
+            return 0.0
+        return G.number_of_edges() / (n * (n - 1))
+    return eg.density(G)
+
+def calculate_network_metrics_selected(ego_graph, center_node, selected_metrics, global_graph, celebrity_users, user_categories,
+                                      betweenness_mode=BETWEENNESS_MODE, precomputed=None, timings=None,
+                                      time_budgets=None, memory_budgets=None, global_partition=None,
+                                      partition_refine_passes=PARTITION_REFINE_PASSES):
+    """🔥 修改版：计算网络指标，包含全图度数、明星用户标识和用户类别
+
+    precomputed为 {指标名: {user_id: 值}}，其中已有的值（批量计算结果）直接使用。
+    给出timings字典时，记录每个指标的耗时（秒）。
+    time_budgets/memory_budgets为 {指标名: 秒/MB}：介数、谱半径、模块度超出预算时依次降级为
+    抽样介数、幂迭代谱半径、单层Louvain，仍超出则记为缺失（值为None，并记录 <指标名>_missing_reason），
+    降级时记录 <指标名>_method 和 <指标名>_fallback_reason。任何指标失败都不会记为0.0。
+    内存预算按规模估计决定是否运行某个方法（准入），计算后再检查进程峰值常驻内存在该指标期间的增长，
+    超出预算时记录 <指标名>_memory_exceeded_mb（峰值只增不减，增长量是实际用量的下界）。
+    给出global_partition（全图上各节点的社区编号）时，模块度另记录该划分限制到二跳网络上的模块度
+    modularity_global_partition，partition_refine_passes>0 时还记录细化后的 modularity_global_refined，
+    其耗时单独记为 modularity_global_partition。
+    """
     metrics = {}
+    precomputed = precomputed or {}
+    timings = {} if timings is None else timings
+    time_budgets = time_budgets or {}
+    memory_budgets = memory_budgets or {}
+    
+    # 节点数、边数、密度只需计数；其余指标需要子图时才抽取（EgoView），并只抽取一次
+    def subgraph():
+        return ego_graph.materialize() if isinstance(ego_graph, EgoView) else ego_graph
+    
+    # 仍依赖EasyGraph实现的指标（聚类系数、全图模式的介数中心性）按需转换一次
+    eg_view = None
+    def as_easygraph():
+        nonlocal eg_view
+        if eg_view is None:
+            eg_view = subgraph().to_easygraph() if isinstance(subgraph(), CSRGraph) else subgraph()
+        return eg_view
+    
+    # 在预算内计算一个指标：超出预算或出错时降级，仍不行则记为缺失
+    def budgeted(metric_name, primary, fallback):
+        memory_mb = memory_budgets.get(metric_name)
+        rss_before = peak_rss_mb() if memory_mb is not None else None
+        result = run_with_budget(primary, fallback, metrics['node_count'], metrics['edge_count'],
+                                 seconds=time_budgets.get(metric_name), memory_mb=memory_mb)
+        metrics[metric_name] = result.value
+        rss_after = peak_rss_mb() if rss_before is not None else None
+        if rss_after is not None and rss_after - rss_before > memory_mb:
+            metrics[f'{metric_name}_memory_exceeded_mb'] = round(rss_after - rss_before, 1)
+            print(f"  - ⚠️ {metric_name} 峰值内存增长 {rss_after - rss_before:.1f} MB，超出内存预算 {memory_mb} MB")
+        if result.fallback_reason:
+            metrics[f'{metric_name}_method'] = result.method
+            metrics[f'{metric_name}_fallback_reason'] = result.fallback_reason
+            print(f"  - ⚠️ {metric_name} 主方法未完成（{result.fallback_reason}），已改用 {result.method}")
+        if result.missing_reason:
+            metrics[f'{metric_name}_missing_reason'] = result.missing_reason
+            print(f"  - ❌ {metric_name} 记为缺失（{result.missing_reason}）")
+        return result
     
     # 基本网络信息
     metrics['node_count'] = ego_graph.number_of_nodes()
@@ -584,49 +569,366 @@ def calculate_network_metrics_selected(ego_graph, center_node, selected_metrics,
         start_time = datetime.now()
         try:
             if metric_num == 1:  # 密度
-                value = eg.density(ego_graph)
+                value = calculate_density(ego_graph)
                 metrics['density'] = value
                 elapsed = datetime.now() - start_time
                 print(f"  - density 计算完成: {value:.6f}, 耗时: {elapsed}")
                 
             elif metric_num == 2:  # 聚类系数
-                value = eg_f.clustering(ego_graph, center_node)
+                if center_node in precomputed.get('clustering_coefficient', {}):
+                    value = precomputed['clustering_coefficient'][center_node]
+                else:
+                    value = eg_f.clustering(as_easygraph(), center_node)
                 metrics['clustering_coefficient'] = value
                 elapsed = datetime.now() - start_time
                 print(f"  - clustering_coefficient 计算完成: {value:.6f}, 耗时: {elapsed}")
                 
-            elif metric_num == 3:  # 邻居平均度
-                value = calculate_average_neighbor_degree(ego_graph, center_node)
+            elif metric_num == 3:  # 邻居平均度（二跳网络内的度数 + 全图总度数两个版本）
+                if center_node in precomputed.get('average_nearest_neighbor_degree', {}):
+                    value = precomputed['average_nearest_neighbor_degree'][center_node]
+                    global_value = precomputed['average_nearest_neighbor_global_degree'][center_node]
+                else:
+                    value = calculate_average_neighbor_degree(subgraph(), center_node)
+                    global_value = calculate_average_neighbor_global_degree(global_graph, center_node)
                 metrics['average_nearest_neighbor_degree'] = value
+                metrics['average_nearest_neighbor_global_degree'] = global_value
                 elapsed = datetime.now() - start_time
-                print(f"  - average_nearest_neighbor_degree 计算完成: {value:.6f}, 耗时: {elapsed}")
+                print(f"  - average_nearest_neighbor_degree 计算完成: {value:.6f} (全图度数版本: {global_value:.6f}), 耗时: {elapsed}")
                 
-            elif metric_num == 4:  # 介数中心性
-                value, bc_time = calculate_betweenness_centrality(ego_graph, center_node)
-                metrics['betweenness_centrality'] = value
-                print(f"  - betweenness_centrality 计算完成: {value:.6f}, 耗时: {bc_time}")
+            elif metric_num == 4:  # 介数中心性（超出预算时降级为抽样近似）
+                bc_details = {}
+                def betweenness(mode, samples=BETWEENNESS_SAMPLES):
+                    def compute(deadline):
+                        bc_graph = as_easygraph() if mode == 'full' else subgraph()
+                        value, _, details = calculate_betweenness_centrality(bc_graph, center_node, mode=mode,
+                                                                             samples=samples, deadline=deadline)
+                        bc_details.clear()
+                        bc_details.update(details)
+                        return value
+                    return compute
+                primary_method = 'full_betweenness' if betweenness_mode == 'full' else 'ego_betweenness'
+                result = budgeted('betweenness_centrality', (primary_method, betweenness(betweenness_mode)),
+                                  ('sampled_betweenness', betweenness('approx', BETWEENNESS_FALLBACK_SAMPLES)))
+                value = result.value
+                elapsed = datetime.now() - start_time
+                if value is not None:
+                    metrics.update(bc_details)
+                    if 'betweenness_ci_low' in bc_details:
+                        print(f"  - betweenness_centrality (approx, {bc_details['betweenness_samples']}/{bc_details['betweenness_sources']} 源点) "
+                              f"计算完成: {value:.6f} [{bc_details['betweenness_ci_low']:.6f}, {bc_details['betweenness_ci_high']:.6f}], 耗时: {elapsed}")
+                    else:
+                        print(f"  - betweenness_centrality ({bc_details['betweenness_mode']}) 计算完成: {value:.6f}, 耗时: {elapsed}")
                 
-            elif metric_num == 5:  # 谱半径
-                value = calculate_spectral_radius(ego_graph)
-                metrics['spectral_radius'] = value
+            elif metric_num == 5:  # 谱半径（超出预算时降级为幂迭代）
+                result = budgeted('spectral_radius',
+                                  ('arpack', lambda deadline: calculate_spectral_radius(subgraph(), deadline=deadline)),
+                                  ('power_iteration', lambda deadline: calculate_spectral_radius(
+                                      subgraph(), tol=POWER_ITERATION_TOL, method='power', deadline=deadline)))
                 elapsed = datetime.now() - start_time
-                print(f"  - spectral_radius 计算完成: {value:.6f}, 耗时: {elapsed}")
+                if result.value is not None:
+                    print(f"  - spectral_radius 计算完成: {result.value:.6f}, 耗时: {elapsed}")
                 
-            elif metric_num == 6:  # 模块度
-                value = calculate_modularity(ego_graph)
-                metrics['modularity'] = value
+            elif metric_num == 6:  # 模块度（超出预算时降级为单层Louvain）
+                if global_partition is not None:
+                    # 快速估计先算并单独计时，失败时不影响逐网络Louvain
+                    try:
+                        restricted, refined = restricted_partition_modularity(
+                            subgraph(), global_partition, refine_passes=partition_refine_passes, seed=LOUVAIN_SEED)
+                        metrics['modularity_global_partition'] = restricted
+                        if refined is not None:
+                            metrics['modularity_global_refined'] = refined
+                            print(f"  - modularity (全图划分) 计算完成: {restricted:.6f}, 细化后: {refined:.6f}")
+                        else:
+                            print(f"  - modularity (全图划分) 计算完成: {restricted:.6f}")
+                    except Exception as e:
+                        print(f"  - ❌ modularity (全图划分) 计算失败: {e}")
+                        metrics['modularity_global_partition'] = None
+                        metrics['modularity_global_partition_missing_reason'] = REASON_ERROR
+                    timings['modularity_global_partition'] = (datetime.now() - start_time).total_seconds()
+                    start_time = datetime.now()
+                result = budgeted('modularity',
+                                  ('louvain', lambda deadline: calculate_modularity(subgraph(), deadline=deadline)),
+                                  ('single_level_louvain', lambda deadline: calculate_modularity(
+                                      subgraph(), max_levels=1, deadline=deadline)))
                 elapsed = datetime.now() - start_time
-                print(f"  - modularity 计算完成: {value:.6f}, 耗时: {elapsed}")
+                if result.value is not None:
+                    print(f"  - modularity 计算完成: {result.value:.6f}, 耗时: {elapsed}")
                 
         except Exception as e:
-            metric_names = {1: 'density', 2: 'clustering_coefficient', 3: 'average_nearest_neighbor_degree',
-                          4: 'betweenness_centrality', 5: 'spectral_radius', 6: 'modularity'}
-            metric_name = metric_names.get(metric_num, f'metric_{metric_num}')
+            metric_name = METRIC_NAMES.get(metric_num, f'metric_{metric_num}')
             print(f"  - ❌ {metric_name} 计算失败: {e}")
-            metrics[metric_name] = 0.0
+            metrics[metric_name] = None
+            metrics[f'{metric_name}_missing_reason'] = REASON_ERROR
+        timings[METRIC_NAMES.get(metric_num, f'metric_{metric_num}')] = (datetime.now() - start_time).total_seconds()
     
     return metrics
 
+def ego_members(ego_graph):
+    """二跳网络成员在全图中的内部整数ID；不是由CSRGraph抽取的网络返回None"""
+    return getattr(ego_graph, 'global_index', None)
+
+def build_ego_info(ego_graph, metrics, selected_metrics, center_in_count, center_out_count):
+    """ego网络信息记录（写入ego_networks_info.jsonl），包含用户类别
+
+    成员列表另存到二跳网络成员存储（ego_store）；只有不是由CSRGraph抽取的网络才把'nodes'写在记录里。
+    """
+    info = {
+        'node_count': ego_graph.number_of_nodes(),
+        'edge_count': ego_graph.number_of_edges(),
+        'center_in_neighbors': center_in_count,
+        'center_out_neighbors': center_out_count,
+        'selected_metrics': selected_metrics,
+        'global_out_degree': metrics.get('global_out_degree', 0),
+        'global_in_degree': metrics.get('global_in_degree', 0),
+        'global_total_degree': metrics.get('global_total_degree', 0),
+        'is_celebrity': metrics.get('is_celebrity', False),
+        'user_category': metrics.get('user_category', 'Unknown'),  # 🔥 新增
+        'metrics': {k: v for k, v in metrics.items() if k not in ['node_count', 'edge_count', 'center_node', 'global_out_degree', 'global_in_degree', 'global_total_degree', 'is_celebrity', 'user_category']}
+    }
+    if ego_members(ego_graph) is None:
+        info['nodes'] = list(ego_graph.nodes)
+    return info
+
+# process_user的结果：members为二跳网络成员的内部整数ID数组（写入成员存储）
+UserResult = namedtuple('UserResult', ['metrics', 'ego_info', 'timings', 'peak_rss', 'members'])
+
+def process_user(G, user_id, selected_metrics, celebrity_users, user_categories, betweenness_mode=BETWEENNESS_MODE,
+                 precomputed=None, time_budgets=None, memory_budgets=None, global_partition=None,
+                 partition_refine_passes=PARTITION_REFINE_PASSES):
+    """处理单个用户：构建二跳网络并计算指标，返回UserResult；网络过小时返回None
+
+    timings记录二跳网络构建、每个指标和该用户总计（total）的耗时（秒）；peak_rss为计算该用户的进程
+    迄今为止的峰值内存（MB，无法获取时为None）；members为成员的内部整数ID（并行时只回传整数数组）。
+    顺序模式和并行模式的工作进程共用此函数。
+    """
+    # 创建二跳邻居网络
+    ego_start_time = datetime.now()
+    ego_graph, center_in_count, center_out_count = create_ego_network_fixed(G, user_id, radius=2, materialize=False)
+    ego_time = datetime.now() - ego_start_time
+    timings = {'ego_build': ego_time.total_seconds()}
+    
+    if ego_graph and ego_graph.number_of_nodes() > 1:
+        print(f"  - 双向二跳邻居网络创建完成，耗时: {ego_time}")
+    else:
+        print(f"  - 网络创建失败或节点数过少，跳过此用户")
+        return None
+    
+    # 🔥 修改：计算网络指标，传入用户类别信息
+    print(f"  - 开始计算选择的网络指标...")
+    metrics_start_time = datetime.now()
+    metrics = calculate_network_metrics_selected(ego_graph, user_id, selected_metrics, G, celebrity_users, user_categories,
+                                                 betweenness_mode=betweenness_mode, precomputed=precomputed, timings=timings,
+                                                 time_budgets=time_budgets, memory_budgets=memory_budgets,
+                                                 global_partition=global_partition,
+                                                 partition_refine_passes=partition_refine_passes)
+    metrics_time = datetime.now() - metrics_start_time
+    print(f"  - 网络指标计算完成, 总耗时: {metrics_time}")
+    timings['total'] = (datetime.now() - ego_start_time).total_seconds()
+    
+    ego_info = build_ego_info(ego_graph, metrics, selected_metrics, center_in_count, center_out_count)
+    return UserResult(metrics, ego_info, timings, peak_rss_mb(), ego_members(ego_graph))
+
+def precompute_batch_metrics(G, users, selected_metrics):
+    """在全图上为所有待计算用户批量计算局部指标，返回 {指标名: {user_id: 值}}"""
+    precomputed = {}
+    if 2 in selected_metrics:
+        start = datetime.now()
+        precomputed['clustering_coefficient'] = batch_clustering(G, users)
+        print(f"✅ 批量计算聚类系数完成：{len(precomputed['clustering_coefficient'])} 个用户，耗时: {datetime.now() - start}")
+    if 3 in selected_metrics:
+        start = datetime.now()
+        precomputed.update(batch_average_neighbor_degree(G, users))
+        print(f"✅ 批量计算邻居平均度完成：{len(precomputed['average_nearest_neighbor_degree'])} 个用户，耗时: {datetime.now() - start}")
+    return precomputed
+
+def compute_global_partition(G, summary):
+    """在全图上运行一次Louvain，返回各节点（按内部整数ID）的社区编号；社区数、全图模块度和耗时记入summary"""
+    start = datetime.now()
+    labels, Q = global_partition_labels(G, seed=LOUVAIN_SEED)
+    seconds = (datetime.now() - start).total_seconds()
+    n_communities = int(labels.max()) + 1 if len(labels) else 0
+    summary['global_partition'] = {'communities': n_communities, 'modularity': Q, 'seconds': seconds}
+    print(f"✅ 全图社区划分完成：{n_communities} 个社区，全图模块度 {Q:.6f}，耗时: {datetime.now() - start}")
+    return labels
+
+def modularity_tracking(records):
+    """比较各用户的快速估计（全图划分、细化后）与逐网络Louvain的模块度，返回 {估计名: 误差统计}
+
+    只统计两者都有值的用户；没有任何快速估计时返回空dict。
+    """
+    pairs = defaultdict(list)
+    for record in records:
+        metrics = record['network_metrics']
+        if metrics.get('modularity') is None:
+            continue
+        for key in ('modularity_global_partition', 'modularity_global_refined'):
+            if metrics.get(key) is not None:
+                pairs[key].append((metrics[key], metrics['modularity']))
+    tracking = {}
+    for key, values in pairs.items():
+        estimate, exact = np.asarray(values, dtype=np.float64).T
+        error = estimate - exact
+        stats = {
+            'users': int(len(error)),
+            'mean_error': float(error.mean()),
+            'mean_abs_error': float(np.abs(error).mean()),
+            'max_abs_error': float(np.abs(error).max()),
+        }
+        if len(error) > 1 and estimate.std() > 0 and exact.std() > 0:
+            stats['correlation'] = float(np.corrcoef(estimate, exact)[0, 1])
+        tracking[key] = stats
+    return tracking
+
+def run_calibration(G, users, costs, user_args, writer, n_samples=CALIBRATION_USERS):
+    """在主进程中计算按估计代价分位数抽取的少量用户，拟合 耗时~代价 模型
+
+    users/costs需已按LPT排序；返回 (剩余users, 剩余costs, 耗时模型)，样本不足时模型为None。
+    校准用户的结果照常写入进度文件。为免校准本身耗时过长，只从代价低于90%分位数的用户中抽取。
+    """
+    if len(users) <= n_samples or n_samples <= 0:
+        return users, costs, None
+    positions = np.unique(np.linspace(len(users) // 10, len(users) - 1, n_samples).astype(int))
+    sample_costs, sample_seconds = [], []
+    print(f"\n=== 耗时校准：先计算 {len(positions)} 个用户 ===")
+    for pos in positions:
+        user_id = users[pos]
+        start = datetime.now()
+        result = process_user(G, user_id, **user_args)
+        seconds = (datetime.now() - start).total_seconds()
+        if result is not None:
+            writer.add(user_id, *result)
+        else:
+            writer.add_skipped(user_id)
+        sample_costs.append(costs[pos])
+        sample_seconds.append(seconds)
+        print(f"  - 用户 {user_id}: 估计代价 {costs[pos]:.0f}, 耗时 {seconds:.2f}秒")
+    
+    keep = np.ones(len(users), dtype=bool)
+    keep[positions] = False
+    users = [u for u, k in zip(users, keep) if k]
+    costs = costs[keep]
+    
+    model = fit_runtime_model(sample_costs, sample_seconds)
+    print(f"⏱️ 耗时模型: 耗时 ≈ {model[0]:.3g} × (代价+1)^{model[1]:.2f} 秒")
+    return users, costs, model
+
+def print_eta(model, costs, workers):
+    """按耗时模型预测剩余用户的耗时，模拟LPT调度打印预计剩余耗时和完成时间；返回预计秒数"""
+    if model is None:
+        return None
+    costs = np.asarray(costs, dtype=np.float64)
+    runtimes = predict_runtimes(model, costs)
+    makespan = predict_makespan(runtimes, workers)
+    eta = datetime.now() + timedelta(seconds=makespan)
+    print(f"⏱️ 剩余 {len(costs)} 个用户，最大估计代价 {costs.max() if len(costs) else 0:.0f}，"
+          f"单进程总计算量约 {timedelta(seconds=round(float(runtimes.sum())))}")
+    print(f"⏱️ 预计剩余耗时（{workers} 个进程，LPT调度）: {timedelta(seconds=round(makespan))}，"
+          f"预计完成时间: {eta:%Y-%m-%d %H:%M:%S}")
+    return makespan
+
+class ResultWriter:
+    """结果的唯一写入方：缓冲若干用户后追加到两个JSONL进度文件（断点续传依赖网络指标文件及其完成索引）
+
+    同时统计本次运行处理/跳过/失败的用户数和各阶段耗时，供运行摘要使用；
+    给出timings_output时，每个用户的耗时、二跳网络规模和峰值内存另追加到该JSONL文件；
+    给出members_store（EgoMembershipWriter）时，二跳网络成员写入成员存储。
+    """
+    
+    def __init__(self, metrics_output, ego_networks_output, flush_every=10, timings_output=None, members_store=None,
+                 index=None):
+        self.metrics_output = metrics_output
+        self.ego_networks_output = ego_networks_output
+        self.index = index if index is not None else ProgressIndex(metrics_output)
+        self.timings_output = timings_output
+        self.batch_timings = []
+        self.members_store = members_store
+        self.batch_members = []
+        self.flush_every = flush_every
+        self.batch_metrics = {}
+        self.batch_ego_info = {}
+        self.batch_removed = []
+        self.removed = 0
+        self.processed = 0
+        self.skipped = []
+        self.failed = {}
+        self.timings = defaultdict(list)
+        self.fallbacks = defaultdict(lambda: defaultdict(int))
+        self.missing = defaultdict(lambda: defaultdict(int))
+        self.memory_exceeded = defaultdict(int)
+    
+    def add(self, user_id, metrics, ego_info, timings=None, peak_rss=None, members=None):
+        self.batch_metrics[user_id] = metrics
+        self.batch_ego_info[user_id] = ego_info
+        self.processed += 1
+        for stage, seconds in (timings or {}).items():
+            self.timings[stage].append(seconds)
+        if timings is not None:
+            self.batch_timings.append(timing_record(user_id, metrics, timings, peak_rss))
+        if members is not None and self.members_store is not None:
+            self.batch_members.append((user_id, members))
+        for key, reason in metrics.items():
+            if key.endswith('_fallback_reason'):
+                self.fallbacks[key[:-len('_fallback_reason')]][reason] += 1
+            elif key.endswith('_missing_reason'):
+                self.missing[key[:-len('_missing_reason')]][reason] += 1
+            elif key.endswith('_memory_exceeded_mb'):
+                self.memory_exceeded[key[:-len('_memory_exceeded_mb')]] += 1
+        # 每10个用户保存一次
+        if len(self.batch_metrics) >= self.flush_every:
+            self.flush()
+            print(f"  - 已保存 {self.flush_every} 个用户的结果")
+    
+    def flush(self):
+        if self.batch_removed:
+            self.removed += self.index.remove(self.batch_removed)
+            self.batch_removed.clear()
+        if not self.batch_metrics:
+            return
+        # 先写成员存储，再写进度文件：进度文件中出现的用户，其成员一定已经写入
+        if self.batch_members:
+            self.members_store.write_many(self.batch_members)
+            self.batch_members.clear()
+        self.index.append({user_id: {"user_id": user_id, "network_metrics": metrics}
+                           for user_id, metrics in self.batch_metrics.items()})
+        append_to_jsonl(self.batch_ego_info, self.ego_networks_output, is_metrics=False)
+        if self.timings_output and self.batch_timings:
+            with open(self.timings_output, 'a', encoding='utf-8') as f:
+                for record in self.batch_timings:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.batch_metrics.clear()
+        self.batch_ego_info.clear()
+        self.batch_timings.clear()
+    
+    def add_skipped(self, user_id):
+        """网络过小而跳过的用户：已有的旧记录（如增量重算前的结果）不再有效，写入删除标记"""
+        self.skipped.append(user_id)
+        self.batch_removed.append(user_id)
+    
+    def add_failed(self, user_id, error):
+        """计算失败的用户：同样删除已有的旧记录，下次续传时会重新计算"""
+        self.failed[user_id] = error
+        self.batch_removed.append(user_id)
+    
+    def timing_summary(self, budgets=None):
+        """每个阶段（二跳网络构建、各指标）的耗时统计；给出预算（秒）时统计超出预算的用户数"""
+        budgets = budgets or {}
+        summary = {}
+        for stage, values in self.timings.items():
+            values = np.asarray(values)
+            summary[stage] = {
+                'count': int(len(values)),
+                'total_seconds': float(values.sum()),
+                'mean_seconds': float(values.mean()),
+                'max_seconds': float(values.max()),
+                'p50_seconds': float(np.percentile(values, 50)),
+                'p95_seconds': float(np.percentile(values, 95)),
+                'p99_seconds': float(np.percentile(values, 99)),
+            }
+            if stage in budgets:
+                summary[stage]['budget_seconds'] = budgets[stage]
+                summary[stage]['over_budget'] = int((values > budgets[stage]).sum())
+        return summary
+
 def save_all_metrics_to_jsonl(all_metrics_data, output_path):
     """将所有网络指标保存到JSONL文件（完整重写）"""
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -643,322 +945,721 @@ def save_all_ego_networks_info(all_ego_networks_info, output_path):
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
     print(f"所有二跳邻居网络信息已保存到: {output_path}")
 
-def metrics_to_dataframe(metrics_data):
-    """将指标数据转换为DataFrame格式"""
-    records = []
-    for user_id, metrics in metrics_data.items():
-        record = {"user_id": user_id}
-        record.update(metrics)
-        records.append(record)
-    return pd.DataFrame(records)
+# 退出码：0 成功；1 运行异常；2 配置或输入文件错误；130 被中断（Ctrl+C）
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_CONFIG = 2
+EXIT_INTERRUPTED = 130
+
+# 运行配置的默认值；命令行参数和 --config 指定的JSON文件会覆盖这些值
+DEFAULT_CONFIG = {
+    'base_dir': 'C:/Tengfei/data/data/topic_networks/topic_孙颖莎',
+    'output_dir': 'C:/Tengfei/data/results/topic_孙颖莎_metrics',
+    'metrics': None,                 # 指标序号或指标名列表；None时交互式选择
+    'resume': 'ask',                 # 'resume' 断点续传 / 'restart' 重新开始 / 'ask' 交互式询问
+    'workers': WORKERS,
+    'chunk_size': CHUNK_SIZE,
+    'betweenness_mode': BETWEENNESS_MODE,
+    'batch_local_metrics': BATCH_LOCAL_METRICS,
+    'calibration_users': CALIBRATION_USERS,
+    'metric_budgets': {},            # {指标名: 每个用户的耗时预算（秒）}，超出时降级或记为缺失
+    'metric_memory_budgets': {},     # {指标名: 每个用户的内存预算（MB）}：按估计准入，实测峰值超出时另行标记
+    'summary_path': None,            # 运行摘要JSON；None时写到 output_dir/run_summary.json
+    'merged_format': 'csv',          # 合并结果格式：'csv' / 'parquet'（需要pyarrow）/ 'both'
+    'edge_deltas': [],               # 增量模式：边增量CSV列表（source, target[, change]），只重算受影响的用户
+    'previous_edges': None,          # 增量模式：变化前的edges.csv，与当前版本的边比较得到边增量
+    'since_version': None,           # 增量模式：与版本化网络目录中的该版本比较得到边增量
+    'recompute_users': [],           # 增量模式：需重算的用户列表CSV（user_id列，如清洗工具写出的affected_users_*.csv）
+    'global_partition': GLOBAL_PARTITION,                # 模块度另记录全图划分的快速估计
+    'partition_refine_passes': PARTITION_REFINE_PASSES,  # 快速估计的局部移动细化遍数
+}
+
+class ConfigError(Exception):
+    """配置错误或输入文件缺失（退出码2）"""
+
+def parse_metric_list(values):
+    """把指标序号/指标名列表解析为排好序的序号列表"""
+    name_to_num = {name: num for num, name in METRIC_NAMES.items()}
+    selected = set()
+    for value in values:
+        text = str(value).strip()
+        if text.isdigit() and int(text) in METRIC_NAMES:
+            selected.add(int(text))
+        elif text in name_to_num:
+            selected.add(name_to_num[text])
+        else:
+            raise ConfigError(f"未知的指标: {value}（可用: 1-6 或 {', '.join(METRIC_NAMES.values())}）")
+    return sorted(selected)
+
+def parse_metric_budgets(budgets):
+    """{指标序号或指标名: 秒或MB} -> {指标名: 秒或MB}"""
+    parsed = {}
+    for key, seconds in budgets.items():
+        name = key if key == 'ego_build' else METRIC_NAMES[parse_metric_list([key])[0]]
+        parsed[name] = float(seconds)
+    return parsed
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="计算每个用户双向二跳邻居网络的指标。不带任何参数运行时进入交互模式。")
+    parser.add_argument('--config', help="JSON配置文件，键与命令行参数同名（下划线形式），命令行参数优先")
+    parser.add_argument('--base-dir', help="话题网络目录（包含edges.csv、popularity.csv）")
+    parser.add_argument('--output-dir', help="结果输出目录")
+    parser.add_argument('--metrics', nargs='+', help="要计算的指标：序号1-6或指标名，如 1 2 3 或 density modularity")
+    parser.add_argument('--resume', choices=['resume', 'restart', 'ask'], help="已有进度文件时的处理方式")
+    parser.add_argument('--workers', type=int, help="工作进程数，1为顺序计算")
+    parser.add_argument('--chunk-size', type=int, help="每次派发给一个工作进程的用户数")
+    parser.add_argument('--betweenness-mode', choices=['ego', 'approx', 'full'], help="介数中心性计算方式")
+    parser.add_argument('--no-batch', action='store_true', help="不在全图上批量计算聚类系数/邻居平均度")
+    parser.add_argument('--calibration-users', type=int, help="预估耗时前先计算的用户数，0为不预估")
+    parser.add_argument('--budget', action='append', default=[], metavar='METRIC=SECONDS',
+                        help="每个用户单个指标的耗时预算，可重复，如 --budget betweenness_centrality=60")
+    parser.add_argument('--memory-budget', action='append', default=[], metavar='METRIC=MB',
+                        help="每个用户单个指标的内存预算，可重复，如 --memory-budget modularity=2048；"
+                             "估计内存超出时降级或记为缺失，实测峰值内存增长超出时记录 <指标>_memory_exceeded_mb")
+    parser.add_argument('--summary', help="运行摘要JSON的输出路径")
+    parser.add_argument('--merged-format', choices=MERGED_FORMATS, help="合并结果的格式（parquet需要pyarrow）")
+    parser.add_argument('--edge-delta', action='append', default=[], metavar='PATH',
+                        help="增量模式：边增量CSV（如new_edges_found_*.csv），可重复；只重算二跳网络受影响的用户")
+    parser.add_argument('--previous-edges', metavar='PATH',
+                        help="增量模式：变化前的edges.csv（如 versioned_dataset.py export 导出的旧版本；"
+                             "网络目录有版本记录时可直接用--since-version），与当前edges.csv比较")
+    parser.add_argument('--since-version', type=int, metavar='N',
+                        help="增量模式：与网络目录的第N个数据版本（versions/manifest.json）比较，只重算受影响的用户")
+    parser.add_argument('--recompute-users', action='append', default=[], metavar='PATH',
+                        help="增量模式：需重算的用户列表CSV（user_id列，如affected_users_*.csv），可重复")
+    parser.add_argument('--global-partition', action='store_true',
+                        help="计算模块度时先在全图上运行一次Louvain，另记录其限制到二跳网络上的模块度（快速估计）")
+    parser.add_argument('--partition-refine-passes', type=int, metavar='N',
+                        help="快速估计的局部移动细化遍数，0为不细化")
+    return parser
 
-def main():
-    """主函数"""
-    # 设置信号处理器，优雅处理Ctrl+C
-    signal.signal(signal.SIGINT, signal_handler)
+def load_run_config(argv=None, parser=None, defaults=None):
+    """合并默认值、配置文件和命令行参数；不带任何参数时为交互模式
+
+    parser/defaults供其他入口（如多话题批量运行）扩展参数和配置键，返回 (config, args)。
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    args = (parser or build_arg_parser()).parse_args(argv)
+    config = dict(defaults or DEFAULT_CONFIG)
     
-    start_time = datetime.now()
-    print(f"开始分析时间: {start_time}")
-    print("使用修复版EasyGraph ego_graph，真正支持双向边")
-    print("支持交互式选择网络指标")
-    print("支持断点续传功能")
-    print("🔥 已修复介数中心性计算和Ctrl+C处理")
-    print("🔥 新增全图度数信息：出度、入度、总度数")
-    print("🔥 新增明星用户标识：基于high_fans_users.csv")
-    print("🔥 新增用户类别信息：A/B/C类标识")
-    print("🔥 新增双重影响力指标：支持avg_popularity_of_all")
+    if args.config:
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                file_config = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"无法读取配置文件 {args.config}: {e}")
+        unknown = set(file_config) - set(config)
+        if unknown:
+            raise ConfigError(f"配置文件中有未知的键: {sorted(unknown)}")
+        config.update(file_config)
     
+    overrides = {
+        'base_dir': args.base_dir, 'output_dir': args.output_dir, 'metrics': args.metrics,
+        'resume': args.resume, 'workers': args.workers, 'chunk_size': args.chunk_size,
+        'betweenness_mode': args.betweenness_mode, 'calibration_users': args.calibration_users,
+        'summary_path': args.summary, 'merged_format': args.merged_format,
+        'previous_edges': args.previous_edges, 'since_version': args.since_version,
+        'partition_refine_passes': args.partition_refine_passes,
+    }
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    if args.no_batch:
+        config['batch_local_metrics'] = False
+    if args.global_partition:
+        config['global_partition'] = True
+    config['edge_deltas'] = list(config['edge_deltas']) + args.edge_delta
+    config['recompute_users'] = list(config['recompute_users']) + args.recompute_users
+    budgets = dict(config['metric_budgets'])
+    memory_budgets = dict(config['metric_memory_budgets'])
+    for items, target, label in ((args.budget, budgets, "耗时预算: {}（格式为 METRIC=SECONDS）"),
+                                 (args.memory_budget, memory_budgets, "内存预算: {}（格式为 METRIC=MB）")):
+        for item in items:
+            metric, _, amount = item.partition('=')
+            try:
+                target[metric] = float(amount)
+            except ValueError:
+                raise ConfigError("无效的" + label.format(item))
+    
+    config['interactive'] = len(argv) == 0
+    if config['metrics'] is not None:
+        config['metrics'] = parse_metric_list(config['metrics'])
+    elif not config['interactive']:
+        raise ConfigError("非交互模式需要通过 --metrics 或配置文件指定要计算的指标")
+    if not config['interactive'] and config['resume'] == 'ask':
+        config['resume'] = 'resume'
     try:
-        # 交互式选择指标
-        selected_metrics = get_user_selected_metrics()
-        if not selected_metrics:
-            print("❌ 未选择任何指标，程序退出")
-            return
-        
-        # 显示最终选择
-        metric_names = {
-            1: "密度", 2: "聚类系数", 3: "邻居平均度",
-            4: "介数中心性", 5: "谱半径", 6: "模块度"
-        }
-        print(f"\n✅ 将计算以下 {len(selected_metrics)} 个指标:")
-        for num in selected_metrics:
-            print(f"   - {metric_names[num]}")
-        print(f"✅ 同时记录：出度、入度、总度数、二跳网络节点数、二跳网络边数、是否明星用户、用户类别")
-        
-        # 设置路径
-        base_dir = 'C:/Tengfei/data/data/topic_networks/topic_孙颖莎'
-        edges_path = os.path.join(base_dir, 'edges.csv')
-        popularity_path = os.path.join(base_dir, 'popularity.csv')
-        output_dir = f'C:/Tengfei/data/results/topic_孙颖莎_metrics'
-        metrics_output = os.path.join(output_dir, 'network_metrics.jsonl')
-        ego_networks_output = os.path.join(output_dir, 'ego_networks_info.jsonl')
-        
-        # 确保输出目录存在
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        # 检查输入文件
-        if not os.path.exists(edges_path):
-            print(f"❌ 未找到edges.csv文件: {edges_path}")
-            return
-        
-        if not os.path.exists(popularity_path):
-            print(f"❌ 未找到popularity.csv文件: {popularity_path}")
-            return
-        
-        # 加载明星用户列表
-        celebrity_users = load_celebrity_users(base_dir)
-        
-        # 🔥 新增：加载用户类别信息
-        user_categories = load_user_categories(base_dir)
-        
-        print("正在加载网络数据...")
-        edges_df = pd.read_csv(edges_path)
-        popularity_df = pd.read_csv(popularity_path)
-        
-        # 预处理：规范化ID
-        print("正在规范化用户ID...")
-        edges_df['source'] = edges_df['source'].apply(normalize_id)
-        edges_df['target'] = edges_df['target'].apply(normalize_id)
-        popularity_df['user_id'] = popularity_df['user_id'].apply(normalize_id)
-        
-        # 🔥 新增：检查是否有avg_popularity_of_all列
-        has_total_popularity = 'avg_popularity_of_all' in popularity_df.columns
-        if has_total_popularity:
-            print(f"✅ 检测到总体影响力列 (avg_popularity_of_all)")
-            non_zero_total = (popularity_df['avg_popularity_of_all'] > 0).sum()
-            print(f"   有 {non_zero_total} 个用户具有非零总体影响力")
-        else:
-            print(f"⚠️ 未检测到总体影响力列，请先运行fetch3_helper.py")
-        
-        # 构建有向图
-        print("正在构建网络...")
-        G = eg.DiGraph()
-        edge_count = 0
-        for _, row in edges_df.iterrows():
-            source = str(row['source'])
-            target = str(row['target'])
-            G.add_edge(source, target)
-            edge_count += 1
-            if edge_count % 10000 == 0:
-                print(f"已加载 {edge_count} 条边")
-        
-        print(f"网络构建完成，包含 {G.number_of_nodes()} 个节点和 {G.number_of_edges()} 条边")
+        config['metric_budgets'] = parse_metric_budgets(budgets)
+        config['metric_memory_budgets'] = parse_metric_budgets(memory_budgets)
+    except ConfigError as e:
+        raise ConfigError(f"预算中的{e}")
+    if config['betweenness_mode'] == 'full' and 'betweenness_centrality' in config['metric_budgets']:
+        raise ConfigError("betweenness_mode='full' 无法按耗时预算中断，不能为 betweenness_centrality 设置耗时预算"
+                          "（改用 ego/approx 模式，或去掉该预算）")
+    if config['merged_format'] not in MERGED_FORMATS:
+        raise ConfigError(f"未知的合并结果格式: {config['merged_format']}（可用: {', '.join(MERGED_FORMATS)}）")
+    if config['merged_format'] != 'csv' and not parquet_available():
+        raise ConfigError("输出Parquet需要安装pyarrow（pip install pyarrow），或使用 --merged-format csv")
+    if config['workers'] < 1 or config['chunk_size'] < 1:
+        raise ConfigError("workers 和 chunk_size 必须为正整数")
+    if config['partition_refine_passes'] < 0:
+        raise ConfigError("partition_refine_passes 不能为负数")
+    return config, args
+
+def ask_resume_mode():
+    """交互式询问：已有进度文件时是否断点续传"""
+    print(f"\n发现已有的进度文件，选择运行模式:")
+    print(f"1. 断点续传（推荐）")
+    print(f"2. 重新开始")
+    
+    while True:
+        choice = input("请选择 (1/2): ").strip()
+        if choice in ['1', '2']:
+            break
+        print("请输入有效选项 (1/2)")
+    return choice == '1'
+
+def merge_with_popularity(iter_records, popularity_df, has_total_popularity, output_dir, G=None, merged_format='csv',
+                          chunk_size=MERGE_CHUNK_SIZE):
+    """网络指标与影响力合并，保存merged_metrics_popularity.csv（和/或.parquet）并打印统计；返回 (输出路径, 行数)
+
+    iter_records为每次调用都返回新指标记录迭代器的函数（通常是ProgressIndex.iter_records）。
+    合并是对network_metrics.jsonl的流式处理：popularity按驻留后的整数ID存成数组查找，
+    记录按块转换、内连接后追加写出，统计量逐块累计，峰值内存只与块大小有关。
+    """
+    merged_output = os.path.join(output_dir, 'merged_metrics_popularity.csv')
+    parquet_output = os.path.join(output_dir, 'merged_metrics_popularity.parquet')
+    if next(iter(iter_records()), None) is None:
+        return None, 0
+    
+    # 🔥 修改：合并两种影响力指标
+    if has_total_popularity:
+        popularity_columns = ['avg_popularity', 'avg_popularity_of_all']
+        print(f"✅ 已合并两种影响力指标: avg_popularity (最新10条) 和 avg_popularity_of_all (总体)")
+    else:
+        popularity_columns = ['avg_popularity']
+        print(f"⚠️ 只有一种影响力指标: avg_popularity (最新10条)")
+    
+    # 流式合并并保存
+    lookup = PopularityLookup(popularity_df, popularity_columns, G)
+    csv_path = merged_output if merged_format in ('csv', 'both') else None
+    parquet_path = parquet_output if merged_format in ('parquet', 'both') else None
+    stats = stream_merge(iter_records, lookup, output_csv=csv_path, output_parquet=parquet_path, chunk_size=chunk_size)
+    for path in (csv_path, parquet_path):
+        if path:
+            print(f"合并数据已保存到: {path}")
+    print(f"包含 {stats.rows} 行数据")
+    
+    # 显示计算的指标
+    calculated_metrics = [col for col in stats.columns if col not in ['user_id', 'center_node', 'avg_popularity', 'avg_popularity_of_all']]
+    print(f"\n✅ 已计算的指标和信息: {calculated_metrics}")
+    if stats.rows == 0:
+        return csv_path or parquet_path, 0
+    
+    # 显示度数统计
+    if 'global_out_degree' in stats.columns:
+        print(f"\n📊 度数统计:")
+        print(f"   平均出度: {stats.mean('global_out_degree'):.2f}")
+        print(f"   平均入度: {stats.mean('global_in_degree'):.2f}")
+        print(f"   平均总度数: {stats.mean('global_total_degree'):.2f}")
+    
+    # 显示明星用户统计
+    if 'is_celebrity' in stats.columns:
+        celebrity_count = stats.counts['is_celebrity']
+        print(f"\n🌟 明星用户统计:")
+        print(f"   明星用户数量: {celebrity_count}")
+        print(f"   明星用户比例: {celebrity_count/stats.rows*100:.2f}%")
+    
+    # 🔥 新增：显示用户类别统计
+    if 'user_category' in stats.columns:
+        print(f"\n📋 用户类别统计:")
+        for category, count in sorted(stats.categories.items(), key=lambda item: -item[1]):
+            print(f"   {category}类用户: {count} 个 ({count/stats.rows*100:.1f}%)")
+    
+    # 🔥 新增：显示影响力对比统计
+    if has_total_popularity:
+        print(f"\n📊 双重影响力对比:")
+        # 有效数据（非零）的统计
+        valid_recent = stats.counts['avg_popularity']
+        valid_total = stats.counts['avg_popularity_of_all']
         
-        # 获取需要计算的用户列表
-        users_to_process = set(popularity_df['user_id'].tolist())
-        users_in_graph = set(str(node) for node in G.nodes)
-        valid_users = users_to_process.intersection(users_in_graph)
+        print(f"   最新10条影响力 > 0: {valid_recent} 个用户 ({valid_recent/stats.rows*100:.1f}%)")
+        print(f"   总体影响力 > 0: {valid_total} 个用户 ({valid_total/stats.rows*100:.1f}%)")
         
-        print(f"\n=== 用户匹配统计 ===")
-        print(f"Popularity文件中用户总数: {len(users_to_process)}")
-        print(f"图中节点总数: {len(G.nodes)}")
-        print(f"有效匹配用户数: {len(valid_users)}")
+        if valid_recent:
+            print(f"   最新10条平均值: {stats.positive_mean('avg_popularity'):.2f}")
+        if valid_total:
+            print(f"   总体平均值: {stats.positive_mean('avg_popularity_of_all'):.2f}")
+    
+    return csv_path or parquet_path, stats.rows
+
+class TopicRun:
+    """一个话题网络的一次计算：全图、待计算用户（LPT顺序）及估计代价、结果写入方，以及合并输出所需的数据"""
+    
+    def __init__(self, name, base_dir, output_dir):
+        self.name = name
+        self.base_dir = base_dir
+        self.output_dir = output_dir
+        self.metrics_output = os.path.join(output_dir, 'network_metrics.jsonl')
+        self.ego_networks_output = os.path.join(output_dir, 'ego_networks_info.jsonl')
+        self.timings_output = os.path.join(output_dir, 'timings.jsonl')
+        self.merged_format = 'csv'
+        self.ego_members_dir = os.path.join(output_dir, 'ego_members')
+        self.G = None
+        self.popularity_df = None
+        self.has_total_popularity = False
+        self.user_args = None
+        self.users = []
+        self.costs = np.zeros(0)
+        self.writer = None
+        self.total_users = 0
+        self.processed_count = 0
+
+def prepare_topic(config, selected_metrics, summary, name=None):
+    """加载话题网络、确定待计算用户（断点续传）、批量预计算局部指标，返回TopicRun
+
+    summary中记录图规模、用户数和load/precompute阶段耗时。
+    """
+    run = TopicRun(name, config['base_dir'], config['output_dir'])
+    run.merged_format = config['merged_format']
+    stage_seconds = summary.setdefault('stage_seconds', {})
+    stage_start = datetime.now()
+    edges_path = os.path.join(run.base_dir, 'edges.csv')
+    popularity_path = os.path.join(run.base_dir, 'popularity.csv')
+    
+    # 检查输入文件
+    if not os.path.exists(edges_path):
+        raise ConfigError(f"未找到edges.csv文件: {edges_path}")
+    if not os.path.exists(popularity_path):
+        raise ConfigError(f"未找到popularity.csv文件: {popularity_path}")
+    
+    # 确保输出目录存在
+    if not os.path.exists(run.output_dir):
+        os.makedirs(run.output_dir)
+    
+    # 版本化网络目录：用户表、明星用户和边在读取时都应用各版本的增量（如清洗删除的用户）
+    dataset = VersionedDataset(run.base_dir)
+    if dataset.versions():
+        print(f"📚 数据版本: {dataset.current_version}（共 {dataset.latest_version} 个版本）")
+    summary['dataset_version'] = dataset.current_version
+    
+    # 加载明星用户列表
+    celebrity_users = load_celebrity_users(dataset)
+    
+    # 🔥 新增：加载用户类别信息
+    user_categories = load_user_categories(dataset)
+    
+    print("正在加载网络数据...")
+    # 向量化读取并规范化ID，边直接驻留为整数ID数组
+    edge_table = dataset.load_edges(deduplicate=False)
+    run.popularity_df = dataset.load_popularity()
+    
+    # 🔥 新增：检查是否有avg_popularity_of_all列
+    run.has_total_popularity = 'avg_popularity_of_all' in run.popularity_df.columns
+    if run.has_total_popularity:
+        print(f"✅ 检测到总体影响力列 (avg_popularity_of_all)")
+        non_zero_total = (run.popularity_df['avg_popularity_of_all'] > 0).sum()
+        print(f"   有 {non_zero_total} 个用户具有非零总体影响力")
+    else:
+        print(f"⚠️ 未检测到总体影响力列，请先运行fetch3_helper.py")
+    
+    # 构建有向图（CSR紧凑存储）
+    print("正在构建网络...")
+    G = run.G = CSRGraph.from_edge_table(edge_table)
+    del edge_table
+    
+    print(f"网络构建完成，包含 {G.number_of_nodes()} 个节点和 {G.number_of_edges()} 条边")
+    
+    # 获取需要计算的用户列表
+    users_to_process = set(run.popularity_df['user_id'].tolist())
+    users_in_graph = set(G.nodes)
+    valid_users = users_to_process.intersection(users_in_graph)
+    
+    print(f"\n=== 用户匹配统计 ===")
+    print(f"Popularity文件中用户总数: {len(users_to_process)}")
+    print(f"图中节点总数: {G.number_of_nodes()}")
+    print(f"有效匹配用户数: {len(valid_users)}")
+    if users_to_process:
         print(f"匹配率: {len(valid_users)/len(users_to_process)*100:.2f}%")
-        print(f"明星用户总数: {len(celebrity_users)}")
-        print(f"用户类别信息总数: {len(user_categories)}")
+    print(f"明星用户总数: {len(celebrity_users)}")
+    print(f"用户类别信息总数: {len(user_categories)}")
+    summary.update({'graph_nodes': G.number_of_nodes(), 'graph_edges': G.number_of_edges(),
+                    'users_total': len(valid_users)})
+    
+    # 检查断点续传
+    has_existing_files = os.path.exists(run.metrics_output) or os.path.exists(run.ego_networks_output)
+    if not has_existing_files:
+        resume_mode = False
+    elif config['resume'] == 'ask':
+        resume_mode = ask_resume_mode()
+    else:
+        resume_mode = config['resume'] == 'resume'
+    
+    incremental = bool(config['edge_deltas'] or config['previous_edges'] or config['since_version'] is not None
+                       or config['recompute_users'])
+    if incremental and not resume_mode:
+        print("⚠️ 重新开始模式下会计算全部用户，忽略边增量和重算用户列表")
+    
+    index = None
+    if resume_mode:
+        print(f"\n=== 断点续传模式 ===")
+        index = load_existing_progress(run.metrics_output)
+        # 已不在本次应计算范围内的用户（如被清洗删除、不再在网络中）：旧记录写入删除标记
+        stale_removed = index.remove(sorted(index.completed_users() - valid_users))
+        if stale_removed:
+            print(f"🗑️ 已删除 {stale_removed} 个不再在网络中的用户的旧记录")
+        summary['stale_records_removed'] = stale_removed
+        completed_users = index.completed_users()
         
-        # 检查断点续传
-        has_existing_files = os.path.exists(metrics_output) or os.path.exists(ego_networks_output)
+        remaining_users = valid_users - completed_users
+        print(f"总用户数: {len(valid_users)}")
+        print(f"已完成用户数: {len(completed_users)}")
+        print(f"剩余用户数: {len(remaining_users)}")
         
-        if has_existing_files:
-            print(f"\n发现已有的进度文件，选择运行模式:")
-            print(f"1. 断点续传（推荐）")
-            print(f"2. 重新开始")
-            
-            while True:
-                choice = input("请选择 (1/2): ").strip()
-                if choice in ['1', '2']:
-                    break
-                print("请输入有效选项 (1/2)")
-            
-            resume_mode = (choice == '1')
+        if incremental:
+            affected, stats = find_affected_users(G, config, dataset)
+            recompute, plan = plan_recompute(affected, completed_users, valid_users,
+                                             costs_fn=lambda users: estimate_ego_costs(G, users))
+            stats.update(plan)
+            stats['removed_records'] = stale_removed
+            summary['incremental'] = stats
+            print_incremental_plan(stats)
+            remaining_users = remaining_users | recompute
+        elif len(remaining_users) == 0:
+            print("所有用户已处理完成")
+        users_to_calculate = remaining_users
+    else:
+        print(f"\n=== 全新开始模式 ===")
+        if os.path.exists(run.metrics_output):
+            os.remove(run.metrics_output)
+        if os.path.exists(run.metrics_output + INDEX_SUFFIX):
+            os.remove(run.metrics_output + INDEX_SUFFIX)
+        if os.path.exists(run.ego_networks_output):
+            os.remove(run.ego_networks_output)
+        if os.path.exists(run.timings_output):
+            os.remove(run.timings_output)
+        if os.path.exists(run.ego_members_dir):
+            shutil.rmtree(run.ego_members_dir)
+        users_to_calculate = valid_users
+    summary['users_already_done'] = len(valid_users) - len(users_to_calculate)
+    run.writer = ResultWriter(run.metrics_output, run.ego_networks_output, timings_output=run.timings_output,
+                              members_store=EgoMembershipWriter(run.ego_members_dir, G), index=index)
+    run.total_users = len(valid_users)
+    run.processed_count = len(valid_users) - len(users_to_calculate)
+    stage_seconds['load'] = (datetime.now() - stage_start).total_seconds()
+    stage_start = datetime.now()
+    
+    # 由度数数组估计每个用户的二跳网络规模，按LPT排序；在全图上批量预计算局部指标
+    users_list = list(users_to_calculate)
+    run.users, run.costs = lpt_order(users_list, estimate_ego_costs(G, users_list))
+    precomputed = None
+    if config['batch_local_metrics'] and run.users:
+        precomputed = precompute_batch_metrics(G, run.users, selected_metrics)
+    global_partition = None
+    if config['global_partition'] and run.users:
+        if 6 in selected_metrics:
+            global_partition = compute_global_partition(G, summary)
         else:
-            resume_mode = False
-        
-        # 初始化数据
-        all_metrics_data = {}
-        all_ego_networks_info = {}
-        
-        if resume_mode:
-            print(f"\n=== 断点续传模式 ===")
-            completed_users, existing_metrics, existing_ego_info = load_existing_progress(metrics_output, ego_networks_output)
-            
-            remaining_users = valid_users - completed_users
-            print(f"总用户数: {len(valid_users)}")
-            print(f"已完成用户数: {len(completed_users)}")
-            print(f"剩余用户数: {len(remaining_users)}")
-            
-            if len(remaining_users) == 0:
-                print("所有用户已处理完成")
-                all_metrics_data = existing_metrics
-                all_ego_networks_info = existing_ego_info
-            else:
-                all_metrics_data = existing_metrics.copy()
-                all_ego_networks_info = existing_ego_info.copy()
-                users_to_calculate = remaining_users
+            print("⚠️ 未选择模块度，忽略全图划分（--global-partition）")
+    run.user_args = {
+        'selected_metrics': selected_metrics,
+        'celebrity_users': celebrity_users,
+        'user_categories': user_categories,
+        'betweenness_mode': config['betweenness_mode'],
+        'precomputed': precomputed,
+        'time_budgets': config['metric_budgets'],
+        'memory_budgets': config['metric_memory_budgets'],
+        'global_partition': global_partition,
+        'partition_refine_passes': config['partition_refine_passes'],
+    }
+    stage_seconds['precompute'] = (datetime.now() - stage_start).total_seconds()
+    return run
+
+def load_topic_edge_delta(config, dataset):
+    """按配置读取边增量：--edge-delta 文件、--previous-edges 或 --since-version 与当前版本的差异（可同时给出）"""
+    try:
+        delta = load_edge_delta(config['edge_deltas'])
+        diffs = []
+        if config['previous_edges']:
+            if not os.path.exists(config['previous_edges']):
+                raise FileNotFoundError(f"未找到变化前的edges文件: {config['previous_edges']}")
+            diffs.append(edges_to_dataframe(load_edges(config['previous_edges'])))
+        if config['since_version'] is not None:
+            diffs.append(dataset.edges_frame(config['since_version']))
+        current = dataset.edges_frame() if diffs else None
+        for before in diffs:
+            diff = diff_edges(before, current)
+            delta = delta._replace(
+                added=pd.concat([delta.added, diff.added], ignore_index=True).drop_duplicates(ignore_index=True),
+                removed=pd.concat([delta.removed, diff.removed], ignore_index=True).drop_duplicates(ignore_index=True))
+    except (OSError, ValueError, KeyError) as e:
+        raise ConfigError(f"无法读取边增量: {e}")
+    return delta
+
+def find_affected_users(G, config, dataset):
+    """增量模式下受影响的用户：边增量涉及的中心节点 ∪ 用户列表文件中的用户；返回 (用户集合, 统计dict)"""
+    affected, stats = set(), {}
+    if config['edge_deltas'] or config['previous_edges'] or config['since_version'] is not None:
+        delta = load_topic_edge_delta(config, dataset)
+        affected = affected_centres(G, delta)
+        stats.update({'edges_added': len(delta.added), 'edges_removed': len(delta.removed),
+                      'affected_centres': len(affected)})
+    if config['recompute_users']:
+        try:
+            listed = load_user_list(config['recompute_users'])
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"无法读取重算用户列表: {e}")
+        affected |= listed
+        stats['listed_users'] = len(listed)
+    return affected, stats
+
+def print_incremental_plan(stats):
+    print(f"\n=== 增量模式 ===")
+    if 'affected_centres' in stats:
+        print(f"边增量: 新增 {stats['edges_added']} 条，删除 {stats['edges_removed']} 条")
+        print(f"二跳网络受影响的中心节点: {stats['affected_centres']} 个")
+    if 'listed_users' in stats:
+        print(f"重算用户列表中的用户: {stats['listed_users']} 个")
+    print(f"需重算的已完成用户: {stats['recomputed_users']} 个，新用户: {stats['new_users']} 个")
+    print(f"沿用已有记录: {stats['reused_records']} 个用户")
+    if stats.get('removed_records'):
+        print(f"删除旧记录: {stats['removed_records']} 个不再在网络中的用户")
+    if 'skipped_cost_share' in stats:
+        print(f"跳过的估计计算量: {stats['skipped_cost_share'] * 100:.1f}%")
+
+def make_result_handler(run):
+    """并行模式下的结果回调：由主进程（唯一写入方）记录结果并打印进度"""
+    label = f"[{run.name}] " if run.name else ""
+    
+    def on_result(user_id, result, error):
+        run.processed_count += 1
+        completion = run.processed_count / run.total_users * 100
+        if error is not None:
+            run.writer.add_failed(user_id, error)
+            print(f"{label}处理用户 {user_id} 失败 (第{run.processed_count}/{run.total_users}个): {error}")
+        elif result is None:
+            run.writer.add_skipped(user_id)
+            print(f"{label}处理用户 {user_id} 跳过：网络创建失败或节点数过少 (第{run.processed_count}/{run.total_users}个)")
         else:
-            print(f"\n=== 全新开始模式 ===")
-            if os.path.exists(metrics_output):
-                os.remove(metrics_output)
-            if os.path.exists(ego_networks_output):
-                os.remove(ego_networks_output)
-            users_to_calculate = valid_users
+            run.writer.add(user_id, *result)
+            print(f"{label}处理用户 {user_id} 完成 (第{run.processed_count}/{run.total_users}个, 完成{completion:.1f}%), "
+                  f"二跳网络 {result[1]['node_count']} 个节点")
+    return on_result
+
+def compute_topic_sequential(run):
+    """在主进程中逐个计算剩余用户"""
+    for user_id in run.users:
+        run.processed_count += 1
+        completion = run.processed_count / run.total_users * 100
+        print(f"\n处理用户 {user_id} (第{run.processed_count}/{run.total_users}个, 完成{completion:.1f}%):")
         
-        # 计算网络指标
-        if len(users_to_calculate) > 0:
-            processed_count = len(valid_users) - len(users_to_calculate)
-            total_users = len(valid_users)
-            
-            print(f"开始计算 {len(users_to_calculate)} 个用户的网络指标...")
-            batch_metrics = {}
-            batch_ego_info = {}
-            
-            for user_id in users_to_calculate:
-                processed_count += 1
-                completion = processed_count / total_users * 100
-                print(f"\n处理用户 {user_id} (第{processed_count}/{total_users}个, 完成{completion:.1f}%):")
-                
-                # 创建二跳邻居网络
-                ego_start_time = datetime.now()
-                ego_graph = create_ego_network_fixed(G, user_id, radius=2)
-                ego_time = datetime.now() - ego_start_time
-                
-                if ego_graph and ego_graph.number_of_nodes() > 1:
-                    print(f"  - 双向二跳邻居网络创建完成，耗时: {ego_time}")
-                else:
-                    print(f"  - 网络创建失败或节点数过少，跳过此用户")
-                    continue
-                
-                # 🔥 修改：计算网络指标，传入用户类别信息
-                print(f"  - 开始计算选择的网络指标...")
-                metrics_start_time = datetime.now()
-                metrics = calculate_network_metrics_selected(ego_graph, user_id, selected_metrics, G, celebrity_users, user_categories)
-                metrics_time = datetime.now() - metrics_start_time
-                print(f"  - 网络指标计算完成, 总耗时: {metrics_time}")
-                
-                # 保存数据
-                batch_metrics[user_id] = metrics
-                all_metrics_data[user_id] = metrics
-                
-                # 存储ego网络信息，包含用户类别
-                ego_info = {
-                    'node_count': ego_graph.number_of_nodes(),
-                    'edge_count': ego_graph.number_of_edges(),
-                    'nodes': list(ego_graph.nodes),
-                    'selected_metrics': selected_metrics,
-                    'global_out_degree': metrics.get('global_out_degree', 0),
-                    'global_in_degree': metrics.get('global_in_degree', 0),
-                    'global_total_degree': metrics.get('global_total_degree', 0),
-                    'is_celebrity': metrics.get('is_celebrity', False),
-                    'user_category': metrics.get('user_category', 'Unknown'),  # 🔥 新增
-                    'metrics': {k: v for k, v in metrics.items() if k not in ['node_count', 'edge_count', 'center_node', 'global_out_degree', 'global_in_degree', 'global_total_degree', 'is_celebrity', 'user_category']}
-                }
-                batch_ego_info[user_id] = ego_info
-                all_ego_networks_info[user_id] = ego_info
-                
-                # 每10个用户保存一次
-                if len(batch_metrics) >= 10:
-                    append_to_jsonl(batch_metrics, metrics_output, is_metrics=True)
-                    append_to_jsonl(batch_ego_info, ego_networks_output, is_metrics=False)
-                    print(f"  - 已保存 {len(batch_metrics)} 个用户的结果")
-                    batch_metrics.clear()
-                    batch_ego_info.clear()
+        try:
+            result = process_user(run.G, user_id, **run.user_args)
+        except Exception as e:
+            run.writer.add_failed(user_id, f"{type(e).__name__}: {e}")
+            print(f"  - ❌ 处理用户 {user_id} 失败: {e}")
+            continue
+        if result is not None:
+            run.writer.add(user_id, *result)
+        else:
+            run.writer.add_skipped(user_id)
+
+def calibrate_topic(run, n_samples):
+    """对一个话题先计算少量校准用户，返回耗时模型（并从待计算列表中移除这些用户）"""
+    before = len(run.users)
+    run.users, run.costs, model = run_calibration(run.G, run.users, run.costs, run.user_args, run.writer,
+                                                  n_samples=n_samples)
+    run.processed_count += before - len(run.users)
+    return model
+
+def record_run_results(run, summary, budgets):
+    """把写入方统计的计数、耗时和指标降级/缺失次数写入summary，并提示超出预算的指标"""
+    summary.update({
+        'users_processed': run.writer.processed,
+        'users_skipped': len(run.writer.skipped),
+        'users_failed': len(run.writer.failed),
+        'failed_users': run.writer.failed,
+        'records_removed': run.writer.removed,
+        'metric_timings': run.writer.timing_summary(budgets),
+        'metric_fallbacks': {name: dict(reasons) for name, reasons in run.writer.fallbacks.items()},
+        'metric_missing': {name: dict(reasons) for name, reasons in run.writer.missing.items()},
+        'metric_memory_exceeded': dict(run.writer.memory_exceeded),
+    })
+    for stage, stats in summary['metric_timings'].items():
+        if stats.get('over_budget'):
+            print(f"⚠️ {stage}: {stats['over_budget']} 个用户超出耗时预算 {stats['budget_seconds']} 秒")
+    for name, reasons in summary['metric_fallbacks'].items():
+        print(f"⚠️ {name}: {sum(reasons.values())} 个用户改用降级方法 {reasons}")
+    for name, reasons in summary['metric_missing'].items():
+        print(f"⚠️ {name}: {sum(reasons.values())} 个用户记为缺失 {reasons}")
+    for name, count in summary['metric_memory_exceeded'].items():
+        print(f"⚠️ {name}: {count} 个用户实测峰值内存增长超出内存预算")
+
+def finalize_topic(run, summary):
+    """合并网络指标与影响力，写出merged_metrics_popularity.csv，记录输出文件"""
+    stage_start = datetime.now()
+    print("正在生成合并数据文件...")
+    merged_output, merged_rows = merge_with_popularity(run.writer.index.iter_records, run.popularity_df,
+                                                       run.has_total_popularity, run.output_dir, G=run.G,
+                                                       merged_format=run.merged_format)
+    summary.setdefault('stage_seconds', {})['merge'] = (datetime.now() - stage_start).total_seconds()
+    summary['outputs'] = {
+        'network_metrics': run.metrics_output,
+        'ego_networks_info': run.ego_networks_output,
+        'ego_members': run.ego_members_dir,
+        'merged_metrics_popularity': merged_output,
+    }
+    summary['merged_rows'] = merged_rows
+    tracking = modularity_tracking(run.writer.index.iter_records())
+    if tracking:
+        summary['modularity_tracking'] = tracking
+        for key, stats in tracking.items():
+            correlation = f", 相关系数 {stats['correlation']:.4f}" if 'correlation' in stats else ""
+            print(f"📐 {key} 与逐网络Louvain对比（{stats['users']} 个用户）: 平均误差 {stats['mean_error']:.6f}, "
+                  f"平均绝对误差 {stats['mean_abs_error']:.6f}, 最大绝对误差 {stats['max_abs_error']:.6f}{correlation}")
+    if os.path.exists(run.timings_output):
+        summary['outputs']['timings'] = run.timings_output
+        summary['outputs']['timing_report'] = write_timing_report(run.timings_output)
+    
+    print(f"生成的文件:")
+    print(f"  - 网络指标: {run.metrics_output}")
+    print(f"  - 邻居网络信息: {run.ego_networks_output}")
+    print(f"  - 二跳网络成员: {run.ego_members_dir}")
+    print(f"  - 合并数据: {merged_output}")
+    if 'timings' in summary['outputs']:
+        print(f"  - 耗时记录: {run.timings_output}")
+    return merged_output
+
+def print_selected_metrics(selected_metrics):
+    # 显示最终选择
+    metric_names = {
+        1: "密度", 2: "聚类系数", 3: "邻居平均度",
+        4: "介数中心性", 5: "谱半径", 6: "模块度"
+    }
+    print(f"\n✅ 将计算以下 {len(selected_metrics)} 个指标:")
+    for num in selected_metrics:
+        print(f"   - {metric_names[num]}")
+    print(f"✅ 同时记录：出度、入度、总度数、二跳网络节点数、二跳网络边数、是否明星用户、用户类别")
+
+def run_topic(config, summary):
+    """按配置计算一个话题网络的全部用户指标；运行信息（计数、各阶段耗时、输出文件）写入summary"""
+    # 选择指标
+    selected_metrics = config['metrics']
+    if selected_metrics is None:
+        selected_metrics = get_user_selected_metrics()
+    if not selected_metrics:
+        raise ConfigError("未选择任何指标")
+    summary['selected_metrics'] = [METRIC_NAMES[num] for num in selected_metrics]
+    print_selected_metrics(selected_metrics)
+    
+    run = prepare_topic(config, selected_metrics, summary)
+    workers = config['workers']
+    
+    # 计算网络指标
+    try:
+        if run.users:
+            print(f"开始计算 {len(run.users)} 个用户的网络指标...")
+            stage_start = datetime.now()
+            model = calibrate_topic(run, config['calibration_users'])
+            print_eta(model, run.costs, workers)
+            summary['stage_seconds']['calibration'] = (datetime.now() - stage_start).total_seconds()
             
-            # 保存剩余数据
-            if batch_metrics:
-                append_to_jsonl(batch_metrics, metrics_output, is_metrics=True)
-                append_to_jsonl(batch_ego_info, ego_networks_output, is_metrics=False)
-        
-        # 生成合并数据
-        print("正在生成合并数据文件...")
-        metrics_df = metrics_to_dataframe(all_metrics_data)
-        
-        if len(metrics_df) > 0:
-            # 🔥 修改：合并两种影响力指标
-            if has_total_popularity:
-                # 合并两种影响力指标
-                merged_df = pd.merge(metrics_df, popularity_df[['user_id', 'avg_popularity', 'avg_popularity_of_all']], 
-                                    on="user_id", how="inner")
-                print(f"✅ 已合并两种影响力指标: avg_popularity (最新10条) 和 avg_popularity_of_all (总体)")
+            stage_start = datetime.now()
+            if workers > 1:
+                print(f"并行模式：{workers} 个工作进程，每批 {config['chunk_size']} 个用户")
+                run_parallel(run.G, run.users, run.user_args, make_result_handler(run),
+                             workers=workers, chunk_size=config['chunk_size'], costs=run.costs)
             else:
-                # 只有一种影响力指标
-                merged_df = pd.merge(metrics_df, popularity_df[['user_id', 'avg_popularity']], 
-                                    on="user_id", how="inner")
-                print(f"⚠️ 只有一种影响力指标: avg_popularity (最新10条)")
-            
-            # 保存合并数据
-            merged_output = os.path.join(output_dir, 'merged_metrics_popularity.csv')
-            merged_df.to_csv(merged_output, index=False)
-            print(f"合并数据已保存到: {merged_output}")
-            print(f"包含 {len(merged_df)} 行数据")
-            
-            # 显示计算的指标
-            calculated_metrics = [col for col in merged_df.columns if col not in ['user_id', 'center_node', 'avg_popularity', 'avg_popularity_of_all']]
-            print(f"\n✅ 已计算的指标和信息: {calculated_metrics}")
-            
-            # 显示度数统计
-            if 'global_out_degree' in merged_df.columns:
-                print(f"\n📊 度数统计:")
-                print(f"   平均出度: {merged_df['global_out_degree'].mean():.2f}")
-                print(f"   平均入度: {merged_df['global_in_degree'].mean():.2f}")
-                print(f"   平均总度数: {merged_df['global_total_degree'].mean():.2f}")
-            
-            # 显示明星用户统计
-            if 'is_celebrity' in merged_df.columns:
-                celebrity_count = merged_df['is_celebrity'].sum()
-                print(f"\n🌟 明星用户统计:")
-                print(f"   明星用户数量: {celebrity_count}")
-                print(f"   明星用户比例: {celebrity_count/len(merged_df)*100:.2f}%")
-            
-            # 🔥 新增：显示用户类别统计
-            if 'user_category' in merged_df.columns:
-                category_counts = merged_df['user_category'].value_counts()
-                print(f"\n📋 用户类别统计:")
-                for category, count in category_counts.items():
-                    print(f"   {category}类用户: {count} 个 ({count/len(merged_df)*100:.1f}%)")
-            
-            # 🔥 新增：显示影响力对比统计
-            if has_total_popularity:
-                print(f"\n📊 双重影响力对比:")
-                # 有效数据（非零）的统计
-                valid_recent = merged_df['avg_popularity'] > 0
-                valid_total = merged_df['avg_popularity_of_all'] > 0
-                
-                print(f"   最新10条影响力 > 0: {valid_recent.sum()} 个用户 ({valid_recent.sum()/len(merged_df)*100:.1f}%)")
-                print(f"   总体影响力 > 0: {valid_total.sum()} 个用户 ({valid_total.sum()/len(merged_df)*100:.1f}%)")
-                
-                if valid_recent.any():
-                    print(f"   最新10条平均值: {merged_df.loc[valid_recent, 'avg_popularity'].mean():.2f}")
-                if valid_total.any():
-                    print(f"   总体平均值: {merged_df.loc[valid_total, 'avg_popularity_of_all'].mean():.2f}")
-        
-        end_time = datetime.now()
-        duration = end_time - start_time
-        print(f"\n总耗时: {duration}")
-        print(f"生成的文件:")
-        print(f"  - 网络指标: {metrics_output}")
-        print(f"  - 邻居网络信息: {ego_networks_output}")
-        print(f"  - 合并数据: {merged_output}")
-        print(f"\n🔥 新增功能已启用：")
-        print(f"   ✅ 每个用户的出度、入度、总度数已记录")
-        print(f"   ✅ 每个用户的明星用户标识已记录")
-        print(f"   ✅ 每个用户的类别信息（A/B/C）已记录")
-        if has_total_popularity:
-            print(f"   ✅ 双重影响力指标：最新10条 + 总体平均")
-            print(f"   ✅ 总计14个信息：用户ID + 6大网络指标 + 7大基础信息")
-        else:
-            print(f"   ⚠️ 单一影响力指标：仅最新10条")
-            print(f"   ✅ 总计13个信息：用户ID + 6大网络指标 + 6大基础信息")
-        
+                compute_topic_sequential(run)
+            summary['stage_seconds']['compute'] = (datetime.now() - stage_start).total_seconds()
+    finally:
+        # 中断时也把缓冲中的结果写入进度文件
+        run.writer.flush()
+        record_run_results(run, summary, config['metric_budgets'])
+    
+    # 生成合并数据
+    finalize_topic(run, summary)
+    print(f"\n🔥 新增功能已启用：")
+    print(f"   ✅ 每个用户的出度、入度、总度数已记录")
+    print(f"   ✅ 每个用户的明星用户标识已记录")
+    print(f"   ✅ 每个用户的类别信息（A/B/C）已记录")
+    if run.has_total_popularity:
+        print(f"   ✅ 双重影响力指标：最新10条 + 总体平均")
+        print(f"   ✅ 总计14个信息：用户ID + 6大网络指标 + 7大基础信息")
+    else:
+        print(f"   ⚠️ 单一影响力指标：仅最新10条")
+        print(f"   ✅ 总计13个信息：用户ID + 6大网络指标 + 6大基础信息")
+    return summary
+
+def write_run_summary(summary, path):
+    """写出机器可读的运行摘要（JSON）"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"运行摘要已保存到: {path}")
+
+def main(argv=None):
+    """主函数：返回退出码（0 成功，1 运行异常，2 配置/输入错误，130 被中断）"""
+    try:
+        config, _ = load_run_config(argv)
+    except ConfigError as e:
+        print(f"❌ 配置错误: {e}")
+        return EXIT_CONFIG
+    
+    # Ctrl+C 在交互和非交互模式下都由下面的KeyboardInterrupt分支处理：
+    # 已缓冲的结果在run_topic中写入进度文件，记录中断状态并返回130
+    start_time = datetime.now()
+    print(f"开始分析时间: {start_time}")
+    print("使用CSR紧凑图 + 修复版ego_graph，真正支持双向边")
+    print("支持交互式选择网络指标，也支持命令行/配置文件无人值守运行")
+    print("支持断点续传功能")
+    print("🔥 已修复介数中心性计算和Ctrl+C处理")
+    print("🔥 新增全图度数信息：出度、入度、总度数")
+    print("🔥 新增明星用户标识：基于high_fans_users.csv")
+    print("🔥 新增用户类别信息：A/B/C类标识")
+    print("🔥 新增双重影响力指标：支持avg_popularity_of_all")
+    
+    summary = {
+        'status': 'running',
+        'started_at': start_time.isoformat(timespec='seconds'),
+        'base_dir': config['base_dir'],
+        'output_dir': config['output_dir'],
+        'workers': config['workers'],
+        'betweenness_mode': config['betweenness_mode'],
+        'resume': config['resume'],
+    }
+    exit_code = EXIT_OK
+    try:
+        run_topic(config, summary)
+        summary['status'] = 'success'
+    except ConfigError as e:
+        print(f"❌ {e}")
+        summary.update({'status': 'config_error', 'error': str(e)})
+        exit_code = EXIT_CONFIG
     except KeyboardInterrupt:
         print(f"\n\n⚠️ 程序被用户中断 (Ctrl+C)")
         print(f"📁 数据已保存到进度文件，可以稍后继续运行")
-        sys.exit(0)
+        summary['status'] = 'interrupted'
+        exit_code = EXIT_INTERRUPTED
     except Exception as e:
         print(f"\n❌ 程序发生异常: {e}")
         print(f"📁 请检查数据文件和路径配置")
-        sys.exit(1)
+        traceback.print_exc()
+        summary.update({'status': 'error', 'error': f"{type(e).__name__}: {e}"})
+        exit_code = EXIT_ERROR
+    
+    end_time = datetime.now()
+    duration = end_time - start_time
+    print(f"\n总耗时: {duration}")
+    summary.update({'exit_code': exit_code, 'finished_at': end_time.isoformat(timespec='seconds'),
+                    'duration_seconds': duration.total_seconds()})
+    summary_path = config['summary_path'] or os.path.join(config['output_dir'], 'run_summary.json')
+    try:
+        write_run_summary(summary, summary_path)
+    except OSError as e:
+        print(f"⚠️ 运行摘要保存失败: {e}")
+    return exit_code
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,300 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from network_loader import intern_edges, load_edges
+
+
+def _build_csr(rows, cols, n):
+    """按行构建CSR数组：indptr为int64，indices为int32，行内按列号升序"""
+    order = np.lexsort((cols, rows))
+    counts = np.bincount(rows, minlength=n)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = cols[order].astype(np.int32, copy=False)
+    return indptr, indices
+
+
+def gather_rows(indptr, indices, rows):
+    """一次性取出多行的邻居（向量化拼接，避免Python循环）"""
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        return np.empty(0, dtype=indices.dtype)
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=indices.dtype)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return indices[offsets + np.arange(total)]
+
+
+class CSRGraph:
+    """紧凑的有向图：节点ID驻留为整数，正向(出边)与反向(入边)CSR数组
+
+    node_ids[i] 为内部整数ID i 对应的用户ID字符串。
+    对子图而言，global_index[i] 记录该节点在原始全图中的整数ID。
+    """
+
+    def __init__(self, node_ids, source, target, deduplicate=True, global_index=None):
+        self.node_ids = np.asarray(node_ids, dtype=object)
+        n = len(self.node_ids)
+        source = np.asarray(source, dtype=np.int64)
+        target = np.asarray(target, dtype=np.int64)
+
+        # 与eg.DiGraph一致：重复边只保留一条（自环保留）
+        if deduplicate and len(source) > 0:
+            keys = np.unique(source * n + target)
+            source, target = keys // n, keys % n
+
+        self.out_indptr, self.out_indices = _build_csr(source, target, n)
+        self.in_indptr, self.in_indices = _build_csr(target, source, n)
+        self.out_degrees = np.diff(self.out_indptr).astype(np.int32)
+        self.in_degrees = np.diff(self.in_indptr).astype(np.int32)
+        self.global_index = global_index
+        self._index = None
+        self._sorted_ids = None
+        self._id_order = None
+        self._member_mask = None
+
+    @classmethod
+    def from_edge_table(cls, table):
+        """由network_loader.EdgeTable构建"""
+        return cls(table.node_ids, table.source, table.target)
+
+    @classmethod
+    def from_edge_lists(cls, sources, targets):
+        """由（已规范化的）source/target用户ID序列构建，节点按首次出现顺序编号"""
+        return cls.from_edge_table(intern_edges(sources, targets, deduplicate=False))
+
+    @classmethod
+    def from_edges_csv(cls, edges_path):
+        """直接读取edges.csv构建"""
+        return cls.from_edge_table(load_edges(edges_path, deduplicate=False))
+
+    # ---------- 磁盘共享（供多进程内存映射） ----------
+
+    _ARRAY_FILES = ('out_indptr', 'out_indices', 'in_indptr', 'in_indices', 'node_ids', 'sorted_ids', 'id_order')
+
+    def save_arrays(self, directory):
+        """把CSR数组写成.npy文件；节点ID存为定长Unicode数组，另存排序下标以便二分查找"""
+        os.makedirs(directory, exist_ok=True)
+        node_ids = self.node_ids.astype(str)
+        id_order = np.argsort(node_ids, kind='stable')
+        arrays = {
+            'out_indptr': self.out_indptr, 'out_indices': self.out_indices,
+            'in_indptr': self.in_indptr, 'in_indices': self.in_indices,
+            'node_ids': node_ids, 'sorted_ids': node_ids[id_order], 'id_order': id_order,
+        }
+        for name in self._ARRAY_FILES:
+            np.save(os.path.join(directory, name + '.npy'), arrays[name])
+
+    @classmethod
+    def load_arrays(cls, directory, mmap_mode='r'):
+        """以内存映射方式加载save_arrays写出的图：多个进程共享同一份页缓存，不复制、不反序列化
+
+        ID查找改用排序下标上的二分查找，不再为每个进程构建哈希索引。
+        """
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+                  for name in cls._ARRAY_FILES}
+        G = cls.__new__(cls)
+        G.node_ids = arrays['node_ids']
+        G.out_indptr, G.out_indices = arrays['out_indptr'], arrays['out_indices']
+        G.in_indptr, G.in_indices = arrays['in_indptr'], arrays['in_indices']
+        G.out_degrees = np.diff(G.out_indptr).astype(np.int32)
+        G.in_degrees = np.diff(G.in_indptr).astype(np.int32)
+        G.global_index = None
+        G._index = None
+        G._member_mask = None
+        G._sorted_ids = arrays['sorted_ids']
+        G._id_order = arrays['id_order']
+        return G
+
+    # ---------- 基本信息 ----------
+
+    @property
+    def index(self):
+        """用户ID -> 内部整数ID 的哈希索引（惰性构建）"""
+        if self._index is None:
+            self._index = pd.Index(self.node_ids)
+        return self._index
+
+    @property
+    def nodes(self):
+        return self.node_ids.tolist()
+
+    @property
+    def degrees(self):
+        """总度数（出度+入度）"""
+        return self.out_degrees + self.in_degrees
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.out_indices)
+
+    def is_directed(self):
+        return True
+
+    def __len__(self):
+        return self.number_of_nodes()
+
+    def __contains__(self, user_id):
+        return self.index_of(user_id) >= 0
+
+    def has_node(self, user_id):
+        return user_id in self
+
+    def index_of(self, user_id):
+        """返回用户ID对应的内部整数ID，不存在时返回-1"""
+        if self._id_order is not None:
+            return int(self.indices_of([user_id])[0])
+        try:
+            loc = self.index.get_loc(user_id)
+        except KeyError:
+            return -1
+        return loc if isinstance(loc, (int, np.integer)) else -1
+
+    def indices_of(self, user_ids):
+        """批量查找内部整数ID，不存在的为-1"""
+        if self._id_order is not None:
+            keys = np.asarray([str(u) for u in user_ids])
+            if len(keys) == 0 or len(self._sorted_ids) == 0:
+                return np.full(len(keys), -1, dtype=np.int64)
+            pos = np.minimum(np.searchsorted(self._sorted_ids, keys), len(self._sorted_ids) - 1)
+            return np.where(self._sorted_ids[pos] == keys, self._id_order[pos], -1)
+        return self.index.get_indexer(list(user_ids))
+
+    # ---------- 邻接查询（参数与返回值均为内部整数ID） ----------
+
+    def successors(self, i):
+        """出边邻居（i 指向的节点）"""
+        return self.out_indices[self.out_indptr[i]:self.out_indptr[i + 1]]
+
+    def predecessors(self, i):
+        """入边邻居（指向 i 的节点）"""
+        return self.in_indices[self.in_indptr[i]:self.in_indptr[i + 1]]
+
+    def neighbors(self, i):
+        """与eg.DiGraph.neighbors一致：只返回出边邻居"""
+        return self.successors(i)
+
+    def has_edge(self, u, v):
+        row = self.successors(u)
+        pos = np.searchsorted(row, v)
+        return bool(pos < len(row) and row[pos] == v)
+
+    # ---------- 遍历与子图 ----------
+
+    def bidirectional_bfs(self, start, radius):
+        """双向BFS：同时沿入边和出边扩展，返回 (节点数组, 距离数组)"""
+        visited = np.array([start], dtype=np.int64)
+        distances = [np.zeros(1, dtype=np.int32)]
+        frontier = visited
+
+        for level in range(1, radius + 1):
+            candidates = np.concatenate([
+                gather_rows(self.out_indptr, self.out_indices, frontier),
+                gather_rows(self.in_indptr, self.in_indices, frontier),
+            ]).astype(np.int64)
+            frontier = np.setdiff1d(np.unique(candidates), visited, assume_unique=True)
+            if len(frontier) == 0:
+                break
+            visited = np.concatenate([visited, frontier])
+            distances.append(np.full(len(frontier), level, dtype=np.int32))
+
+        return visited, np.concatenate(distances)
+
+    def subgraph(self, nodes):
+        """按整数ID集合抽取导出子图，节点按全图ID升序重新编号"""
+        nodes = np.unique(np.asarray(nodes, dtype=np.int64))
+        rows = np.repeat(np.arange(len(nodes)), self.out_degrees[nodes])
+        targets = gather_rows(self.out_indptr, self.out_indices, nodes)
+        pos = np.searchsorted(nodes, targets)
+        pos[pos == len(nodes)] = 0
+        inside = nodes[pos] == targets
+        base = self.global_index[nodes] if self.global_index is not None else nodes
+        return CSRGraph(self.node_ids[nodes], rows[inside], pos[inside],
+                        deduplicate=False, global_index=base)
+
+    def count_induced_edges(self, nodes):
+        """导出子图的边数：用成员位图检查成员各行的出边，不构建子图
+
+        位图在图对象上复用（每次用完即清零），避免每次分配 O(|V|) 的数组。
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        if self._member_mask is None:
+            self._member_mask = np.zeros(self.number_of_nodes(), dtype=bool)
+        mask = self._member_mask
+        mask[nodes] = True
+        try:
+            return int(np.count_nonzero(mask[gather_rows(self.out_indptr, self.out_indices, nodes)]))
+        finally:
+            mask[nodes] = False
+
+    # ---------- 转换 ----------
+
+    def adjacency_matrix(self, dtype=np.float64):
+        """scipy稀疏邻接矩阵，A[u, v] = 1 表示 u -> v"""
+        n = self.number_of_nodes()
+        data = np.ones(len(self.out_indices), dtype=dtype)
+        return sparse.csr_matrix((data, self.out_indices, self.out_indptr), shape=(n, n))
+
+    def edge_arrays(self):
+        """返回 (source, target) 整数ID数组"""
+        source = np.repeat(np.arange(self.number_of_nodes(), dtype=np.int32), self.out_degrees)
+        return source, self.out_indices
+
+    def to_easygraph(self):
+        """转换为eg.DiGraph，供仍依赖EasyGraph实现的指标使用"""
+        import easygraph as eg
+        H = eg.DiGraph()
+        H.add_nodes_from(self.nodes)
+        source, target = self.edge_arrays()
+        H.add_edges_from(zip(self.node_ids[source].tolist(), self.node_ids[target].tolist()))
+        return H
+
+
+class EgoView:
+    """二跳网络的惰性视图：节点数、边数由计数得到，只有确实需要图结构时才抽取子图
+
+    members为节点在全图中的整数ID（升序），与CSRGraph子图的global_index含义相同。
+    """
+
+    def __init__(self, graph, nodes):
+        self.graph = graph
+        self.members = np.unique(np.asarray(nodes, dtype=np.int64))
+        self.global_index = self.members
+        self._edge_count = None
+        self._subgraph = None
+
+    def number_of_nodes(self):
+        return len(self.members)
+
+    def number_of_edges(self):
+        if self._edge_count is None:
+            self._edge_count = self.graph.count_induced_edges(self.members)
+        return self._edge_count
+
+    def is_directed(self):
+        return True
+
+    def __len__(self):
+        return self.number_of_nodes()
+
+    def __contains__(self, user_id):
+        i = self.graph.index_of(user_id)
+        pos = np.searchsorted(self.members, i)
+        return bool(i >= 0 and pos < len(self.members) and self.members[pos] == i)
+
+    @property
+    def nodes(self):
+        return self.graph.node_ids[self.members].tolist()
+
+    def materialize(self):
+        """抽取导出子图（CSRGraph），结果缓存"""
+        if self._subgraph is None:
+            self._subgraph = self.graph.subgraph(self.members)
+            self._edge_count = self._subgraph.number_of_edges()
+        return self._subgraph
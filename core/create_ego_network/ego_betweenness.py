@@ -0,0 +1,220 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+from scipy import sparse
+from scipy.stats import norm
+
+from csr_graph import CSRGraph
+from ego_community import weighted_edge_arrays
+from metric_budget import check_deadline
+
+# 批量BFS时 节点数 × 批大小 的上限（控制σ/距离矩阵的内存）
+BATCH_CELLS = 4_000_000
+
+# 近似介数的结果：估计值、置信区间、抽样源点数、可抽样的源点总数、是否已退化为精确计算
+BetweennessEstimate = namedtuple('BetweennessEstimate',
+                                 ['value', 'ci_low', 'ci_high', 'samples', 'population', 'exact'])
+
+
+def unweighted_adjacency(G):
+    """返回 (节点列表, 去掉自环的0/1稀疏邻接矩阵)；自环不影响最短路径"""
+    nodes, source, target, _ = weighted_edge_arrays(G)
+    keep = source != target
+    n = len(nodes)
+    A = sparse.csr_matrix((np.ones(int(keep.sum())), (source[keep], target[keep])), shape=(n, n))
+    if not G.is_directed():
+        A = (A + A.T).tocsr()
+    A.data[:] = 1.0
+    return nodes, A
+
+
+def bfs_path_counts(A_T, sources, n, deadline=None):
+    """多源层同步BFS：返回 (距离矩阵, 最短路径条数矩阵)，形状均为 n × len(sources)
+
+    A_T为邻接矩阵的转置，A_T @ x 把每个节点的值沿出边传到后继；不可达的距离为-1。
+    给出deadline（metric_budget.Deadline）时每层检查一次是否超时。
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    cols = np.arange(len(sources))
+    dist = np.full((n, len(sources)), -1, dtype=np.int32)
+    sigma = np.zeros((n, len(sources)))
+    dist[sources, cols] = 0
+    sigma[sources, cols] = 1.0
+
+    frontier = sigma.copy()
+    level = 0
+    while True:
+        check_deadline(deadline)
+        level += 1
+        reached = A_T @ frontier
+        new = (reached > 0) & (dist < 0)
+        if not new.any():
+            break
+        reached[~new] = 0.0
+        dist[new] = level
+        sigma += reached
+        frontier = reached
+    return dist, sigma
+
+
+def _radius1_closed_form(A, center):
+    """半径1情形的矩阵闭式解；不满足适用条件时返回None
+
+    若中心c的入邻居集合I只从 I∪{c} 接收入边、出邻居集合O只向 O∪{c} 发出出边，
+    则所有经过c的最短路径都是 s→c→t（s∈I, t∈O, 且s不直接指向t），
+    这些点对的最短路径条数即 (A²)[s, t]，于是 BC(c) = Σ 1 / (A²)[s, t]。
+    """
+    A_T = A.T.tocsr()
+    in_nbrs = A_T.indices[A_T.indptr[center]:A_T.indptr[center + 1]]
+    out_nbrs = A.indices[A.indptr[center]:A.indptr[center + 1]]
+    if len(in_nbrs) == 0 or len(out_nbrs) == 0:
+        return 0.0
+
+    allowed_in = np.union1d(in_nbrs, [center])
+    allowed_out = np.union1d(out_nbrs, [center])
+    if not np.isin(A_T[in_nbrs].indices, allowed_in).all():
+        return None
+    if not np.isin(A[out_nbrs].indices, allowed_out).all():
+        return None
+
+    two_paths = (A[in_nbrs] @ A[:, out_nbrs]).toarray()
+    direct = A[in_nbrs][:, out_nbrs].toarray() > 0
+    same = in_nbrs[:, None] == out_nbrs[None, :]
+    pairs = ~direct & ~same & (two_paths > 0)
+    return float(np.sum(1.0 / two_paths[pairs]))
+
+
+class _CenterPaths:
+    """以中心c为起点的正向/反向BFS结果：能到达c的源点、c能到达的目标点及其 d(c,t)、σ_ct"""
+
+    def __init__(self, A, center, deadline=None):
+        self.n = A.shape[0]
+        self.center = center
+        self.A_T = A.T.tocsr()
+        fwd_dist, fwd_sigma = bfs_path_counts(self.A_T, [center], self.n, deadline)
+        rev_dist, _ = bfs_path_counts(A.tocsr(), [center], self.n, deadline)
+        fwd_dist, fwd_sigma = fwd_dist[:, 0], fwd_sigma[:, 0]
+
+        self.targets = np.flatnonzero(fwd_dist > 0)
+        self.sources = np.flatnonzero(rev_dist[:, 0] > 0)
+        self.d_ct = fwd_dist[self.targets][:, None]
+        self.sigma_ct = fwd_sigma[self.targets][:, None]
+
+    def dependencies(self, sources, batch_cells=BATCH_CELLS, deadline=None):
+        """每个源点s对c的依赖 δ_s(c) = Σ_t σ_sc·σ_ct / σ_st（条件 d(s,t) = d(s,c) + d(c,t)）"""
+        sources = np.asarray(sources, dtype=np.int64)
+        result = np.zeros(len(sources))
+        if len(self.targets) == 0:
+            return result
+        batch = max(1, batch_cells // self.n)
+        for start in range(0, len(sources), batch):
+            dist, sigma = bfs_path_counts(self.A_T, sources[start:start + batch], self.n, deadline)
+            d_sc, sigma_sc = dist[self.center], sigma[self.center]
+            on_path = dist[self.targets] == d_sc[None, :] + self.d_ct
+            ratio = np.divide(self.sigma_ct * sigma_sc[None, :], sigma[self.targets],
+                              out=np.zeros(on_path.shape), where=on_path)
+            result[start:start + batch] = ratio.sum(axis=0)
+        return result
+
+
+def _restricted_path_counting(A, center, batch_cells=BATCH_CELLS, deadline=None):
+    """精确计算：只对能到达c的源点做最短路径计数
+
+    BC(c) = Σ_s δ_s(c)。σ_sc、d(s,c) 来自一次反向BFS；σ_ct、d(c,t) 来自一次正向BFS；
+    σ_st、d(s,t) 由分批的多源BFS（稀疏矩阵 × 稠密块）得到，不做Brandes的依赖回传。
+    """
+    paths = _CenterPaths(A, center, deadline)
+    if len(paths.sources) == 0:
+        return 0.0
+    return float(paths.dependencies(paths.sources, batch_cells, deadline).sum())
+
+
+def _rescale(value, n, normalized, directed):
+    """与eg的_rescale一致：归一化因子为 1/((n-1)(n-2))；不归一化时无向图的点对计了两次，需减半"""
+    if normalized:
+        return value / ((n - 1) * (n - 2))
+    if not directed:
+        return value * 0.5
+    return value
+
+
+def _center_index(G, nodes, center_node):
+    if isinstance(G, CSRGraph):
+        return G.index_of(center_node)
+    return nodes.index(center_node) if center_node in G else -1
+
+
+def hoeffding_sample_size(epsilon, confidence, scale=1.0):
+    """Hoeffding界：取值范围为[0, scale]的独立样本，均值误差不超过epsilon（置信度confidence）所需的样本数"""
+    alpha = 1.0 - confidence
+    return int(math.ceil(scale ** 2 * math.log(2.0 / alpha) / (2.0 * epsilon ** 2)))
+
+
+def ego_betweenness(G, center_node, normalized=True, method="auto", deadline=None):
+    """只计算中心节点的（有向、无权）介数中心性，口径与eg_f.betweenness_centrality一致
+
+    method: "auto" 在半径1闭式解适用时用闭式解，否则用受限最短路径计数；
+            "exact" 始终用受限最短路径计数。
+    deadline为metric_budget.Deadline，超时抛出BudgetExceeded。
+    """
+    nodes, A = unweighted_adjacency(G)
+    center = _center_index(G, nodes, center_node)
+    n = len(nodes)
+    if center < 0 or n <= 2:
+        return 0.0
+
+    value = None
+    if method == "auto":
+        value = _radius1_closed_form(A, center)
+    if value is None:
+        value = _restricted_path_counting(A, center, deadline=deadline)
+    return _rescale(value, n, normalized, G.is_directed())
+
+
+def approximate_ego_betweenness(G, center_node, samples=None, epsilon=0.01, confidence=0.95,
+                                normalized=True, seed=None, deadline=None):
+    """中心节点介数的源点抽样（pivot）近似，返回BetweennessEstimate
+
+    只有能到达c的源点集合R（|R|个）才对BC(c)有贡献，因此从R中无放回地均匀抽取k个源点，
+    用 |R|/k · Σ δ_s(c) 作为无偏估计。样本数由samples直接给定；为None时按Hoeffding界
+    由目标误差epsilon（归一化尺度）和置信度confidence确定。k ≥ |R| 时退化为精确计算。
+    置信区间用正态近似（含有限总体校正），并截断到 [0, 上界]。
+    """
+    nodes, A = unweighted_adjacency(G)
+    center = _center_index(G, nodes, center_node)
+    n = len(nodes)
+    if center < 0 or n <= 2:
+        return BetweennessEstimate(0.0, 0.0, 0.0, 0, 0, True)
+
+    paths = _CenterPaths(A, center, deadline)
+    population = len(paths.sources)
+    if population == 0 or len(paths.targets) == 0:
+        return BetweennessEstimate(0.0, 0.0, 0.0, 0, population, True)
+
+    # 每个源点的依赖不超过 c 能到达的目标数，换算到归一化尺度即为单个样本项的取值上界
+    per_source_max = float(len(paths.targets))
+    if samples is None:
+        scale = population * per_source_max / ((n - 1) * (n - 2))
+        samples = hoeffding_sample_size(epsilon, confidence, scale)
+    samples = max(1, int(samples))
+
+    if samples >= population:
+        value = _rescale(float(paths.dependencies(paths.sources, deadline=deadline).sum()), n, normalized,
+                         G.is_directed())
+        return BetweennessEstimate(value, value, value, population, population, True)
+
+    rng = np.random.default_rng(seed)
+    pivots = rng.choice(paths.sources, size=samples, replace=False)
+    deps = paths.dependencies(pivots, deadline=deadline)
+    estimate = population * deps.mean()
+
+    # 无放回抽样的标准误：sqrt(1 - k/|R|) · |R| · s / sqrt(k)
+    std = deps.std(ddof=1) if samples > 1 else per_source_max
+    half_width = (norm.ppf(0.5 + confidence / 2) * population * std / math.sqrt(samples)
+                  * math.sqrt(1.0 - samples / population))
+    low = max(0.0, estimate - half_width)
+    high = min(population * per_source_max, estimate + half_width)
+
+    value, low, high = (_rescale(v, n, normalized, G.is_directed()) for v in (estimate, low, high))
+    return BetweennessEstimate(value, low, high, samples, population, False)
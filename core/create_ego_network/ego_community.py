@@ -0,0 +1,267 @@
+import numpy as np
+from scipy import sparse
+
+from csr_graph import CSRGraph
+
+# 局部移动阶段每遍历多少个节点检查一次截止时间
+DEADLINE_STRIDE = 1024
+
+
+def weighted_edge_arrays(G, weight="weight"):
+    """返回 (节点列表, source, target, 权重) 数组；CSRGraph的边权恒为1"""
+    if isinstance(G, CSRGraph):
+        source, target = G.edge_arrays()
+        return G.nodes, source, target, np.ones(len(source))
+
+    nodes = list(G.nodes)
+    node_index = {node: i for i, node in enumerate(nodes)}
+    source, target, weights = [], [], []
+    for u, v, data in G.edges:
+        source.append(node_index[u])
+        target.append(node_index[v])
+        weights.append(data.get(weight, 1))
+    return (nodes, np.asarray(source, dtype=np.int64), np.asarray(target, dtype=np.int64),
+            np.asarray(weights, dtype=np.float64))
+
+
+def communities_to_labels(nodes, communities):
+    """社区列表（节点集合）-> 每个节点的社区编号数组，不在任何社区中的节点为-1"""
+    node_index = {node: i for i, node in enumerate(nodes)}
+    labels = np.full(len(nodes), -1, dtype=np.int64)
+    for c, community in enumerate(communities):
+        members = [node_index[node] for node in community if node in node_index]
+        labels[members] = c
+    return labels
+
+
+def modularity_from_arrays(n, source, target, weights, labels, directed=True, return_internal_edges=False):
+    """由边数组和社区编号计算模块度，O(m + n)
+
+    有向：Q = Σ_c [ L_c / m - Kout_c · Kin_c / m² ]
+    无向：Q = Σ_c [ L_c / m - (K_c / 2m)² ]（自环度数按两次计）
+    其中 L_c 为社区内部边权之和，K 为社区内节点（出/入）度之和。
+    """
+    labels = np.asarray(labels)
+    m = float(weights.sum())
+    if m == 0:
+        return (0, 0) if return_internal_edges else 0
+
+    n_comms = int(labels.max()) + 1 if len(labels) else 0
+    valid = labels >= 0
+    src_labels = labels[source]
+    inside = (src_labels == labels[target]) & (src_labels >= 0)
+    intra = np.bincount(src_labels[inside], weights=weights[inside], minlength=n_comms)
+
+    if directed:
+        out_degree = np.bincount(source, weights=weights, minlength=n)
+        in_degree = np.bincount(target, weights=weights, minlength=n)
+        k_out = np.bincount(labels[valid], weights=out_degree[valid], minlength=n_comms)
+        k_in = np.bincount(labels[valid], weights=in_degree[valid], minlength=n_comms)
+        Q = float(np.sum(intra / m - k_out * k_in / m ** 2))
+    else:
+        degree = (np.bincount(source, weights=weights, minlength=n)
+                  + np.bincount(target, weights=weights, minlength=n))
+        k = np.bincount(labels[valid], weights=degree[valid], minlength=n_comms)
+        Q = float(np.sum(intra / m - (k / (2 * m)) ** 2))
+
+    if return_internal_edges:
+        return Q, int(inside.sum())
+    return Q
+
+
+def modularity(G, communities, weight="weight", return_internal_edges=False):
+    """向量化的模块度计算，口径与modularity_fixed一致（社区需互不重叠）
+
+    G可以是CSRGraph或EasyGraph的Graph/DiGraph；communities为节点集合的列表。
+    """
+    nodes, source, target, weights = weighted_edge_arrays(G, weight)
+    labels = communities_to_labels(nodes, communities)
+    return modularity_from_arrays(len(nodes), source, target, weights, labels,
+                                  directed=G.is_directed(), return_internal_edges=return_internal_edges)
+
+
+def adjacency_from_graph(G, weight="weight"):
+    """返回 (节点列表, 加权稀疏邻接矩阵W)；无向图返回对称矩阵"""
+    nodes, source, target, weights = weighted_edge_arrays(G, weight)
+    n = len(nodes)
+    W = sparse.csr_matrix((weights, (source, target)), shape=(n, n))
+    if not G.is_directed():
+        # 无向图按对称矩阵处理（自环权重计两次）：有向公式在对称W上与无向Louvain/模块度完全等价
+        W = (W + W.T).tocsr()
+    return nodes, W
+
+
+def directed_modularity_matrix(W, labels):
+    """加权有向邻接矩阵W在给定社区编号下的（有向）模块度"""
+    coo = W.tocoo()
+    return modularity_from_arrays(W.shape[0], coo.row, coo.col, coo.data, labels, directed=True)
+
+
+def _local_moves(W, order, max_passes, pass_tol, deadline=None, initial_labels=None):
+    """Louvain局部移动阶段：整数社区编号 + Stot数组，返回 (labels, 是否有移动)
+
+    一轮遍历中所有移动带来的模块度提升之和不超过pass_tol时停止。
+    给出deadline时每遍历DEADLINE_STRIDE个节点检查一次是否超时。
+    initial_labels为初始划分（编号需在0..n-1内），默认每个节点自成一个社区。
+
+    有向增益（Leicht–Newman）：
+      ΔQ = w_uc / m - (d_out(u)·Stot_in[c] + d_in(u)·Stot_out[c]) / m²
+    其中 w_uc 为 u 与社区 c 之间的出边和入边权重之和。
+    """
+    n = W.shape[0]
+    m = float(W.sum())
+    out_degree = np.asarray(W.sum(axis=1)).ravel()
+    in_degree = np.asarray(W.sum(axis=0)).ravel()
+
+    # 邻居权重使用 W + W^T（忽略自环），转成Python列表以加快逐节点循环
+    S = (W + W.T).tocsr()
+    S.setdiag(0)
+    S.eliminate_zeros()
+    indptr = S.indptr.tolist()
+    indices = S.indices.tolist()
+    data = S.data.tolist()
+
+    d_out = out_degree.tolist()
+    d_in = in_degree.tolist()
+    if initial_labels is None:
+        labels = list(range(n))
+        stot_out = list(d_out)
+        stot_in = list(d_in)
+    else:
+        labels = np.asarray(initial_labels, dtype=np.int64).tolist()
+        stot_out = np.bincount(labels, weights=out_degree, minlength=n).tolist()
+        stot_in = np.bincount(labels, weights=in_degree, minlength=n).tolist()
+    m2 = m * m
+
+    moved = False
+    for _ in range(max_passes):
+        nb_moves = 0
+        pass_gain = 0.0
+        for i, u in enumerate(order):
+            if deadline is not None and i % DEADLINE_STRIDE == 0:
+                deadline.check()
+            current = labels[u]
+            weights2com = {}
+            for k in range(indptr[u], indptr[u + 1]):
+                c = labels[indices[k]]
+                weights2com[c] = weights2com.get(c, 0.0) + data[k]
+
+            out_u, in_u = d_out[u], d_in[u]
+            stot_out[current] -= out_u
+            stot_in[current] -= in_u
+            remove_cost = (-weights2com.get(current, 0.0) / m
+                           + (out_u * stot_in[current] + in_u * stot_out[current]) / m2)
+
+            best_com, best_gain = current, 0.0
+            for c, wt in weights2com.items():
+                gain = remove_cost + wt / m - (out_u * stot_in[c] + in_u * stot_out[c]) / m2
+                if gain > best_gain + 1e-12:
+                    best_com, best_gain = c, gain
+
+            stot_out[best_com] += out_u
+            stot_in[best_com] += in_u
+            if best_com != current:
+                labels[u] = best_com
+                nb_moves += 1
+                # 留在原社区的增益恰为0，因此best_gain即本次移动的模块度提升
+                pass_gain += best_gain
+
+        if nb_moves == 0:
+            break
+        moved = True
+        if pass_gain <= pass_tol:
+            break
+
+    return np.asarray(labels, dtype=np.int64), moved
+
+
+def louvain_labels(W, threshold=0.001, max_levels=10, max_passes=100, seed=None, deadline=None):
+    """基于CSR稀疏矩阵的Louvain社区检测，返回 (每个节点的社区编号, 模块度)
+
+    每一层先做局部移动，再用指示矩阵 P 粗化 W' = Pᵀ W P 得到下一层的图。
+    seed为None时按节点顺序遍历，否则用该种子打乱遍历顺序（结果可复现）。
+    某一层带来的模块度提升不超过threshold时停止；max_levels=1 即单层Louvain。
+    deadline（metric_budget.Deadline）超时时抛出BudgetExceeded。
+    局部移动阶段中一轮遍历的提升不超过 threshold/10 时即进入粗化。
+    """
+    W = sparse.csr_matrix(W, dtype=np.float64)
+    n = W.shape[0]
+    node_labels = np.arange(n, dtype=np.int64)
+    if n == 0 or W.sum() == 0:
+        return node_labels, 0.0
+
+    rng = np.random.RandomState(seed) if seed is not None else None
+    current_mod = directed_modularity_matrix(W, node_labels)
+    level_W = W
+
+    for _ in range(max_levels):
+        order = np.arange(level_W.shape[0])
+        if rng is not None:
+            rng.shuffle(order)
+        labels, moved = _local_moves(level_W, order.tolist(), max_passes, threshold / 10, deadline)
+        if not moved:
+            break
+
+        # 社区重新连续编号，并把粗化后的编号回传到原始节点
+        _, labels = np.unique(labels, return_inverse=True)
+        new_labels = labels[node_labels]
+        new_mod = directed_modularity_matrix(W, new_labels)
+        if new_mod <= current_mod:
+            break
+        gain = new_mod - current_mod
+        node_labels, current_mod = new_labels, new_mod
+
+        k = int(labels.max()) + 1
+        P = sparse.csr_matrix((np.ones(len(labels)), (np.arange(len(labels)), labels)),
+                              shape=(len(labels), k))
+        level_W = (P.T @ level_W @ P).tocsr()
+        if gain <= threshold:
+            break
+
+    return node_labels, current_mod
+
+
+def louvain_communities(G, weight="weight", threshold=0.001, max_levels=10, max_passes=100, seed=None,
+                        deadline=None):
+    """对CSRGraph或EasyGraph图运行数组版Louvain，返回 (社区列表, 模块度)
+
+    模块度口径与modularity_fixed一致：有向图为有向模块度，无向图为无向模块度。
+    """
+    nodes, W = adjacency_from_graph(G, weight)
+    labels, Q = louvain_labels(W, threshold=threshold, max_levels=max_levels,
+                               max_passes=max_passes, seed=seed, deadline=deadline)
+    communities = [set() for _ in range(int(labels.max()) + 1 if len(labels) else 0)]
+    for node, label in zip(nodes, labels.tolist()):
+        communities[label].add(node)
+    return communities, Q
+
+
+def global_partition_labels(G, threshold=0.001, max_levels=10, seed=None, deadline=None):
+    """在全图（CSRGraph）上运行一次Louvain，返回 (按内部整数ID排列的社区编号数组, 全图模块度)"""
+    _, W = adjacency_from_graph(G)
+    return louvain_labels(W, threshold=threshold, max_levels=max_levels, seed=seed, deadline=deadline)
+
+
+def restricted_partition_modularity(ego_graph, global_labels, refine_passes=0, seed=None, deadline=None):
+    """把全图划分限制到二跳网络上计算模块度，返回 (限制划分的模块度, 细化后的模块度)
+
+    ego_graph为由CSRGraph抽取的子图，其global_index给出成员在全图中的整数ID，成员沿用全图划分中的社区。
+    refine_passes>0 时以限制划分为初始划分，再做至多refine_passes遍局部移动（不粗化），
+    细化后的模块度不低于限制划分的模块度；refine_passes=0 时第二个值为None。
+    模块度口径与louvain_communities一致，可直接与逐网络Louvain的结果比较。
+    """
+    _, labels = np.unique(np.asarray(global_labels)[ego_graph.global_index], return_inverse=True)
+    _, W = adjacency_from_graph(ego_graph)
+    restricted = directed_modularity_matrix(W, labels)
+    if refine_passes <= 0:
+        return restricted, None
+    if W.sum() == 0:
+        return restricted, restricted
+
+    order = np.arange(W.shape[0])
+    if seed is not None:
+        np.random.RandomState(seed).shuffle(order)
+    refined_labels, moved = _local_moves(W, order.tolist(), refine_passes, 0.0, deadline, initial_labels=labels)
+    if not moved:
+        return restricted, restricted
+    return restricted, directed_modularity_matrix(W, refined_labels)
@@ -0,0 +1,177 @@
+import os
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# 二跳网络成员存储（目录）：
+#   node_ids.npy  节点表（定长Unicode数组），成员以节点表中的整数下标保存
+#   members.bin   每个用户一个压缩块：排好序的成员下标做差分后按uint32存储，再zlib压缩
+#   members.idx   定长索引记录（中心节点下标, 块偏移, 块字节数, 成员数），按写入顺序追加
+# 读取一个用户只需读索引并定位到对应的块，不扫描成员文件；同一用户有多条记录时以最后一条为准。
+NODE_IDS_FILE = 'node_ids.npy'
+MEMBERS_FILE = 'members.bin'
+INDEX_FILE = 'members.idx'
+INDEX_DTYPE = np.dtype([('node', '<i8'), ('offset', '<i8'), ('nbytes', '<i8'), ('count', '<i8')])
+COMPRESS_LEVEL = 6
+
+
+def encode_members(members):
+    """成员下标 -> 压缩块（排序、去重、差分编码）"""
+    members = np.unique(np.asarray(members, dtype=np.int64))
+    deltas = np.diff(members, prepend=0).astype('<u4')
+    return zlib.compress(deltas.tobytes(), COMPRESS_LEVEL), len(members)
+
+
+def decode_members(block):
+    """压缩块 -> 排好序的成员下标（int64）"""
+    deltas = np.frombuffer(zlib.decompress(block), dtype='<u4')
+    return np.cumsum(deltas, dtype=np.int64)
+
+
+def _repair(directory):
+    """去掉中断写入留下的半条索引记录和索引之后多余的成员数据"""
+    index_path = os.path.join(directory, INDEX_FILE)
+    members_path = os.path.join(directory, MEMBERS_FILE)
+    if not os.path.exists(index_path):
+        return
+    size = os.path.getsize(index_path)
+    if size % INDEX_DTYPE.itemsize:
+        with open(index_path, 'r+b') as f:
+            f.truncate(size - size % INDEX_DTYPE.itemsize)
+    index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+    end = int((index['offset'] + index['nbytes']).max()) if len(index) else 0
+    if os.path.exists(members_path) and os.path.getsize(members_path) > end:
+        with open(members_path, 'r+b') as f:
+            f.truncate(end)
+
+
+class EgoMembershipWriter:
+    """把每个用户的二跳网络成员（图G的内部整数ID）追加到成员存储
+
+    存储目录已有节点表时沿用；G的节点顺序与之不同（如边文件变化后重建的图）时，
+    建立 G下标 -> 存储下标 的映射，新出现的节点追加到节点表末尾，已写入的记录保持有效。
+    """
+
+    def __init__(self, directory, G):
+        self.directory = directory
+        self.G = G
+        os.makedirs(directory, exist_ok=True)
+        _repair(directory)
+        self._mapping = self._sync_node_table(np.asarray(G.node_ids).astype(str))
+
+    def _sync_node_table(self, node_ids):
+        path = os.path.join(self.directory, NODE_IDS_FILE)
+        if not os.path.exists(path):
+            np.save(path, node_ids)
+            return None
+        stored = np.load(path)
+        if len(stored) == len(node_ids) and np.array_equal(stored, node_ids):
+            return None
+        mapping = pd.Index(stored).get_indexer(node_ids)
+        new = mapping < 0
+        if new.any():
+            mapping[new] = len(stored) + np.arange(int(new.sum()))
+            np.save(path, np.concatenate([stored, node_ids[new]]))
+        return mapping.astype(np.int64)
+
+    def _to_store(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        return indices if self._mapping is None else self._mapping[indices]
+
+    def write_many(self, records):
+        """records为 [(user_id, 成员下标数组), ...]；先写成员块，再写索引记录"""
+        if not records:
+            return
+        members_path = os.path.join(self.directory, MEMBERS_FILE)
+        offset = os.path.getsize(members_path) if os.path.exists(members_path) else 0
+        index = np.zeros(len(records), dtype=INDEX_DTYPE)
+        with open(members_path, 'ab') as f:
+            for i, (user_id, members) in enumerate(records):
+                block, count = encode_members(self._to_store(members))
+                f.write(block)
+                index[i] = (self._to_store([self.G.index_of(user_id)])[0], offset, len(block), count)
+                offset += len(block)
+        with open(os.path.join(self.directory, INDEX_FILE), 'ab') as f:
+            f.write(index.tobytes())
+
+
+class EgoMembershipStore:
+    """成员存储的随机读取：只加载节点表（内存映射）和索引，按需读取单个用户的块"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        _repair(directory)
+        self.node_ids = np.load(os.path.join(directory, NODE_IDS_FILE), mmap_mode='r')
+        index_path = os.path.join(directory, INDEX_FILE)
+        index = np.fromfile(index_path, dtype=INDEX_DTYPE) if os.path.exists(index_path) else \
+            np.zeros(0, dtype=INDEX_DTYPE)
+        # 同一中心节点只保留最后一条记录，按中心节点下标排序以便二分查找
+        _, last = np.unique(index['node'][::-1], return_index=True)
+        self.index = index[len(index) - 1 - last]
+        self._node_lookup = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def _store_index(self, user_id):
+        if self._node_lookup is None:
+            self._node_lookup = pd.Index(np.asarray(self.node_ids))
+        loc = self._node_lookup.get_indexer([str(user_id)])[0]
+        return int(loc)
+
+    def _entry(self, user_id):
+        node = self._store_index(user_id)
+        pos = np.searchsorted(self.index['node'], node)
+        if node < 0 or pos >= len(self.index) or self.index['node'][pos] != node:
+            return None
+        return self.index[pos]
+
+    def __contains__(self, user_id):
+        return self._entry(user_id) is not None
+
+    def users(self):
+        return np.asarray(self.node_ids[self.index['node']]).tolist()
+
+    def member_indices(self, user_id):
+        """用户二跳网络成员在节点表中的下标；没有该用户时返回None"""
+        entry = self._entry(user_id)
+        if entry is None:
+            return None
+        with open(os.path.join(self.directory, MEMBERS_FILE), 'rb') as f:
+            f.seek(int(entry['offset']))
+            return decode_members(f.read(int(entry['nbytes'])))
+
+    def members(self, user_id):
+        """用户二跳网络成员的用户ID列表；没有该用户时返回None"""
+        indices = self.member_indices(user_id)
+        return None if indices is None else np.asarray(self.node_ids[indices]).tolist()
+
+
+def migrate_legacy_jsonl(jsonl_path, directory, G, batch_size=1000):
+    """把旧版ego_networks_info.jsonl中的'nodes'列表迁移到成员存储，并重写不含'nodes'的JSONL；返回迁移的用户数
+
+    逐行流式处理。G为由同一份边文件构建的图，不在G中的节点会被忽略。
+    """
+    writer = EgoMembershipWriter(directory, G)
+    temp_path = jsonl_path + '.tmp'
+    migrated, batch = 0, []
+    with open(jsonl_path, 'r', encoding='utf-8') as src, open(temp_path, 'w', encoding='utf-8') as dst:
+        for line in src:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            nodes = record['ego_network_info'].pop('nodes', None)
+            if nodes is not None and G.index_of(record['user_id']) >= 0:
+                indices = G.indices_of(nodes)
+                batch.append((record['user_id'], indices[indices >= 0]))
+                migrated += 1
+            dst.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if len(batch) >= batch_size:
+                writer.write_many(batch)
+                batch = []
+    writer.write_many(batch)
+    os.replace(temp_path, jsonl_path)
+    return migrated
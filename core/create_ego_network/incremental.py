@@ -0,0 +1,152 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from csr_graph import gather_rows
+from network_loader import normalize_ids, load_edges, edges_to_dataframe
+
+# 边的增量：added/removed 为规范化后的 source/target 字符串ID DataFrame
+EdgeDelta = namedtuple('EdgeDelta', ['added', 'removed'])
+
+# 增量文件中change列的取值；没有change列时全部视为新增边
+CHANGE_ADD = 'add'
+CHANGE_REMOVE = 'remove'
+
+# 二跳网络的半径：中心节点到任一变化端点的（无向）距离不超过该值时需要重新计算
+AFFECTED_RADIUS = 2
+
+
+def load_edge_delta(paths):
+    """读取一个或多个边增量CSV（source, target[, change]），返回EdgeDelta
+
+    refind_missed_users.py 写出的 new_edges_found_*.csv、fetch4_adder.py 写出的 new_edges_added_*.csv
+    都可以直接使用。同一条边在多个文件中先加后删（或相反）时以最后出现的为准。
+    """
+    frames = []
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"未找到边增量文件: {path}")
+        df = pd.read_csv(path, dtype={'source': str, 'target': str})
+        change = df['change'].astype(str).str.strip().str.lower() if 'change' in df.columns else CHANGE_ADD
+        frames.append(pd.DataFrame({'source': normalize_ids(df['source']).values,
+                                    'target': normalize_ids(df['target']).values,
+                                    'change': change}))
+    if not frames:
+        empty = pd.DataFrame({'source': [], 'target': []}, dtype=object)
+        return EdgeDelta(empty, empty.copy())
+    changes = pd.concat(frames, ignore_index=True)
+    unknown = set(changes['change'].unique()) - {CHANGE_ADD, CHANGE_REMOVE}
+    if unknown:
+        raise ValueError(f"边增量文件中有未知的change取值: {sorted(unknown)}（可用: {CHANGE_ADD}/{CHANGE_REMOVE}）")
+    changes = changes.drop_duplicates(['source', 'target'], keep='last')
+    added = changes[changes['change'] == CHANGE_ADD][['source', 'target']].reset_index(drop=True)
+    removed = changes[changes['change'] == CHANGE_REMOVE][['source', 'target']].reset_index(drop=True)
+    return EdgeDelta(added, removed)
+
+
+def diff_edges(before, after):
+    """比较前后两个 source/target 边表（规范化后的字符串ID），返回EdgeDelta"""
+    before = before[['source', 'target']].drop_duplicates()
+    after = after[['source', 'target']].drop_duplicates()
+    both = before.merge(after, on=['source', 'target'], how='outer', indicator=True)
+    added = both[both['_merge'] == 'right_only'][['source', 'target']].reset_index(drop=True)
+    removed = both[both['_merge'] == 'left_only'][['source', 'target']].reset_index(drop=True)
+    return EdgeDelta(added, removed)
+
+
+def diff_edge_files(before_path, after_path):
+    """比较前后两份edges.csv（如旧的备份文件与当前文件），返回EdgeDelta"""
+    return diff_edges(edges_to_dataframe(load_edges(before_path)), edges_to_dataframe(load_edges(after_path)))
+
+
+def affected_centres(G, delta, radius=AFFECTED_RADIUS):
+    """变化后的图G中，二跳网络受边增量影响的中心节点（用户ID集合）
+
+    边 (u, v) 的增删会改变中心c的二跳网络（成员、导出边、邻居度数、全图度数）当且仅当
+    在变化前或变化后的图中 c 与 u 或 v 的无向距离不超过radius。这里在“变化后的图 + 被删除的边”
+    （即前后两图的并）上从全部变化端点做一次多源双向BFS，一次得到所有受影响的中心。
+    """
+    endpoints = pd.unique(np.concatenate([delta.added['source'].values, delta.added['target'].values,
+                                          delta.removed['source'].values, delta.removed['target'].values]))
+    if len(endpoints) == 0:
+        return set()
+
+    # 被删除的边的端点可能已不在G中（节点随最后一条边一起消失），给它们追加临时编号
+    n = G.number_of_nodes()
+    removed_ids = pd.unique(np.concatenate([delta.removed['source'].values, delta.removed['target'].values]))
+    removed_idx = G.indices_of(removed_ids)
+    extra = removed_ids[removed_idx < 0]
+    extra_index = pd.Index(extra)
+
+    def to_index(user_ids):
+        idx = np.asarray(G.indices_of(user_ids), dtype=np.int64)
+        missing = idx < 0
+        if missing.any():
+            pos = extra_index.get_indexer(np.asarray(user_ids, dtype=object)[missing])
+            idx[missing] = np.where(pos >= 0, n + pos, -1)
+        return idx
+
+    total = n + len(extra)
+    rem_src = to_index(delta.removed['source'].values)
+    rem_tgt = to_index(delta.removed['target'].values)
+    # 被删除的边按无向邻接存成CSR，BFS时与G的出/入边一起展开
+    rows = np.concatenate([rem_src, rem_tgt])
+    cols = np.concatenate([rem_tgt, rem_src])
+    order = np.argsort(rows, kind='stable')
+    extra_indptr = np.zeros(total + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=total), out=extra_indptr[1:])
+    extra_indices = cols[order]
+
+    visited = np.zeros(total, dtype=bool)
+    frontier = to_index(endpoints)
+    frontier = np.unique(frontier[frontier >= 0])
+    visited[frontier] = True
+    for _ in range(radius):
+        in_graph = frontier[frontier < n]
+        candidates = np.concatenate([
+            gather_rows(G.out_indptr, G.out_indices, in_graph).astype(np.int64),
+            gather_rows(G.in_indptr, G.in_indices, in_graph).astype(np.int64),
+            gather_rows(extra_indptr, extra_indices, frontier),
+        ])
+        candidates = np.unique(candidates)
+        frontier = candidates[~visited[candidates]]
+        if len(frontier) == 0:
+            break
+        visited[frontier] = True
+    reached = np.flatnonzero(visited[:n])
+    return set(G.node_ids[reached].tolist())
+
+
+def load_user_list(paths):
+    """读取一个或多个用户列表CSV（user_id列，如clean_network_data.py写出的affected_users_*.csv），返回规范化后的用户ID集合"""
+    users = set()
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"未找到用户列表文件: {path}")
+        df = pd.read_csv(path, dtype={'user_id': str}, usecols=['user_id'])
+        users.update(normalize_ids(df['user_id'].dropna()).tolist())
+    return users
+
+
+def plan_recompute(affected, completed_users, valid_users, costs_fn=None):
+    """确定增量模式下需要重新计算的用户和可以沿用的记录
+
+    affected为受影响的用户，completed_users为已有结果的用户，valid_users为本次应有结果的用户。
+    返回 (需重算的已完成用户集合, 统计dict)；costs_fn(users) 给出估计代价时统计中附带被跳过的代价占比。
+    """
+    done = completed_users & valid_users
+    recompute = done & affected
+    reused = done - recompute
+    stats = {
+        'affected_users': len(affected),
+        'recomputed_users': len(recompute),
+        'reused_records': len(reused),
+        'new_users': len(valid_users - completed_users),
+    }
+    if costs_fn is not None and done:
+        reused_cost = float(np.sum(costs_fn(list(reused)))) if reused else 0.0
+        total_cost = float(np.sum(costs_fn(list(done))))
+        stats['skipped_cost_share'] = reused_cost / total_cost if total_cost > 0 else 0.0
+    return recompute, stats
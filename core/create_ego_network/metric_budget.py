@@ -0,0 +1,107 @@
+import time
+from collections import namedtuple
+
+# 指标缺失或降级的原因代码
+REASON_TIMEOUT = 'timeout'       # 超出耗时预算
+REASON_MEMORY = 'memory'         # 估计内存超出预算
+REASON_ERROR = 'error'           # 计算出错
+
+# 介数超出预算时降级为抽样近似的源点数；谱半径降级为幂迭代时的相对误差容限
+BETWEENNESS_FALLBACK_SAMPLES = 64
+POWER_ITERATION_TOL = 1e-6
+# 有降级方法时主方法可用的耗时预算比例，其余留给降级方法；主方法提前结束（出错或超出内存预算）时
+# 降级方法可用剩余的全部时间。两者合计不超过该指标的耗时预算
+PRIMARY_BUDGET_SHARE = 0.6
+
+# 一次受预算约束的指标计算结果：value为None表示缺失；fallback_reason非空表示已降级为method
+BudgetedValue = namedtuple('BudgetedValue', ['value', 'method', 'fallback_reason', 'missing_reason'])
+
+
+class BudgetExceeded(Exception):
+    """计算超出预算；reason为原因代码"""
+
+    def __init__(self, reason, message=''):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class Deadline:
+    """墙钟截止时间：算法在循环中调用check()，超时即抛出BudgetExceeded（协作式中断）"""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
+
+    def remaining(self):
+        """剩余秒数（不小于0）；没有截止时间时为None"""
+        return None if self.expires is None else max(0.0, self.expires - time.monotonic())
+
+    def share(self, fraction):
+        """在本截止时间之内再取剩余时间的fraction作为新的截止时间"""
+        remaining = self.remaining()
+        return Deadline(None if remaining is None else remaining * fraction)
+
+    def check(self):
+        if self.expired():
+            raise BudgetExceeded(REASON_TIMEOUT, f"超出耗时预算 {self.seconds} 秒")
+
+
+def check_deadline(deadline):
+    if deadline is not None:
+        deadline.check()
+
+
+def estimate_memory_bytes(method, n, m):
+    """按二跳网络的节点数n、边数m粗略估计各计算方式的峰值内存（字节）
+
+    只用于预算判断，常数按各实现的主要数组/对象估计：稀疏矩阵每个非零元约12字节，
+    EasyGraph对象每个节点/边约400字节，批量BFS的每个 节点×源点 单元约48字节。
+    """
+    from ego_betweenness import BATCH_CELLS
+    if method == 'ego_betweenness':
+        return 24 * m + 48 * min(n * n, BATCH_CELLS)
+    if method == 'sampled_betweenness':
+        return 24 * m + 48 * min(n * BETWEENNESS_FALLBACK_SAMPLES, BATCH_CELLS)
+    if method in ('full_betweenness', 'easygraph'):
+        return 400 * (n + m)
+    if method == 'arpack':
+        return 60 * m + 200 * n
+    if method == 'power_iteration':
+        return 40 * m + 40 * n
+    if method in ('louvain', 'single_level_louvain'):
+        return 120 * m + 200 * n
+    return 0
+
+
+def run_with_budget(primary, fallback, n, m, seconds=None, memory_mb=None):
+    """在预算内计算一个指标，超出时降级，仍不行则记为缺失（绝不以0.0代替）
+
+    primary/fallback为 (计算方式名, fn(deadline))，fallback可为None。
+    先按估计内存判断：主方法超出内存预算时直接降级；降级方法也超出时记为缺失。
+    主方法超时或出错时改用降级方法。seconds是整个指标（主方法 + 降级方法）的耗时预算：
+    有降级方法时主方法最多用其中的PRIMARY_BUDGET_SHARE，降级方法使用剩余时间。
+    返回BudgetedValue。
+    """
+    limit = None if memory_mb is None else memory_mb * 1024 * 1024
+    candidates = [primary] + ([fallback] if fallback is not None else [])
+    deadline = Deadline(seconds)
+    reason = None
+    for i, (method, compute) in enumerate(candidates):
+        if limit is not None and estimate_memory_bytes(method, n, m) > limit:
+            reason = REASON_MEMORY
+            continue
+        has_next = i + 1 < len(candidates)
+        try:
+            value = compute(deadline.share(PRIMARY_BUDGET_SHARE) if has_next else deadline)
+        except BudgetExceeded as e:
+            reason = e.reason
+            continue
+        except Exception as e:
+            print(f"    ⚠️ {method} 计算出错: {e}")
+            reason = REASON_ERROR
+            continue
+        return BudgetedValue(value, method, reason if i > 0 else None, None)
+    return BudgetedValue(None, None, None, reason)
@@ -0,0 +1,111 @@
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# 驻留后的边表：node_ids[i] 为整数ID i 对应的用户ID，source/target 为int32整数ID数组
+EdgeTable = namedtuple('EdgeTable', ['node_ids', 'source', 'target'])
+
+# 不超过15位的十进制整数（可带 .0 后缀）可以直接按字符串规范化，结果与 int(float(x)) 完全一致
+_PLAIN_ID_PATTERN = r'\d{1,15}(?:\.0*)?'
+
+POPULARITY_DTYPES = {
+    'user_id': str,
+    'avg_popularity': np.float64,
+    'avg_popularity_of_all': np.float64,
+}
+
+
+def normalize_id(id_value):
+    """规范化用户ID，确保格式一致"""
+    try:
+        id_str = str(id_value).strip()
+        if id_str == '-2147483648':
+            return id_str
+        return str(int(float(id_str)))
+    except:
+        return str(id_value).strip()
+
+
+def normalize_ids(values):
+    """向量化的normalize_id：返回规范化后的字符串Series（与normalize_id语义一致）
+
+    常见的纯数字ID（含 '123.0' 形式）用字符串操作处理，
+    其余少量特殊值（-2147483648、科学计数法、非数字等）按唯一值回退到normalize_id。
+    """
+    ids = pd.Series(values, copy=False).astype(str).str.strip()
+    plain = ids.str.fullmatch(_PLAIN_ID_PATTERN)
+    result = ids.copy()
+
+    digits = ids[plain].str.replace(r'\.0*$', '', regex=True).str.lstrip('0')
+    result[plain] = digits.where(digits != '', '0')
+
+    rest = ~plain
+    if rest.any():
+        mapping = {value: normalize_id(value) for value in ids[rest].unique()}
+        result[rest] = ids[rest].map(mapping)
+    return result
+
+
+def intern_edges(sources, targets, deduplicate=True):
+    """将规范化后的source/target驻留为整数ID，节点按首次出现顺序编号"""
+    sources = np.asarray(sources, dtype=object)
+    targets = np.asarray(targets, dtype=object)
+    # 交错排列 s0,t0,s1,t1,... 使编号顺序与逐边add_edge的插入顺序一致
+    interleaved = np.empty(len(sources) * 2, dtype=object)
+    interleaved[0::2] = sources
+    interleaved[1::2] = targets
+    codes, node_ids = pd.factorize(interleaved)
+    source = codes[0::2].astype(np.int32)
+    target = codes[1::2].astype(np.int32)
+
+    if deduplicate and len(source) > 0:
+        keys = source.astype(np.int64) * len(node_ids) + target
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        source, target = source[first], target[first]
+
+    return EdgeTable(np.asarray(node_ids, dtype=object), source, target)
+
+
+def load_edges(edges_path, deduplicate=True):
+    """读取edges.csv并返回EdgeTable（ID已规范化并驻留为整数）"""
+    edges_df = pd.read_csv(edges_path, usecols=['source', 'target'],
+                           dtype={'source': str, 'target': str})
+    return intern_edges(normalize_ids(edges_df['source']).values,
+                        normalize_ids(edges_df['target']).values,
+                        deduplicate=deduplicate)
+
+
+def edges_to_dataframe(table):
+    """EdgeTable -> 字符串ID的 source/target DataFrame"""
+    return pd.DataFrame({
+        'source': table.node_ids[table.source],
+        'target': table.node_ids[table.target],
+    })
+
+
+def load_users(users_path):
+    """读取users.csv，user_id按字符串读取并规范化"""
+    users_df = pd.read_csv(users_path, dtype={'user_id': str})
+    users_df['user_id'] = normalize_ids(users_df['user_id']).values
+    return users_df
+
+
+def load_popularity(popularity_path):
+    """读取popularity.csv，user_id按字符串读取并规范化，影响力列为float64"""
+    columns = pd.read_csv(popularity_path, nrows=0).columns
+    dtypes = {col: dtype for col, dtype in POPULARITY_DTYPES.items() if col in columns}
+    popularity_df = pd.read_csv(popularity_path, dtype=dtypes)
+    popularity_df['user_id'] = normalize_ids(popularity_df['user_id']).values
+    return popularity_df
+
+
+def load_network(network_dir, deduplicate=True):
+    """读取一个网络目录下的 edges/users/popularity，缺失的文件返回None"""
+    users_path = os.path.join(network_dir, 'users.csv')
+    popularity_path = os.path.join(network_dir, 'popularity.csv')
+    table = load_edges(os.path.join(network_dir, 'edges.csv'), deduplicate=deduplicate)
+    users_df = load_users(users_path) if os.path.exists(users_path) else None
+    popularity_df = load_popularity(popularity_path) if os.path.exists(popularity_path) else None
+    return table, users_df, popularity_df
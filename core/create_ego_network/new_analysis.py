@@ -10,6 +10,8 @@ import easygraph.functions as eg_f
 from scipy import linalg
 from datetime import datetime
 from collections import defaultdict # 用于存储社区权重
+from ego_community import modularity as ego_modularity
+from versioned_dataset import VersionedDataset
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimSun']
@@ -223,51 +225,11 @@ def _one_level_fixed(G, m, partition, is_directed=False, max_iterations=100):
     return partition, inner_partition, total_moves > 0
 
 def modularity_fixed(G, communities, weight="weight"):
-    """计算给定社区划分的模块度，基于test1.py的验证版本"""
+    """计算给定社区划分的模块度，基于社区内部边权与社区度数乘积的向量化实现（O(m + n)）"""
     if not isinstance(communities, list):
         communities = list(communities)
 
-    directed = G.is_directed()
-    m = G.size(weight=weight)
-    if m == 0:
-        return 0
-        
-    if directed:
-        out_degree = dict(G.out_degree(weight=weight))
-        in_degree = dict(G.in_degree(weight=weight))
-        norm = 1 / m
-    else:
-        out_degree = dict(G.degree(weight=weight))
-        in_degree = out_degree
-        norm = 1 / (2 * m)
-    
-    # 计算社区内部边数（用于调试）
-    internal_edges = 0
-    for c in communities:
-        for u in c:
-            for v in c:
-                if G.has_edge(u, v):
-                    internal_edges += 1
-    
-    # 定义边权重计算函数
-    def val(u, v):
-        try:
-            w = G[u][v].get(weight, 1)
-        except KeyError:
-            w = 0
-        # Double count self-loops if the graph is undirected.
-        if u == v and not directed:
-            w *= 2
-        return w - in_degree.get(u, 0) * out_degree.get(v, 0) * norm
-    
-    # 计算模块度
-    Q = 0
-    for c in communities:
-        for u in c:
-            for v in c:
-                Q += val(u, v)
-    
-    Q = Q * norm
+    Q, internal_edges = ego_modularity(G, communities, weight=weight, return_internal_edges=True)
     
     # 调试用，这些信息可以体现每次迭代的社区划分和模块度，判断是否有改进
     print(f"  - 社区数量: {len(communities)}")
@@ -500,8 +462,8 @@ def main():
     
     # 设置路径
     base_dir = 'C:/Tengfei/data/data/domain_networks/merged_network'
-    edges_path = os.path.join(base_dir, 'edges.csv')
-    popularity_path = os.path.join(base_dir, 'popularity.csv')
+    # 版本化网络目录：读取时应用清洗、补边、补影响力等增量，回滚后读到的即为回滚到的版本
+    dataset = VersionedDataset(base_dir)
     output_dir = 'C:/Tengfei/data/results'
     metrics_output = os.path.join(output_dir, 'network_metrics.jsonl')
     ego_networks_output = os.path.join(output_dir, 'ego_networks_info.jsonl')
@@ -521,19 +483,11 @@ def main():
     # 步骤1和2：加载数据、构建图并计算网络指标
     if recalculate:
         print("正在加载网络数据...")
-        edges_df = pd.read_csv(edges_path)
-        popularity_df = pd.read_csv(popularity_path)
-        
-        # 预处理：规范化ID
-        print("正在规范化用户ID...")
-        # 创建规范化ID的映射
-        source_id_map = {row['source']: normalize_id(row['source']) for _, row in edges_df.iterrows()}
-        target_id_map = {row['target']: normalize_id(row['target']) for _, row in edges_df.iterrows()}
-        edges_df['source'] = edges_df['source'].map(source_id_map)
-        edges_df['target'] = edges_df['target'].map(target_id_map)
-        
-        # 规范化popularity的ID
-        popularity_df['user_id'] = popularity_df['user_id'].apply(normalize_id)
+        if dataset.versions():
+            print(f"📚 数据版本: {dataset.current_version}（共 {dataset.latest_version} 个版本）")
+        # 读取时已规范化用户ID
+        edges_df = dataset.edges_frame()
+        popularity_df = dataset.load_popularity()
         
         # 构建有向图
         print("正在构建网络...")
@@ -656,7 +610,7 @@ def main():
         # 加载已有的网络指标
         print("加载已有的网络指标...")
         metrics_data = load_metrics_from_jsonl(metrics_output)
-        popularity_df = pd.read_csv(popularity_path)
+        popularity_df = dataset.load_popularity()
         print(f"已加载 {len(metrics_data)} 个用户的网络指标")
     
     # 步骤3：将指标转换为DataFrame格式
@@ -0,0 +1,180 @@
+import io
+import os
+import heapq
+import shutil
+import signal
+import tempfile
+import contextlib
+from multiprocessing import Pool
+
+import numpy as np
+
+from csr_graph import CSRGraph
+
+# 工作进程内的全局状态：{任务键: (图目录, 任务参数)}，以及已打开的内存映射图（首次用到时才打开）
+_worker_jobs = None
+_worker_graphs = {}
+
+
+def _init_worker(jobs):
+    """工作进程初始化：记录各任务的图目录和参数，忽略Ctrl+C（由主进程统一处理）"""
+    global _worker_jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_jobs = jobs
+
+
+def _worker_graph(key):
+    """以只读内存映射方式打开任务key对应的全图，每个工作进程每张图只打开一次"""
+    if key not in _worker_graphs:
+        _worker_graphs[key] = CSRGraph.load_arrays(_worker_jobs[key][0])
+    return _worker_graphs[key]
+
+
+def _run_task(task):
+    """计算一批用户，返回 (任务键, [(user_id, process_user的结果 或 None, 错误信息), ...])；逐用户的打印被屏蔽"""
+    import create3
+    key, user_ids = task
+    G = _worker_graph(key)
+    worker_args = _worker_jobs[key][1]
+    results = []
+    for user_id in user_ids:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = create3.process_user(G, user_id, **worker_args)
+            results.append((user_id, result, None))
+        except Exception as e:
+            results.append((user_id, None, f"{type(e).__name__}: {e}"))
+    return key, results
+
+
+# ---------- 按代价调度 ----------
+
+def estimate_ego_costs(G, users):
+    """用度数数组估计每个用户二跳网络的规模：自身度数 + 所有（入/出）邻居的总度数之和
+
+    对全图一次性计算（前缀和上按CSR行切片求和），O(|E|)，不构建任何ego网络。
+    """
+    degrees = G.degrees.astype(np.int64)
+
+    def row_sums(indptr, indices):
+        prefix = np.concatenate([[0], np.cumsum(degrees[indices])])
+        return prefix[indptr[1:]] - prefix[indptr[:-1]]
+
+    costs = degrees + row_sums(G.out_indptr, G.out_indices) + row_sums(G.in_indptr, G.in_indices)
+    idx = G.indices_of(users)
+    return np.where(idx >= 0, costs[np.maximum(idx, 0)], 0).astype(np.float64)
+
+
+def lpt_order(users, costs):
+    """最长处理时间优先（LPT）：按估计代价从大到小排列，返回 (用户列表, 代价数组)"""
+    order = np.argsort(-np.asarray(costs), kind='stable')
+    return [users[i] for i in order], np.asarray(costs)[order]
+
+
+def cost_balanced_chunks(users, costs, chunk_size):
+    """把（已按LPT排好序的）用户切成批：每批至多chunk_size个用户，且估计代价不超过平均每批代价
+
+    大用户单独成批，先被派发；小用户成批派发以减少进程间通信。
+    """
+    if len(users) == 0:
+        return []
+    budget = max(float(np.mean(costs)) * chunk_size, 1.0)
+    chunks, current, current_cost = [], [], 0.0
+    for user, cost in zip(users, costs):
+        if current and (len(current) >= chunk_size or current_cost + cost > budget):
+            chunks.append(current)
+            current, current_cost = [], 0.0
+        current.append(user)
+        current_cost += cost
+    chunks.append(current)
+    return chunks
+
+
+def fit_runtime_model(costs, seconds):
+    """按 耗时 ≈ a · (代价+1)^b 在对数空间最小二乘拟合，返回 (a, b)；b限制在[0.5, 3]"""
+    x = np.log(np.asarray(costs, dtype=np.float64) + 1)
+    y = np.log(np.maximum(np.asarray(seconds, dtype=np.float64), 1e-6))
+    if len(x) >= 2 and np.ptp(x) > 0:
+        b = float(np.clip(np.polyfit(x, y, 1)[0], 0.5, 3.0))
+    else:
+        b = 1.0
+    a = float(np.exp(np.mean(y - b * x)))
+    return a, b
+
+
+def predict_runtimes(model, costs):
+    a, b = model
+    return a * (np.asarray(costs, dtype=np.float64) + 1) ** b
+
+
+def predict_makespan(runtimes, workers):
+    """按LPT把预测耗时分配给workers个进程，返回最忙进程的总耗时（预计墙钟时间）"""
+    loads = [0.0] * max(1, workers)
+    for t in sorted(runtimes, reverse=True):
+        heapq.heappush(loads, heapq.heappop(loads) + float(t))
+    return max(loads)
+
+
+class ParallelJob:
+    """一张图上的一组用户：key区分不同的图（如不同话题），on_result接收该组用户的结果"""
+
+    def __init__(self, key, G, users, worker_args, on_result, costs=None):
+        self.key = key
+        self.G = G
+        self.users = list(users)
+        self.worker_args = worker_args
+        self.on_result = on_result
+        self.costs = costs
+
+
+def _job_tasks(job, chunk_size):
+    """把一个任务切成 (估计代价, (任务键, 用户批)) 列表"""
+    if job.costs is None:
+        return [(0.0, (job.key, job.users[i:i + chunk_size])) for i in range(0, len(job.users), chunk_size)]
+    users, costs = lpt_order(job.users, job.costs)
+    cost_of = dict(zip(users, costs))
+    return [(float(sum(cost_of[u] for u in chunk)), (job.key, chunk))
+            for chunk in cost_balanced_chunks(users, costs, chunk_size)]
+
+
+def run_parallel_jobs(jobs, workers=None, chunk_size=4, work_dir=None):
+    """多张图的用户共用一个进程池：所有任务的用户批按估计代价统一LPT排序后派发
+
+    每张图只写一次磁盘（CSR数组的.npy文件，各占work_dir下一个子目录），工作进程首次用到时内存映射打开，
+    任务只传 (任务键, 用户ID批)。结果在主进程中交给对应任务的on_result(user_id, result, error)。
+    work_dir为None时使用临时目录，运行结束后删除。
+    """
+    workers = workers or os.cpu_count()
+    tasks = []
+    for job in jobs:
+        tasks.extend(_job_tasks(job, chunk_size))
+    tasks = [task for _, task in sorted(tasks, key=lambda item: -item[0])]
+    handlers = {job.key: job.on_result for job in jobs}
+
+    own_dir = work_dir is None
+    if own_dir:
+        work_dir = tempfile.mkdtemp(prefix='csr_graph_')
+    try:
+        worker_jobs = {}
+        for i, job in enumerate(jobs):
+            graph_dir = os.path.join(work_dir, f'graph_{i}')
+            job.G.save_arrays(graph_dir)
+            worker_jobs[job.key] = (graph_dir, job.worker_args)
+        with Pool(workers, initializer=_init_worker, initargs=(worker_jobs,)) as pool:
+            for key, results in pool.imap_unordered(_run_task, tasks):
+                for user_id, result, error in results:
+                    handlers[key](user_id, result, error)
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_parallel(G, users, worker_args, on_result, workers=None, chunk_size=4, graph_dir=None, costs=None):
+    """用进程池并行计算一张图上每个用户的二跳网络和指标（run_parallel_jobs的单图情形）
+
+    全图只写一次磁盘，各工作进程内存映射共享，任务只传用户ID。
+    给出costs（估计代价）时按LPT顺序派发，并按代价切批，避免大用户挤在同一批里。
+    结果按完成顺序在主进程中交给on_result(user_id, result, error)，由主进程单独写文件。
+    """
+    job = ParallelJob(0, G, users, worker_args, on_result, costs=costs)
+    run_parallel_jobs([job], workers=workers, chunk_size=chunk_size, work_dir=graph_dir)
@@ -0,0 +1,144 @@
+import os
+import json
+
+import numpy as np
+
+# 完成索引：network_metrics.jsonl 旁的sidecar文件（network_metrics.jsonl.idx），
+# 每行 “user_id \t 字节偏移 \t 字节长度”，与JSONL同步追加。断点续传只读这个小文件；
+# 同一用户有多条记录时以最后一条为准。
+# 删除标记（tombstone）：JSONL中的 {"user_id": ..., "removed": true} 行，索引中记为负的字节长度；
+# 用户的最后一条为删除标记时视为没有结果（重算后网络过小/失败的用户、已不在网络中的用户）。
+INDEX_SUFFIX = '.idx'
+TOMBSTONE_KEY = 'removed'
+
+
+def _parse_line(line):
+    """JSONL一行 -> (user_id, 是否删除标记)；无法解析时user_id为None"""
+    try:
+        record = json.loads(line)
+        return record['user_id'], bool(record.get(TOMBSTONE_KEY))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None, False
+
+
+class ProgressIndex:
+    """JSONL结果文件的完成索引：追加记录时同步写索引，续传时只读索引，合并时按索引流式读取"""
+
+    def __init__(self, jsonl_path):
+        self.jsonl_path = jsonl_path
+        self.index_path = jsonl_path + INDEX_SUFFIX
+        self.offsets = {}
+        self.end = 0
+        self._load()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, user_id):
+        return user_id in self.offsets
+
+    def completed_users(self):
+        return set(self.offsets)
+
+    def _load(self):
+        """读取索引；JSONL中有未编入索引的尾部（旧文件或中断写入）时只扫描这部分并补写索引"""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) != 3 or not line.endswith('\n'):
+                        continue
+                    offset, length = int(parts[1]), int(parts[2])
+                    if length < 0:
+                        self.offsets.pop(parts[0], None)
+                    else:
+                        self.offsets[parts[0]] = (offset, length)
+                    self.end = max(self.end, offset + abs(length))
+        size = os.path.getsize(self.jsonl_path) if os.path.exists(self.jsonl_path) else 0
+        if size < self.end:
+            # 索引比数据文件还长（数据文件被替换或截断过），整体重建
+            self.offsets, self.end = {}, 0
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        if size > self.end:
+            self._index_tail(size)
+
+    def _index_tail(self, size):
+        entries = []
+        offset = self.end
+        with open(self.jsonl_path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                user_id, removed = _parse_line(raw.decode('utf-8', errors='replace'))
+                if user_id is not None:
+                    entries.append((user_id, offset, -len(raw) if removed else len(raw)))
+                offset += len(raw)
+        if offset < size:
+            # 最后一行不完整（写入被中断），截掉后续传时会重新计算该用户
+            with open(self.jsonl_path, 'r+b') as f:
+                f.truncate(offset)
+        self._append_index(entries)
+        self.end = offset
+
+    def _append_index(self, entries):
+        if not entries:
+            return
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            for user_id, offset, length in entries:
+                f.write(f"{user_id}\t{offset}\t{length}\n")
+                if length < 0:
+                    self.offsets.pop(user_id, None)
+                else:
+                    self.offsets[user_id] = (offset, length)
+
+    def append(self, records):
+        """records为 {user_id: 记录dict}：先追加JSONL，再追加索引（索引中的用户其记录一定完整）"""
+        self._append_lines([(user_id, record, False) for user_id, record in records.items()])
+
+    def remove(self, user_ids):
+        """为已有记录的用户追加删除标记，返回被删除的用户数；没有记录的用户忽略"""
+        user_ids = [user_id for user_id in user_ids if user_id in self.offsets]
+        self._append_lines([(user_id, {'user_id': user_id, TOMBSTONE_KEY: True}, True) for user_id in user_ids])
+        return len(user_ids)
+
+    def _append_lines(self, items):
+        if not items:
+            return
+        entries = []
+        with open(self.jsonl_path, 'ab') as f:
+            offset = f.tell()
+            for user_id, record, removed in items:
+                raw = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+                f.write(raw)
+                entries.append((user_id, offset, -len(raw) if removed else len(raw)))
+                offset += len(raw)
+        self._append_index(entries)
+        self.end = offset
+
+    def read(self, user_id):
+        """按偏移读取一个用户的记录；没有该用户时返回None"""
+        if user_id not in self.offsets:
+            return None
+        offset, length = self.offsets[user_id]
+        with open(self.jsonl_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length).decode('utf-8'))
+
+    def iter_records(self):
+        """顺序流式读取每个用户的最新记录（不在内存中保留全部记录）"""
+        latest = np.sort(np.fromiter((offset for offset, _ in self.offsets.values()), dtype=np.int64,
+                                     count=len(self.offsets)))
+        if len(latest) == 0:
+            return
+        pos = 0
+        with open(self.jsonl_path, 'rb') as f:
+            offset = 0
+            for raw in f:
+                if offset == latest[pos]:
+                    yield json.loads(raw.decode('utf-8'))
+                    pos += 1
+                    if pos == len(latest):
+                        return
+                offset += len(raw)
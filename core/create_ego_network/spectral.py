@@ -0,0 +1,139 @@
+import time
+
+import numpy as np
+from scipy import linalg, sparse
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import eigs, ArpackNoConvergence, ArpackError
+
+from metric_budget import check_deadline
+
+# 节点数不超过该值的块直接用稠密特征值求解（与原实现完全一致）
+DENSE_THRESHOLD = 64
+DEFAULT_TOL = 1e-8
+# ARPACK的Krylov子空间维数（k=1时scipy的默认值）
+ARPACK_NCV = 20
+# 有截止时间时ARPACK最多使用剩余时间的比例，其余留给不收敛时退回的幂迭代
+ARPACK_BUDGET_SHARE = 0.5
+# 剩余时间按估计只够ARPACK重启少于该次数时，直接改用可中断的幂迭代
+ARPACK_MIN_ITER = 3
+
+
+def _dense_radius(block):
+    """稠密求解：最大特征值的绝对值"""
+    dense = block.toarray() if sparse.issparse(block) else np.asarray(block)
+    if dense.size == 0:
+        return 0.0
+    return float(np.max(np.abs(linalg.eigvals(dense))))
+
+
+def power_iteration_radius(block, tol=DEFAULT_TOL, max_iter=10000, deadline=None):
+    """幂迭代 + Perron–Frobenius (Collatz–Wielandt) 上下界
+
+    对不可约非负矩阵 A，迭代 B = A + I（保证本原、避免周期振荡）。
+    对任意正向量 x 有 min(Bx/x) <= ρ(B) <= max(Bx/x)，上下界相对差小于tol时停止。
+    返回 (谱半径估计, 下界, 上界)。给出deadline时每轮检查一次是否超时。
+    """
+    n = block.shape[0]
+    B = sparse.csr_matrix(block) + sparse.identity(n, format='csr')
+    x = np.full(n, 1.0 / n)
+    lower, upper = 0.0, np.inf
+    for _ in range(max_iter):
+        check_deadline(deadline)
+        y = B @ x
+        ratios = y / x
+        lower, upper = max(lower, ratios.min()), min(upper, ratios.max())
+        if upper - lower <= tol * upper:
+            break
+        x = y / y.sum()
+    return (lower + upper) / 2 - 1.0, lower - 1.0, upper - 1.0
+
+
+def arpack_maxiter(block, deadline=None, ncv=ARPACK_NCV):
+    """按截止时间的剩余秒数估计ARPACK最多可做的重启次数；没有截止时间时为 max(1000, 10n)
+
+    ARPACK一次重启约做ncv次矩阵向量乘和ncv次对Krylov基的正交化，这里现场测一次两者的耗时来估计。
+    单次eigs调用无法中途检查截止时间，只能靠限制maxiter把它的耗时控制在剩余时间的ARPACK_BUDGET_SHARE以内。
+    """
+    n = block.shape[0]
+    default = max(1000, 10 * n)
+    remaining = None if deadline is None else deadline.remaining()
+    if remaining is None:
+        return default
+    x = np.ones(n)
+    basis = np.ones((ncv, n))
+    start = time.perf_counter()
+    y = block @ x
+    basis @ y
+    per_iteration = ncv * (time.perf_counter() - start)
+    return int(min(default, remaining * ARPACK_BUDGET_SHARE / max(per_iteration, 1e-9)))
+
+
+def _block_radius(block, tol, dense_threshold, method='arpack', deadline=None):
+    """计算一个强连通块（不可约）的谱半径；method='power' 时不用ARPACK，直接幂迭代"""
+    n = block.shape[0]
+    if n <= dense_threshold:
+        return _dense_radius(block)
+    if method == 'power':
+        radius, _, _ = power_iteration_radius(block, tol=tol, deadline=deadline)
+        return float(radius)
+    maxiter = arpack_maxiter(block, deadline, ncv=min(n, ARPACK_NCV))
+    if maxiter < ARPACK_MIN_ITER:
+        radius, _, _ = power_iteration_radius(block, tol=tol, deadline=deadline)
+        return float(radius)
+    try:
+        # ARPACK：只求模最大的一个特征值；重启次数受剩余耗时预算限制
+        values = eigs(block, k=1, which='LM', tol=tol, return_eigenvectors=False,
+                      v0=np.ones(n), ncv=min(n, ARPACK_NCV), maxiter=maxiter)
+        return float(np.abs(values[0]))
+    except (ArpackNoConvergence, ArpackError):
+        radius, _, _ = power_iteration_radius(block, tol=tol, deadline=deadline)
+        return float(radius)
+
+
+def sparse_spectral_radius(A, tol=DEFAULT_TOL, dense_threshold=DENSE_THRESHOLD, method='arpack', deadline=None):
+    """稀疏非负邻接矩阵的谱半径
+
+    谱半径等于各强连通分量对角块谱半径的最大值，因此先按强连通分量拆块：
+    单点分量只取决于自环；其余块按“行和/列和上界”从大到小处理，上界不超过
+    当前最大值的块直接跳过。小块稠密求解，大块用ARPACK，不收敛时退回幂迭代。
+    method='power' 时大块一律用幂迭代（幂迭代每轮检查一次截止时间）。单次ARPACK调用无法中途打断，
+    有deadline时按剩余时间限制其重启次数（见arpack_maxiter），剩余时间不够时直接改用幂迭代，
+    因此整个计算的耗时受deadline约束。
+    """
+    A = sparse.csr_matrix(A, dtype=np.float64)
+    n = A.shape[0]
+    if n == 0 or A.nnz == 0:
+        return 0.0
+    if n <= dense_threshold:
+        return _dense_radius(A)
+
+    n_comp, labels = csgraph.connected_components(A, directed=True, connection='strong')
+    coo = A.tocoo()
+    intra = labels[coo.row] == labels[coo.col]
+    rows, cols, vals = coo.row[intra], coo.col[intra], coo.data[intra]
+    if len(rows) == 0:
+        return 0.0
+
+    # 单点分量：只有自环才贡献谱半径
+    best = float(vals[rows == cols].max()) if np.any(rows == cols) else 0.0
+
+    # 每个分量的上界：min(块内最大行和, 块内最大列和)
+    row_sums = np.bincount(rows, weights=vals, minlength=n)
+    col_sums = np.bincount(cols, weights=vals, minlength=n)
+    max_row = np.zeros(n_comp)
+    max_col = np.zeros(n_comp)
+    np.maximum.at(max_row, labels, row_sums)
+    np.maximum.at(max_col, labels, col_sums)
+    bounds = np.minimum(max_row, max_col)
+    sizes = np.bincount(labels, minlength=n_comp)
+
+    for comp in np.argsort(-bounds):
+        if bounds[comp] <= best:
+            break
+        if sizes[comp] < 2:
+            continue
+        check_deadline(deadline)
+        members = np.flatnonzero(labels == comp)
+        block = A[members][:, members]
+        best = max(best, _block_radius(block, tol, dense_threshold, method, deadline))
+    return best
@@ -0,0 +1,191 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# 每次转换并写出的记录数；峰值内存只与这个值有关，与用户总数无关
+MERGE_CHUNK_SIZE = 50_000
+MERGED_FORMATS = ('csv', 'parquet', 'both')
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PopularityLookup:
+    """popularity表按驻留后的整数ID存成数组：给出全图G时下标即G的内部整数ID，否则为popularity中用户ID的编号
+
+    同一user_id出现多次时以最后一行为准。
+    """
+
+    def __init__(self, popularity_df, columns, G=None):
+        self.columns = list(columns)
+        self.G = G
+        user_ids = popularity_df['user_id'].to_numpy()
+        if G is not None:
+            self._index = None
+            positions = G.indices_of(user_ids)
+            size = G.number_of_nodes()
+        else:
+            self._index = pd.Index(pd.unique(user_ids))
+            positions = self._index.get_indexer(user_ids)
+            size = len(self._index)
+        keep = positions >= 0
+        self.present = np.zeros(size, dtype=bool)
+        self.present[positions[keep]] = True
+        self.values = {}
+        for col in self.columns:
+            array = np.full(size, np.nan)
+            array[positions[keep]] = popularity_df[col].to_numpy(dtype=np.float64)[keep]
+            self.values[col] = array
+
+    def positions(self, user_ids):
+        """用户ID -> 数组下标，不在popularity中的为-1"""
+        if self._index is not None:
+            positions = self._index.get_indexer(user_ids)
+        else:
+            positions = np.asarray(self.G.indices_of(user_ids), dtype=np.int64)
+        found = positions >= 0
+        found[found] = self.present[positions[found]]
+        return np.where(found, positions, -1)
+
+
+def _value_kind(value):
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool'
+    if isinstance(value, (int, np.integer)):
+        return 'int'
+    if isinstance(value, (float, np.floating)):
+        return 'float'
+    return 'str'
+
+
+def _merge_kind(old, new):
+    if old is None or old == new:
+        return new
+    if {old, new} <= {'int', 'float'}:
+        return 'float'
+    return 'str'
+
+
+def scan_columns(records):
+    """第一遍扫描：按首次出现顺序收集所有指标列及其类型（各块写出时使用同一列序和类型）"""
+    columns = {}
+    for record in records:
+        for key, value in record['network_metrics'].items():
+            kind = columns.get(key)
+            if value is not None:
+                kind = _merge_kind(kind, _value_kind(value))
+            columns[key] = kind
+    return {key: kind or 'float' for key, kind in columns.items()}
+
+
+_PANDAS_DTYPES = {'bool': 'boolean', 'int': 'Int64', 'float': 'float64', 'str': 'object'}
+
+
+def _chunk_frame(chunk, lookup, metric_columns):
+    """一块记录 -> 与popularity内连接后的DataFrame（列序、类型固定）"""
+    user_ids = [record['user_id'] for record in chunk]
+    positions = lookup.positions(user_ids)
+    keep = np.flatnonzero(positions >= 0)
+    data = {'user_id': [user_ids[i] for i in keep]}
+    for col, kind in metric_columns.items():
+        values = [chunk[i]['network_metrics'].get(col) for i in keep]
+        if kind == 'str':
+            data[col] = pd.Series([None if v is None else str(v) for v in values], dtype=object)
+        else:
+            data[col] = pd.array(values, dtype=_PANDAS_DTYPES[kind])
+    for col in lookup.columns:
+        data[col] = lookup.values[col][positions[keep]]
+    return pd.DataFrame(data)
+
+
+class MergeStats:
+    """流式累计合并结果的统计（度数均值、明星用户数、用户类别分布、影响力>0的用户数和均值）"""
+
+    def __init__(self):
+        self.rows = 0
+        self.sums = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.categories = defaultdict(int)
+        self.columns = []
+
+    def update(self, df):
+        if not self.columns:
+            self.columns = list(df.columns)
+        self.rows += len(df)
+        for col in ('global_out_degree', 'global_in_degree', 'global_total_degree'):
+            if col in df:
+                self.sums[col] += float(df[col].sum())
+        if 'is_celebrity' in df:
+            self.counts['is_celebrity'] += int(df['is_celebrity'].fillna(False).astype(bool).sum())
+        if 'user_category' in df:
+            for category, count in df['user_category'].value_counts().items():
+                self.categories[category] += int(count)
+        for col in ('avg_popularity', 'avg_popularity_of_all'):
+            if col in df:
+                positive = df[col] > 0
+                self.counts[col] += int(positive.sum())
+                self.sums[col] += float(df.loc[positive, col].sum())
+
+    def mean(self, col):
+        return self.sums[col] / self.rows if self.rows else 0.0
+
+    def positive_mean(self, col):
+        return self.sums[col] / self.counts[col] if self.counts[col] else 0.0
+
+
+def _parquet_schema(metric_columns, lookup):
+    import pyarrow as pa
+    types = {'bool': pa.bool_(), 'int': pa.int64(), 'float': pa.float64(), 'str': pa.string()}
+    fields = [pa.field('user_id', pa.string())]
+    fields += [pa.field(col, types[kind]) for col, kind in metric_columns.items()]
+    fields += [pa.field(col, pa.float64()) for col in lookup.columns]
+    return pa.schema(fields)
+
+
+def stream_merge(iter_records, lookup, output_csv=None, output_parquet=None, chunk_size=MERGE_CHUNK_SIZE):
+    """两遍流式合并：第一遍确定列，第二遍按块与popularity内连接并追加写出CSV和/或Parquet（需要pyarrow）
+
+    iter_records为每次调用都返回一个新记录迭代器的函数（如ProgressIndex.iter_records）。
+    返回MergeStats。
+    """
+    metric_columns = scan_columns(iter_records())
+    stats = MergeStats()
+    parquet_writer = None
+    if output_parquet:
+        import pyarrow.parquet as pq
+        parquet_writer = pq.ParquetWriter(output_parquet + '.tmp', _parquet_schema(metric_columns, lookup))
+    for path in (output_csv, output_parquet):
+        if path and os.path.exists(path):
+            os.remove(path)
+    try:
+        chunk = []
+        for record in iter_records():
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                _write_chunk(_chunk_frame(chunk, lookup, metric_columns), stats, output_csv, parquet_writer)
+                chunk = []
+        if chunk or stats.rows == 0:
+            _write_chunk(_chunk_frame(chunk, lookup, metric_columns), stats, output_csv, parquet_writer)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+    if output_parquet:
+        os.replace(output_parquet + '.tmp', output_parquet)
+    return stats
+
+
+def _write_chunk(df, stats, output_csv, parquet_writer):
+    if output_csv:
+        df.to_csv(output_csv, mode='a', header=not os.path.exists(output_csv), index=False)
+    if parquet_writer is not None:
+        import pyarrow as pa
+        parquet_writer.write_table(pa.Table.from_pandas(df, schema=parquet_writer.schema, preserve_index=False))
+    stats.update(df)
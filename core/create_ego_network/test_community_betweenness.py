@@ -0,0 +1,170 @@
+import io
+import random
+import contextlib
+import numpy as np
+import easygraph as eg
+import easygraph.functions as eg_f
+
+from csr_graph import CSRGraph
+from ego_community import (modularity as ego_modularity, louvain_communities, global_partition_labels,
+                           restricted_partition_modularity)
+from ego_betweenness import ego_betweenness, approximate_ego_betweenness
+import create3
+from conftest import build_random_graphs
+
+
+def modularity_loop_reference(G, communities, weight="weight"):
+    """原modularity_fixed的三重循环实现，作为向量化版本的对照"""
+    directed = G.is_directed()
+    m = G.size(weight=weight)
+    if m == 0:
+        return 0
+    if directed:
+        out_degree = dict(G.out_degree(weight=weight))
+        in_degree = dict(G.in_degree(weight=weight))
+        norm = 1 / m
+    else:
+        out_degree = dict(G.degree(weight=weight))
+        in_degree = out_degree
+        norm = 1 / (2 * m)
+
+    def val(u, v):
+        try:
+            w = G[u][v].get(weight, 1)
+        except KeyError:
+            w = 0
+        if u == v and not directed:
+            w *= 2
+        return w - in_degree.get(u, 0) * out_degree.get(v, 0) * norm
+
+    Q = 0
+    for c in communities:
+        for u in c:
+            for v in c:
+                Q += val(u, v)
+    return Q * norm
+
+
+def test_modularity_parity():
+    rng = random.Random(3)
+    for graph_class in (eg.DiGraph, eg.Graph):
+        G = graph_class()
+        for _ in range(300):
+            u, v = rng.randrange(50), rng.randrange(50)
+            G.add_edge(u, v, weight=rng.choice([1, 1, 2, 3.5]))
+        nodes = list(G.nodes)
+        rng.shuffle(nodes)
+        communities = [set(nodes[i:i + 7]) for i in range(0, len(nodes), 7)]
+        assert np.isclose(ego_modularity(G, communities), modularity_loop_reference(G, communities))
+    _, C = build_random_graphs()
+    C_eg = C.to_easygraph()
+    communities = [set(C.nodes[i::4]) for i in range(4)]
+    assert np.isclose(ego_modularity(C, communities), modularity_loop_reference(C_eg, communities))
+
+
+def test_array_louvain():
+    rng = random.Random(5)
+    for graph_class in (eg.DiGraph, eg.Graph):
+        G = graph_class()
+        # 三个稠密块之间少量连边，应能找到明显的社区结构
+        for _ in range(600):
+            block = rng.randrange(3)
+            G.add_edge(block * 30 + rng.randrange(30), block * 30 + rng.randrange(30))
+        for _ in range(20):
+            G.add_edge(rng.randrange(90), rng.randrange(90))
+        communities, Q = louvain_communities(G, seed=1)
+        assert sorted(set().union(*communities)) == sorted(G.nodes)
+        assert np.isclose(Q, modularity_loop_reference(G, communities))
+        assert Q > 0.5
+        again, Q_again = louvain_communities(G, seed=1)
+        assert again == communities and Q_again == Q
+    _, C = build_random_graphs()
+    communities, Q = louvain_communities(C, seed=0)
+    assert np.isclose(Q, ego_modularity(C, communities))
+
+
+def test_global_partition_ego_modularity():
+    """全图划分限制到二跳网络上的模块度与按该划分直接计算一致，细化不降低模块度，并与逐网络Louvain一起记录"""
+    rng = random.Random(11)
+    edges = []
+    for _ in range(1500):
+        block = rng.randrange(4)
+        edges.append((str(block * 40 + rng.randrange(40)), str(block * 40 + rng.randrange(40))))
+    for _ in range(60):
+        edges.append((str(rng.randrange(160)), str(rng.randrange(160))))
+    C = CSRGraph.from_edge_lists([s for s, _ in edges], [t for _, t in edges])
+    labels, Q = global_partition_labels(C, seed=0)
+    assert len(labels) == C.number_of_nodes() and Q > 0.5
+
+    for node in C.nodes[:10]:
+        ego = create3.ego_graph_fixed(C, node, radius=2, undirected=True)
+        communities = {}
+        for member, label in zip(ego.nodes, labels[ego.global_index].tolist()):
+            communities.setdefault(label, set()).add(member)
+        restricted, refined = restricted_partition_modularity(ego, labels, refine_passes=3, seed=1)
+        assert np.isclose(restricted, ego_modularity(ego, list(communities.values())))
+        assert refined >= restricted - 1e-12
+        assert restricted_partition_modularity(ego, labels)[1] is None
+
+    node = C.nodes[0]
+    view = create3.ego_graph_fixed(C, node, radius=2, undirected=True, materialize=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = {}
+        metrics = create3.calculate_network_metrics_selected(view, node, [6], C, set(), {}, timings=timings,
+                                                             global_partition=labels, partition_refine_passes=2)
+        plain = create3.calculate_network_metrics_selected(view, node, [6], C, set(), {})
+    assert metrics['modularity'] == plain['modularity']
+    assert 'modularity_global_partition' not in plain
+    assert metrics['modularity_global_refined'] >= metrics['modularity_global_partition'] - 1e-12
+    assert set(timings) == {'modularity', 'modularity_global_partition'}
+
+    records = [{'user_id': node, 'network_metrics': metrics},
+               {'user_id': 'x', 'network_metrics': {'modularity': None, 'modularity_global_partition': 0.1}}]
+    tracking = create3.modularity_tracking(records)
+    assert tracking['modularity_global_partition']['users'] == 1
+    assert np.isclose(tracking['modularity_global_refined']['mean_abs_error'],
+                      abs(metrics['modularity_global_refined'] - metrics['modularity']))
+
+
+def test_ego_betweenness_parity():
+    """只算中心节点的介数与eg_f.betweenness_centrality的结果一致（含半径1闭式解）"""
+    for radius, (n_nodes, n_edges) in [(1, (60, 240)), (2, (60, 240)), (2, (200, 500))]:
+        G, C = build_random_graphs(n_nodes, n_edges, seed=radius)
+        for node in list(G.nodes)[:10]:
+            ego_csr = create3.ego_graph_fixed(C, node, radius=radius, undirected=True)
+            ego_eg = ego_csr.to_easygraph()
+            expected = dict(zip(ego_eg.nodes, eg_f.betweenness_centrality(ego_eg)))[node]
+            for method in ("auto", "exact"):
+                assert np.isclose(ego_betweenness(ego_csr, node, method=method), expected, atol=1e-12)
+            value, _, _ = create3.calculate_betweenness_centrality(ego_csr, node, mode='ego')
+            full, _, _ = create3.calculate_betweenness_centrality(ego_eg, node, mode='full')
+            assert np.isclose(value, full, atol=1e-12)
+    U = eg.Graph()
+    rng = random.Random(11)
+    for _ in range(150):
+        U.add_edge(rng.randrange(40), rng.randrange(40))
+    expected = dict(zip(U.nodes, eg_f.betweenness_centrality(U)))
+    for node in list(U.nodes)[:10]:
+        assert np.isclose(ego_betweenness(U, node), expected[node], atol=1e-12)
+
+
+def test_approximate_betweenness():
+    """抽样近似：样本覆盖全部源点时等于精确值；抽样时置信区间包含精确值且可复现"""
+    _, C = build_random_graphs(400, 1200, seed=9)
+    hits = tested = 0
+    for node in C.nodes[:20]:
+        ego = create3.ego_graph_fixed(C, node, radius=2, undirected=True)
+        exact = ego_betweenness(ego, node)
+        full = approximate_ego_betweenness(ego, node, samples=10 ** 6)
+        assert full.exact and np.isclose(full.value, exact)
+        if full.population < 10:
+            continue
+        est = approximate_ego_betweenness(ego, node, samples=full.population // 2, seed=0)
+        tested += 1
+        assert not est.exact and est.samples == full.population // 2
+        assert est.ci_low <= est.value <= est.ci_high
+        hits += est.ci_low - 1e-12 <= exact <= est.ci_high + 1e-12
+        assert est == approximate_ego_betweenness(ego, node, samples=full.population // 2, seed=0)
+    assert tested >= 10 and hits >= 0.8 * tested
+    value, _, details = create3.calculate_betweenness_centrality(ego, node, mode='approx', samples=5)
+    assert details['betweenness_mode'] == 'approx' and details['betweenness_samples'] == 5
@@ -0,0 +1,503 @@
+import io
+import os
+import json
+import time
+import builtins
+import random
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+
+from csr_graph import CSRGraph
+import spectral
+from spectral import sparse_spectral_radius
+import ego_betweenness as ego_betweenness_module
+from ego_betweenness import ego_betweenness, approximate_ego_betweenness
+from metric_budget import (BudgetExceeded, Deadline, run_with_budget, estimate_memory_bytes, PRIMARY_BUDGET_SHARE,
+                          BETWEENNESS_FALLBACK_SAMPLES)
+from timing_report import load_timings, build_timing_report
+from ego_store import EgoMembershipWriter, EgoMembershipStore, migrate_legacy_jsonl, MEMBERS_FILE
+from progress_index import ProgressIndex
+from streaming_merge import PopularityLookup, stream_merge
+from parallel_runner import (run_parallel, estimate_ego_costs, lpt_order, cost_balanced_chunks,
+                             fit_runtime_model, predict_makespan)
+import create3
+import batch_topics
+from clean_network_data import NetworkDataCleaner
+from conftest import build_random_graphs
+
+
+def test_memmap_graph_and_parallel_runner():
+    """内存映射加载的图与原图一致；并行计算结果与顺序计算一致"""
+    _, C = build_random_graphs()
+    with tempfile.TemporaryDirectory() as graph_dir:
+        C.save_arrays(graph_dir)
+        M = CSRGraph.load_arrays(graph_dir)
+        assert M.nodes == C.nodes
+        assert M.indices_of(C.nodes + ['missing', '1234567890123']).tolist() == list(range(len(C))) + [-1, -1]
+        for node in C.nodes[:10]:
+            assert set(M.subgraph(M.bidirectional_bfs(M.index_of(node), 2)[0]).nodes) == \
+                   set(create3.ego_graph_fixed(C, node, radius=2, undirected=True).nodes)
+
+    args = {'selected_metrics': [1, 2, 3, 4, 5, 6], 'celebrity_users': set(C.nodes[:3]), 'user_categories': {}}
+    users = C.nodes[:12]
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = {u: create3.process_user(C, u, **args) for u in users}
+    results = {}
+    run_parallel(C, users, args, lambda u, result, error: results.setdefault(u, (result, error)),
+                 workers=2, chunk_size=3)
+    assert set(results) == set(users)
+    for user in users:
+        result, error = results[user]
+        assert error is None
+        assert result[:2] == expected[user][:2]
+    results.clear()
+    run_parallel(C, users, args, lambda u, result, error: results.setdefault(u, (result, error)),
+                 workers=2, chunk_size=3, costs=estimate_ego_costs(C, users))
+    assert {u: r[:2] for u, (r, _) in results.items()} == {u: r[:2] for u, r in expected.items()}
+
+
+def test_cost_scheduling():
+    """代价估计与真实二跳规模正相关；LPT切批时大用户单独成批；LPT工期预测正确"""
+    _, C = build_random_graphs(300, 900, seed=4)
+    users = C.nodes
+    costs = estimate_ego_costs(C, users + ['missing'])
+    assert costs[-1] == 0
+    sizes = [create3.ego_graph_fixed(C, u, radius=2, undirected=True).number_of_nodes() for u in users]
+    assert np.corrcoef(costs[:-1], sizes)[0, 1] > 0.8
+
+    ordered, ordered_costs = lpt_order(users, costs[:-1])
+    assert list(ordered_costs) == sorted(costs[:-1], reverse=True)
+    chunks = cost_balanced_chunks(ordered, ordered_costs, chunk_size=8)
+    assert sum(chunks, []) == ordered and all(len(c) <= 8 for c in chunks)
+    assert len(chunks[0]) < max(len(c) for c in chunks)
+
+    assert predict_makespan([5, 4, 3, 3, 3], 2) == 10
+    a, b = fit_runtime_model([10, 100, 1000], [0.011, 0.101, 1.001])
+    assert abs(b - 1.0) < 0.05
+
+
+def test_batch_topics_runner():
+    """两个话题共用一次运行：各自输出指标和合并表，并生成带topic列的跨话题总表"""
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as root:
+        topics_root, output_root = os.path.join(root, 'topics'), os.path.join(root, 'results')
+        sizes = {'topic_a': (40, 160), 'topic_b': (20, 60)}
+        for name, (n_nodes, n_edges) in sizes.items():
+            os.makedirs(os.path.join(topics_root, name))
+            edges = [(rng.randrange(1, n_nodes), rng.randrange(1, n_nodes)) for _ in range(n_edges)]
+            pd.DataFrame(edges, columns=['source', 'target']).to_csv(os.path.join(topics_root, name, 'edges.csv'), index=False)
+            pd.DataFrame({'user_id': range(1, 11), 'avg_popularity': [rng.random() for _ in range(10)]}).to_csv(
+                os.path.join(topics_root, name, 'popularity.csv'), index=False)
+        os.makedirs(os.path.join(topics_root, 'topic_empty'))
+
+        argv = ['--topics-root', topics_root, '--output-root', output_root, '--metrics', '1', '2', '3', '--resume', 'restart']
+        with contextlib.redirect_stdout(io.StringIO()):
+            exit_code = batch_topics.main(argv)
+        assert exit_code == create3.EXIT_OK
+
+        summary = json.load(open(os.path.join(output_root, 'batch_summary.json'), encoding='utf-8'))
+        assert sorted(summary['topics']) == ['topic_a', 'topic_b']
+        combined = pd.read_csv(os.path.join(output_root, batch_topics.COMBINED_TABLE), dtype={'user_id': str})
+        for name in sizes:
+            merged = pd.read_csv(os.path.join(output_root, f'{name}_metrics', 'merged_metrics_popularity.csv'),
+                                 dtype={'user_id': str})
+            part = combined[combined['topic'] == name]
+            assert len(part) == len(merged) == summary['topics'][name]['users_processed'] > 0
+            assert sorted(part['user_id']) == sorted(merged['user_id'])
+
+
+def test_metric_budgets_fall_back_or_mark_missing():
+    """超出预算时降级或记为缺失（None + 原因代码），绝不记为0.0；幂迭代降级结果与ARPACK一致"""
+    def timed_out(deadline):
+        raise BudgetExceeded('timeout')
+    result = run_with_budget(('slow', timed_out), ('fast', lambda deadline: 1.5), n=10, m=20)
+    assert result == (1.5, 'fast', 'timeout', None)
+    # 主方法与降级方法共用一个指标预算：主方法只能用其中一部分，降级方法用剩余时间，合计不超过预算
+    def spin(deadline):
+        while True:
+            deadline.check()
+    start = time.monotonic()
+    result = run_with_budget(('slow', spin), ('rest', lambda deadline: deadline.remaining()), n=10, m=20, seconds=0.2)
+    elapsed = time.monotonic() - start
+    assert result.method == 'rest' and result.fallback_reason == 'timeout'
+    assert 0.2 * (1 - PRIMARY_BUDGET_SHARE) - 0.05 < result.value <= 0.2 * (1 - PRIMARY_BUDGET_SHARE) + 0.01
+    assert elapsed < 0.2 + 0.05
+    result = run_with_budget(('slow', spin), ('slow_too', spin), n=10, m=20, seconds=0.1)
+    assert result.value is None and result.missing_reason == 'timeout' and time.monotonic() - start < 0.2 + 0.1 + 0.1
+    result = run_with_budget(('louvain', lambda deadline: 1.0), None, n=10 ** 6, m=10 ** 7, memory_mb=1)
+    assert result.value is None and result.missing_reason == 'memory'
+
+    _, C = build_random_graphs(300, 1500, seed=3)
+    ego = create3.ego_graph_fixed(C, C.nodes[0], radius=2, undirected=True)
+    A = ego.adjacency_matrix()
+    exact = sparse_spectral_radius(A, dense_threshold=0)
+    assert abs(sparse_spectral_radius(A, tol=1e-6, method='power', dense_threshold=0) - exact) <= 1e-5 * exact
+    # ARPACK的重启次数受剩余预算限制；预算不够时不调用ARPACK，直接走可中断的幂迭代
+    assert spectral.arpack_maxiter(A) == max(1000, 10 * A.shape[0])
+    assert spectral.arpack_maxiter(A, Deadline(0)) == 0
+    assert np.isclose(sparse_spectral_radius(A, dense_threshold=0, deadline=Deadline(60)), exact)
+    original_eigs = spectral.eigs
+    def no_arpack(*args, **kwargs):
+        raise AssertionError("预算不足时不应调用ARPACK")
+    spectral.eigs = no_arpack
+    try:
+        sparse_spectral_radius(A, dense_threshold=0, deadline=Deadline(1e-4))
+        assert False, "应当超时"
+    except BudgetExceeded as e:
+        assert e.reason == 'timeout'
+    finally:
+        spectral.eigs = original_eigs
+    # 中心点的正向/反向BFS也检查截止时间：预算已用完时精确和抽样介数都在第一次BFS就中断
+    original_bfs = ego_betweenness_module.bfs_path_counts
+    bfs_deadlines = []
+    def recorded_bfs(A_T, sources, n, deadline=None):
+        bfs_deadlines.append(deadline)
+        return original_bfs(A_T, sources, n, deadline)
+    ego_betweenness_module.bfs_path_counts = recorded_bfs
+    try:
+        for compute in (lambda deadline: ego_betweenness(ego, C.nodes[0], method='exact', deadline=deadline),
+                        lambda deadline: approximate_ego_betweenness(ego, C.nodes[0], samples=8, deadline=deadline)):
+            deadline = Deadline(0)
+            bfs_deadlines.clear()
+            try:
+                compute(deadline)
+                assert False, "应当超时"
+            except BudgetExceeded as e:
+                assert e.reason == 'timeout'
+            assert bfs_deadlines == [deadline]
+    finally:
+        ego_betweenness_module.bfs_path_counts = original_bfs
+
+    names = ['betweenness_centrality', 'spectral_radius', 'modularity']
+    with contextlib.redirect_stdout(io.StringIO()):
+        expired = create3.calculate_network_metrics_selected(ego, C.nodes[0], [1, 4, 5, 6], C, set(), {},
+                                                             time_budgets={name: -1 for name in names})
+        no_memory = create3.calculate_network_metrics_selected(ego, C.nodes[0], [4, 5, 6], C, set(), {},
+                                                               memory_budgets={name: 0 for name in names})
+    assert expired['density'] is not None
+    for name in names:
+        assert no_memory[name] is None and no_memory[name] != 0.0
+        assert no_memory[f'{name}_missing_reason'] == 'memory' and f'{name}_method' not in no_memory
+    assert run_with_budget(('louvain', lambda deadline: 0.0), ('single_level_louvain', lambda deadline: 0.0),
+                           n=10 ** 6, m=10 ** 7, memory_mb=1) == (None, None, None, 'memory')
+
+    # 内存预算只够抽样介数：降级为approximate_ego_betweenness，记录降级方式和抽样信息
+    n, m = ego.number_of_nodes(), ego.number_of_edges()
+    ego_bytes = estimate_memory_bytes('ego_betweenness', n, m)
+    sampled_bytes = estimate_memory_bytes('sampled_betweenness', n, m)
+    assert sampled_bytes < ego_bytes
+    calls = []
+    def counted(*args, **kwargs):
+        calls.append(kwargs.get('samples'))
+        return approximate_ego_betweenness(*args, **kwargs)
+    create3.approximate_ego_betweenness = counted
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            degraded = create3.calculate_network_metrics_selected(
+                ego, C.nodes[0], [4], C, set(), {},
+                memory_budgets={'betweenness_centrality': (ego_bytes + sampled_bytes) / 2 / 1024 / 1024})
+    finally:
+        create3.approximate_ego_betweenness = approximate_ego_betweenness
+    assert calls == [BETWEENNESS_FALLBACK_SAMPLES]
+    assert degraded['betweenness_centrality_method'] == 'sampled_betweenness'
+    assert degraded['betweenness_centrality_fallback_reason'] == 'memory'
+    assert degraded['betweenness_centrality'] is not None and 'betweenness_centrality_missing_reason' not in degraded
+    assert degraded['betweenness_samples'] == BETWEENNESS_FALLBACK_SAMPLES < degraded['betweenness_sources']
+    assert degraded['betweenness_ci_low'] <= degraded['betweenness_centrality'] <= degraded['betweenness_ci_high']
+    for name in ['spectral_radius', 'modularity']:
+        assert expired[name] is None and expired[f'{name}_missing_reason'] == 'timeout'
+
+
+def test_memory_budget_checks_measured_peak():
+    """内存预算按估计准入后，还按实测峰值内存增长标记超出预算的指标并计入写入方统计"""
+    _, C = build_random_graphs(120, 500, seed=5)
+    ego = create3.ego_graph_fixed(C, C.nodes[0], radius=2, undirected=True)
+    readings = iter(range(0, 10000, 100))
+    original_peak_rss_mb = create3.peak_rss_mb
+    create3.peak_rss_mb = lambda: next(readings)   # 每次读取峰值增长100MB
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics = create3.calculate_network_metrics_selected(
+                ego, C.nodes[0], [5, 6], C, set(), {},
+                memory_budgets={'spectral_radius': 50, 'modularity': 1000})
+    finally:
+        create3.peak_rss_mb = original_peak_rss_mb
+    assert metrics['spectral_radius'] is not None and metrics['spectral_radius_memory_exceeded_mb'] == 100
+    assert metrics['modularity'] is not None and 'modularity_memory_exceeded_mb' not in metrics
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = create3.ResultWriter(os.path.join(tmp, 'm.jsonl'), os.path.join(tmp, 'e.jsonl'))
+        writer.add(C.nodes[0], metrics, {})
+        assert writer.memory_exceeded == {'spectral_radius': 1}
+
+    # 全图介数无法按deadline中断：为它设置耗时预算是配置错误
+    try:
+        create3.load_run_config(['--metrics', '4', '--betweenness-mode', 'full',
+                                 '--budget', 'betweenness_centrality=60'])
+        assert False, "应当拒绝"
+    except create3.ConfigError as e:
+        assert 'full' in str(e)
+    config, _ = create3.load_run_config(['--metrics', '4', '--betweenness-mode', 'full',
+                                         '--memory-budget', 'betweenness_centrality=60'])
+    assert config['metric_memory_budgets'] == {'betweenness_centrality': 60.0}
+
+
+def test_interrupt_exits_130_with_summary():
+    """交互和非交互模式下Ctrl+C都走同一中断分支：返回130并写出run_summary.json"""
+    original_run_topic, original_load_run_config = create3.run_topic, create3.load_run_config
+    def interrupted(config, summary):
+        raise KeyboardInterrupt
+    create3.run_topic = interrupted
+    try:
+        for interactive in (False, True):
+            with tempfile.TemporaryDirectory() as out:
+                config = dict(create3.DEFAULT_CONFIG, output_dir=out, metrics=[1], interactive=interactive)
+                create3.load_run_config = lambda argv=None: (config, None)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    assert create3.main() == create3.EXIT_INTERRUPTED
+                with open(os.path.join(out, 'run_summary.json'), 'r', encoding='utf-8') as f:
+                    summary = json.load(f)
+                assert summary['status'] == 'interrupted' and summary['exit_code'] == create3.EXIT_INTERRUPTED
+    finally:
+        create3.run_topic, create3.load_run_config = original_run_topic, original_load_run_config
+
+
+def test_interrupt_at_metric_prompt_exits_130():
+    """在交互式指标选择提示处按Ctrl+C也走中断分支（130），而不是当作未选择指标的配置错误"""
+    original_input, original_load_run_config = builtins.input, create3.load_run_config
+    def interrupt(prompt=''):
+        raise KeyboardInterrupt
+    with tempfile.TemporaryDirectory() as out:
+        config = dict(create3.DEFAULT_CONFIG, output_dir=out, metrics=None, interactive=True)
+        create3.load_run_config = lambda argv=None: (config, None)
+        builtins.input = interrupt
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                assert create3.main() == create3.EXIT_INTERRUPTED
+        finally:
+            builtins.input, create3.load_run_config = original_input, original_load_run_config
+        with open(os.path.join(out, 'run_summary.json'), 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        assert summary['status'] == 'interrupted' and summary['exit_code'] == create3.EXIT_INTERRUPTED
+
+
+def test_timings_jsonl_and_report():
+    """ResultWriter把每个用户的耗时、规模和峰值内存写入timings.jsonl，报告按阶段和规模分组给出分位数"""
+    _, C = build_random_graphs(120, 500, seed=21)
+    user_args = {'selected_metrics': [1, 5], 'celebrity_users': set(), 'user_categories': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        timings_path = os.path.join(tmp, 'timings.jsonl')
+        writer = create3.ResultWriter(os.path.join(tmp, 'm.jsonl'), os.path.join(tmp, 'e.jsonl'),
+                                      flush_every=4, timings_output=timings_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for user_id in C.nodes[:10]:
+                result = create3.process_user(C, user_id, **user_args)
+                if result is not None:
+                    writer.add(user_id, *result)
+        writer.flush()
+        df = load_timings(timings_path)
+    assert df['user_id'].nunique() == writer.processed > 0
+    assert set(df['stage']) == {'ego_build', 'density', 'spectral_radius', 'total'}
+    assert (df['node_count'] > 1).all()
+
+    by_stage, by_size, slowest = build_timing_report(df, top=3)
+    assert (by_stage['p50_seconds'] <= by_stage['p95_seconds']).all()
+    assert (by_stage['p95_seconds'] <= by_stage['p99_seconds']).all()
+    assert by_size.groupby(level='stage')['users'].sum().eq(writer.processed).all()
+    assert abs(by_stage['share'].sum() - 1.0) < 1e-9 and len(slowest) == 3
+
+
+def test_ego_membership_store():
+    """成员存储按用户随机读取；图的节点顺序变化、中断写入和旧版JSONL迁移后仍能读到正确的成员"""
+    _, C = build_random_graphs(120, 500, seed=23)
+    users = C.nodes[:12]
+    expected = {u: sorted(create3.ego_graph_fixed(C, u, radius=2, undirected=True).nodes) for u in users}
+    with tempfile.TemporaryDirectory() as tmp:
+        store_dir = os.path.join(tmp, 'ego_members')
+        writer = create3.ResultWriter(os.path.join(tmp, 'm.jsonl'), os.path.join(tmp, 'e.jsonl'),
+                                      members_store=EgoMembershipWriter(store_dir, C))
+        with contextlib.redirect_stdout(io.StringIO()):
+            for u in users[:6]:
+                writer.add(u, *create3.process_user(C, u, [1], set(), {}))
+        writer.flush()
+        assert all('nodes' not in json.loads(line)['ego_network_info'] for line in open(os.path.join(tmp, 'e.jsonl')))
+
+        # 节点顺序不同的同一张图：记录经映射写入同一存储
+        src, dst = C.edge_arrays()
+        reordered = CSRGraph.from_edge_lists(C.node_ids[src][::-1].tolist(), C.node_ids[dst][::-1].tolist())
+        assert reordered.nodes != C.nodes
+        EgoMembershipWriter(store_dir, reordered).write_many(
+            [(u, reordered.indices_of(expected[u])) for u in users[6:]])
+
+        with open(os.path.join(store_dir, MEMBERS_FILE), 'ab') as f:
+            f.write(b'partial')
+        store = EgoMembershipStore(store_dir)
+        assert len(store) == len(users) and sorted(store.users()) == sorted(users)
+        for u in users:
+            assert sorted(store.members(u)) == expected[u]
+        assert store.members('missing') is None and 'missing' not in store
+
+        legacy_path = os.path.join(tmp, 'legacy.jsonl')
+        with open(legacy_path, 'w', encoding='utf-8') as f:
+            for u in users[:3]:
+                f.write(json.dumps({'user_id': u, 'ego_network_info': {'nodes': expected[u], 'node_count': 1}}) + "\n")
+        legacy_dir = os.path.join(tmp, 'legacy_members')
+        assert migrate_legacy_jsonl(legacy_path, legacy_dir, C) == 3
+        assert all('nodes' not in json.loads(line)['ego_network_info'] for line in open(legacy_path))
+        assert sorted(EgoMembershipStore(legacy_dir).members(users[1])) == expected[users[1]]
+
+
+def test_progress_index_resume():
+    """完成索引：续传只读索引；补建旧文件的索引、截掉中断写入的半行，重复用户以最后一条为准"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'network_metrics.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            for i in range(3):
+                f.write(json.dumps({'user_id': str(i), 'network_metrics': {'density': i}}) + "\n")
+        index = ProgressIndex(path)
+        assert index.completed_users() == {'0', '1', '2'} and os.path.exists(path + '.idx')
+
+        index.append({'1': {'user_id': '1', 'network_metrics': {'density': 10}},
+                      '3': {'user_id': '3', 'network_metrics': {'density': 3}}})
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'user_id': '4', 'network_metrics': {'density': 4}}) + "\n")
+            f.write('{"user_id": "5", "network_me')
+
+        resumed = ProgressIndex(path)
+        assert resumed.completed_users() == {'0', '1', '2', '3', '4'}
+        assert resumed.read('1')['network_metrics']['density'] == 10 and resumed.read('5') is None
+        records = {r['user_id']: r['network_metrics']['density'] for r in resumed.iter_records()}
+        assert records == {'0': 0, '1': 10, '2': 2, '3': 3, '4': 4}
+        assert open(path, encoding='utf-8').read().endswith("\n")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            merged_path, rows = create3.merge_with_popularity(
+                resumed.iter_records, create3.pd.DataFrame({'user_id': ['1', '4', '9'], 'avg_popularity': [1.0, 2.0, 3.0]}),
+                False, tmp)
+        assert rows == 2 and sorted(create3.pd.read_csv(merged_path)['density']) == [4, 10]
+
+
+def test_streaming_merge_matches_dataframe_merge():
+    """分块流式合并与一次性DataFrame合并（pd.merge内连接）结果一致，各块的列可以不同"""
+    rng = random.Random(8)
+    records = []
+    for i in range(40):
+        metrics = {'node_count': rng.randrange(2, 50), 'density': rng.random(), 'is_celebrity': i % 7 == 0,
+                   'user_category': rng.choice('ABC')}
+        if i % 5 == 0:
+            metrics['modularity'] = None
+            metrics['modularity_missing_reason'] = 'timeout'
+        else:
+            metrics['modularity'] = rng.random()
+        records.append({'user_id': str(i), 'network_metrics': metrics})
+    popularity = pd.DataFrame({'user_id': [str(i) for i in range(0, 60, 2)],
+                               'avg_popularity': [rng.random() for _ in range(30)],
+                               'avg_popularity_of_all': [rng.random() for _ in range(30)]})
+    _, C = build_random_graphs(60, 200, seed=8)
+    expected = pd.merge(pd.DataFrame([{'user_id': r['user_id'], **r['network_metrics']} for r in records]),
+                        popularity, on='user_id', how='inner')
+    with tempfile.TemporaryDirectory() as tmp:
+        for G in (None, C):
+            path = os.path.join(tmp, 'merged.csv')
+            lookup = PopularityLookup(popularity, ['avg_popularity', 'avg_popularity_of_all'], G)
+            stats = stream_merge(lambda: iter(records), lookup, output_csv=path, chunk_size=7)
+            merged = pd.read_csv(path, dtype={'user_id': str})
+            graph_users = set(C.nodes) if G is not None else set(expected['user_id'])
+            want = expected[expected['user_id'].isin(graph_users)].reset_index(drop=True)
+            assert stats.rows == len(merged) == len(want) > 0
+            assert list(merged.columns) == list(want.columns)
+            pd.testing.assert_frame_equal(merged, pd.read_csv(io.StringIO(want.to_csv(index=False)), dtype={'user_id': str}))
+            assert stats.counts['is_celebrity'] == int(want['is_celebrity'].sum())
+
+
+def stored_metrics(output_dir):
+    """完成索引中每个用户的最新指标记录（删除标记之后的用户不在其中）"""
+    index = ProgressIndex(os.path.join(output_dir, 'network_metrics.jsonl'))
+    return {record['user_id']: record['network_metrics'] for record in index.iter_records()}
+
+
+def test_incremental_recompute_after_edge_delta():
+    """边增量后只重算二跳网络受影响的用户，结果与全部重算一致；网络缩到1个节点的用户不保留旧记录"""
+    rng = random.Random(21)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'topic')
+        os.makedirs(base)
+        edges = list({(rng.randrange(1, 300), rng.randrange(1, 300)) for _ in range(330)})
+        # 用户500只有一条出边和一个自环：删掉出边后二跳网络只剩自己
+        edges += [(500, 500), (500, 7)]
+        pd.DataFrame(edges, columns=['source', 'target']).to_csv(os.path.join(base, 'edges.csv'), index=False)
+        pd.DataFrame({'user_id': list(range(1, 301)) + [500], 'avg_popularity': [rng.random() for _ in range(301)]}).to_csv(
+            os.path.join(base, 'popularity.csv'), index=False)
+        common = ['--base-dir', base, '--metrics', '1', '2', '3', '--calibration-users', '0']
+        incremental_dir, full_dir = os.path.join(tmp, 'incremental'), os.path.join(tmp, 'full')
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert create3.main(common + ['--output-dir', incremental_dir, '--resume', 'restart']) == create3.EXIT_OK
+        assert '500' in stored_metrics(incremental_dir)
+
+        added = [(7, 301), (12, 45), (301, 88)]
+        removed = edges[:2] + [(500, 7)]
+        kept = [edge for edge in edges if edge not in removed]
+        pd.DataFrame(kept + added, columns=['source', 'target']).to_csv(os.path.join(base, 'edges.csv'), index=False)
+        delta_path = os.path.join(tmp, 'delta.csv')
+        pd.DataFrame([(s, t, 'add') for s, t in added] + [(s, t, 'remove') for s, t in removed],
+                     columns=['source', 'target', 'change']).to_csv(delta_path, index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert create3.main(common + ['--output-dir', incremental_dir, '--resume', 'resume',
+                                          '--edge-delta', delta_path]) == create3.EXIT_OK
+            assert create3.main(common + ['--output-dir', full_dir, '--resume', 'restart']) == create3.EXIT_OK
+
+        stats = json.load(open(os.path.join(incremental_dir, 'run_summary.json'), encoding='utf-8'))['incremental']
+        assert stats['edges_added'] == 3 and stats['edges_removed'] == 3
+        assert stats['recomputed_users'] > 0 and stats['reused_records'] > stats['recomputed_users']
+        read = lambda d: pd.read_csv(os.path.join(d, 'merged_metrics_popularity.csv'), dtype={'user_id': str}) \
+            .sort_values('user_id').reset_index(drop=True)
+        pd.testing.assert_frame_equal(read(incremental_dir), read(full_dir))
+        incremental_records = stored_metrics(incremental_dir)
+        assert '500' not in incremental_records
+        assert incremental_records == stored_metrics(full_dir)
+
+
+def test_cleaner_affected_users_recompute():
+    """清洗工具删除垃圾节点后写出受影响用户列表，按列表增量重算的结果与全部重算一致"""
+    rng = random.Random(22)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'topic')
+        os.makedirs(base)
+        hub = 999
+        edges = {(rng.randrange(1, 300), rng.randrange(1, 300)) for _ in range(300)}
+        edges |= {(hub, rng.randrange(1, 300)) for _ in range(6)}
+        # 用户997只通过hub与网络相连（另有一个自环）：删除hub后其二跳网络只剩自己
+        edges |= {(997, hub), (997, 997)}
+        pd.DataFrame(sorted(edges), columns=['source', 'target']).to_csv(os.path.join(base, 'edges.csv'), index=False)
+        pd.DataFrame({'user_id': list(range(1, 301)) + [hub, 997],
+                      'avg_popularity': [rng.random() for _ in range(302)]}).to_csv(
+            os.path.join(base, 'popularity.csv'), index=False)
+        common = ['--base-dir', base, '--metrics', '1', '2', '3', '--calibration-users', '0']
+        incremental_dir, full_dir = os.path.join(tmp, 'incremental'), os.path.join(tmp, 'full')
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert create3.main(common + ['--output-dir', incremental_dir, '--resume', 'restart']) == create3.EXIT_OK
+        before = stored_metrics(incremental_dir)
+        assert str(hub) in before and '997' in before
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert NetworkDataCleaner(base).clean_network(str(hub), confirm=False)
+            affected_file = os.path.join(base, f'affected_users_{hub}.csv')
+
+            assert create3.main(common + ['--output-dir', incremental_dir, '--resume', 'resume',
+                                          '--recompute-users', affected_file]) == create3.EXIT_OK
+            assert create3.main(common + ['--output-dir', full_dir, '--resume', 'restart']) == create3.EXIT_OK
+
+        affected = pd.read_csv(affected_file, dtype={'user_id': str})
+        assert str(hub) not in set(affected['user_id']) and set(affected['distance']) <= {1, 2}
+        stats = json.load(open(os.path.join(incremental_dir, 'run_summary.json'), encoding='utf-8'))['incremental']
+        assert stats['listed_users'] == len(affected) and 0 < stats['recomputed_users'] < stats['reused_records']
+        summary = json.load(open(os.path.join(incremental_dir, 'run_summary.json'), encoding='utf-8'))
+        assert stats['removed_records'] >= 1 and summary['records_removed'] >= 1
+        read = lambda d: pd.read_csv(os.path.join(d, 'merged_metrics_popularity.csv'), dtype={'user_id': str}) \
+            .sort_values('user_id').reset_index(drop=True)
+        pd.testing.assert_frame_equal(read(incremental_dir), read(full_dir))
+        # 被删除的hub和网络缩到1个节点的997都不再保留清洗前的旧指标
+        after = stored_metrics(incremental_dir)
+        assert str(hub) not in after and '997' not in after and '997' in set(affected['user_id'])
+        assert after == stored_metrics(full_dir)
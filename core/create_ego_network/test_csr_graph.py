@@ -0,0 +1,102 @@
+import io
+import contextlib
+import numpy as np
+import easygraph as eg
+import easygraph.functions as eg_f
+
+from csr_graph import EgoView
+from network_loader import normalize_id, normalize_ids, intern_edges
+from batch_metrics import batch_clustering, batch_average_neighbor_degree
+import create3
+from conftest import build_random_graphs
+
+
+def test_normalize_ids_matches_scalar():
+    values = ['123', '123.0', ' 0042 ', '-2147483648', '1.5e9', 'abc', 'nan', '12.5', '-5', '000', 12.0]
+    assert normalize_ids(values).tolist() == [normalize_id(v) for v in values]
+    table = intern_edges(['1', '2', '1'], ['2', '3', '2'])
+    assert table.node_ids.tolist() == ['1', '2', '3']
+    assert table.source.tolist() == [0, 1] and table.target.tolist() == [1, 2]
+
+
+def test_csr_graph_structure():
+    G, C = build_random_graphs()
+    assert C.number_of_nodes() == G.number_of_nodes()
+    assert C.number_of_edges() == G.number_of_edges()
+    assert C.nodes == list(G.nodes)
+    for node in G.nodes:
+        i = C.index_of(node)
+        assert set(C.node_ids[C.successors(i)]) == set(G.successors(node))
+        assert set(C.node_ids[C.predecessors(i)]) == set(G.predecessors(node))
+        assert create3.calculate_global_degrees(C, node) == create3.calculate_global_degrees(G, node)
+
+
+def test_csr_ego_metrics_parity():
+    G, C = build_random_graphs()
+    for node in list(G.nodes)[:15]:
+        assert create3.bidirectional_bfs(C, node, 2) == create3.bidirectional_bfs(G, node, 2)
+        ego_eg = create3.ego_graph_fixed(G, node, radius=2, undirected=True)
+        ego_csr = create3.ego_graph_fixed(C, node, radius=2, undirected=True)
+        assert set(ego_csr.nodes) == set(ego_eg.nodes)
+        assert ego_csr.number_of_edges() == ego_eg.number_of_edges()
+        assert abs(create3.calculate_density(ego_csr) - eg.density(ego_eg)) < 1e-12
+        assert abs(create3.calculate_average_neighbor_degree(ego_csr, node)
+                   - create3.calculate_average_neighbor_degree(ego_eg, node)) < 1e-12
+        assert abs(eg_f.clustering(ego_csr.to_easygraph(), node) - eg_f.clustering(ego_eg, node)) < 1e-12
+        assert np.isclose(create3.calculate_spectral_radius(ego_csr), create3.calculate_spectral_radius(ego_eg))
+
+
+def test_center_neighbor_counts():
+    G, C = build_random_graphs()
+    for node in list(G.nodes)[:15]:
+        ego_eg, in_eg, out_eg = create3.create_ego_network_fixed(G, node, radius=2)
+        ego_csr, in_csr, out_csr = create3.create_ego_network_fixed(C, node, radius=2)
+        assert (in_csr, out_csr) == (in_eg, out_eg)
+        assert in_csr == len(set(G.predecessors(node))) and out_csr == len(set(G.successors(node)))
+
+
+def test_ego_view_counts_without_subgraph():
+    """EgoView的节点数/边数/密度与抽取子图一致；只选计数类指标时不抽取子图"""
+    _, C = build_random_graphs(120, 500, seed=14)
+    for node in C.nodes[:20]:
+        ego = create3.ego_graph_fixed(C, node, radius=2, undirected=True)
+        view = create3.ego_graph_fixed(C, node, radius=2, undirected=True, materialize=False)
+        assert isinstance(view, EgoView) and view.nodes == ego.nodes
+        assert view.number_of_edges() == ego.number_of_edges()
+        assert create3.calculate_density(view) == create3.calculate_density(ego)
+        assert create3.count_center_neighbors(C, node, view) == create3.count_center_neighbors(C, node, ego)
+        assert node in view and 'missing' not in view
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics = create3.calculate_network_metrics_selected(view, node, [1], C, set(), {})
+        assert view._subgraph is None and metrics['edge_count'] == ego.number_of_edges()
+        with contextlib.redirect_stdout(io.StringIO()):
+            full = create3.calculate_network_metrics_selected(view, node, [1, 3, 5], C, set(), {})
+            expected = create3.calculate_network_metrics_selected(ego, node, [1, 3, 5], C, set(), {})
+        assert view._subgraph is not None and full == expected
+    assert not C._member_mask.any()
+
+
+def test_batch_clustering_parity():
+    """全图批量聚类系数与逐个二跳网络上的eg_f.clustering一致（含自环、双向边）"""
+    _, C = build_random_graphs(150, 900, seed=12)
+    values = batch_clustering(C, C.nodes + ['missing'], batch_cost=500)
+    assert 'missing' not in values and len(values) == len(C)
+    for node in C.nodes:
+        ego = create3.ego_graph_fixed(C, node, radius=2, undirected=True)
+        assert abs(values[node] - eg_f.clustering(ego.to_easygraph(), node)) < 1e-12
+
+
+def test_batch_average_neighbor_degree_parity():
+    """批量邻居平均度与逐个二跳网络上的计算一致；全图度数版本与逐个计算一致"""
+    G, C = build_random_graphs(150, 600, seed=13)
+    values = batch_average_neighbor_degree(C, C.nodes + ['missing'])
+    for node in C.nodes:
+        ego = create3.ego_graph_fixed(G, node, radius=2, undirected=True)
+        assert np.isclose(values['average_nearest_neighbor_degree'][node],
+                          create3.calculate_average_neighbor_degree(ego, node))
+        assert np.isclose(values['average_nearest_neighbor_global_degree'][node],
+                          create3.calculate_average_neighbor_global_degree(G, node))
+        assert np.isclose(values['average_nearest_neighbor_global_degree'][node],
+                          create3.calculate_average_neighbor_global_degree(C, node))
+    assert 'missing' not in values['average_nearest_neighbor_degree']
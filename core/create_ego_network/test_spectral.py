@@ -0,0 +1,17 @@
+import numpy as np
+from scipy import linalg
+import easygraph as eg
+
+from spectral import sparse_spectral_radius
+import create3
+from conftest import build_random_graphs
+
+
+def test_spectral_radius_parity():
+    """稀疏谱半径与原稠密实现（eg.to_numpy_array + linalg.eigvals）在容限内一致"""
+    for seed, (n_nodes, n_edges) in enumerate([(200, 400), (300, 1500), (150, 3000)]):
+        G, C = build_random_graphs(n_nodes, n_edges, seed=seed)
+        expected = float(np.max(np.abs(linalg.eigvals(eg.to_numpy_array(G)))))
+        forced_sparse = sparse_spectral_radius(C.adjacency_matrix(), tol=1e-10, dense_threshold=0)
+        assert abs(forced_sparse - expected) <= 1e-6 * max(1.0, expected)
+        assert abs(create3.calculate_spectral_radius(G) - expected) <= 1e-6 * max(1.0, expected)
@@ -0,0 +1,96 @@
+import io
+import os
+import random
+import tempfile
+import contextlib
+import pandas as pd
+
+from csr_graph import CSRGraph
+from network_loader import load_edges, edges_to_dataframe
+from versioned_dataset import VersionedDataset
+import create3
+from clean_network_data import NetworkDataCleaner
+
+
+def test_hub_detection_and_bulk_pruning():
+    """自动检测垃圾枢纽节点（非明星优先、按二跳扩张数排序），一次删除多个用户"""
+    rng = random.Random(23)
+    with tempfile.TemporaryDirectory() as base:
+        edges = {(rng.randrange(1, 200), rng.randrange(1, 200)) for _ in range(250)}
+        edges |= {(900, t) for t in range(1, 80)} | {(s, 901) for s in range(50, 110)} | {(902, t) for t in range(1, 120)}
+        pd.DataFrame(sorted(edges), columns=['source', 'target']).to_csv(os.path.join(base, 'edges.csv'), index=False)
+        pd.DataFrame({'user_id': ['902']}).to_csv(os.path.join(base, 'high_fans_users.csv'), index=False)
+        pd.DataFrame({'user_id': range(1, 200), 'category': 'C'}).to_csv(os.path.join(base, 'users.csv'), index=False)
+        pd.DataFrame({'user_id': list(range(1, 200)) + [900, 901], 'avg_popularity': 1.0}).to_csv(
+            os.path.join(base, 'popularity.csv'), index=False)
+
+        cleaner = NetworkDataCleaner(base)
+        with contextlib.redirect_stdout(io.StringIO()):
+            candidates = cleaner.rank_hub_candidates(top=5)
+            assert list(candidates['user_id'][:2]) == ['900', '901'] and not candidates['is_celebrity'][:2].any()
+            assert candidates.loc[candidates['user_id'] == '902', 'is_celebrity'].all()
+            assert (candidates['expansion'][:2] == candidates['neighbors'][:2] * (candidates['neighbors'][:2] - 1)).all()
+            assert cleaner.clean_network(['900', '901.0'], confirm=False)
+
+        cleaned = cleaner.dataset.edges_frame()
+        kept = {(s, t) for s, t in edges if 900 not in (s, t) and 901 not in (s, t)}
+        assert set(zip(cleaned['source'].astype(int), cleaned['target'].astype(int))) == kept
+        popularity = cleaner.dataset.load_popularity()
+        assert not popularity['user_id'].isin(['900', '901']).any() and len(popularity) == 199
+        affected = pd.read_csv(os.path.join(base, 'affected_users_900_and_1_more.csv'), dtype={'user_id': str})
+        G = CSRGraph.from_edge_table(cleaner.dataset.load_edges(version=0))
+        expected = {}
+        for hub in ('900', '901'):
+            nodes, dist = G.bidirectional_bfs(G.index_of(hub), 2)
+            for node, d in zip(G.node_ids[nodes], dist):
+                expected[node] = min(expected.get(node, 3), int(d))
+        expected = {node: d for node, d in expected.items() if d > 0}
+        assert dict(zip(affected['user_id'], affected['distance'])) == expected
+
+
+def test_versioned_dataset_deltas_and_rollback():
+    """版本化网络目录：增量按版本顺序应用，回滚只改manifest，读取结果与整表改写一致"""
+    with tempfile.TemporaryDirectory() as base:
+        edges = pd.DataFrame({'source': ['1', '1', '2', '3', '4.0', '1'], 'target': ['2', '3', '3', '4', '1', '2']})
+        edges.to_csv(os.path.join(base, 'edges.csv'), index=False)
+        pd.DataFrame({'user_id': ['1', '2', '3', '4'], 'category': list('ABCC')}).to_csv(
+            os.path.join(base, 'users.csv'), index=False)
+        pd.DataFrame({'user_id': ['1', '2', '3', '4'], 'avg_popularity': [1.0, 2.0, 3.0, 4.0]}).to_csv(
+            os.path.join(base, 'popularity.csv'), index=False)
+        before = {name: open(os.path.join(base, name), 'rb').read() for name in ('edges.csv', 'users.csv', 'popularity.csv')}
+
+        dataset = VersionedDataset(base)
+        base_table = dataset.load_edges(deduplicate=False)
+        assert edges_to_dataframe(base_table).equals(edges_to_dataframe(load_edges(os.path.join(base, 'edges.csv'), deduplicate=False)))
+        assert dataset.commit("空提交") == 0
+        v1 = dataset.commit("补边", edges_added=[('2', '4'), ('5', '1')],
+                            popularity_updates=pd.DataFrame({'user_id': ['5', '2'], 'avg_popularity': [5.0, 2.5]}))
+        v2 = dataset.commit("删边", edges_removed=pd.DataFrame({'source': ['1'], 'target': ['2']}))
+        v3 = dataset.commit("补总体影响力", popularity_updates=pd.DataFrame({'user_id': ['1', '3'], 'avg_popularity_of_all': [7.0, 8.0]}))
+        v4 = dataset.commit("删除垃圾节点", nodes_removed=['3'])
+        assert (v1, v2, v3, v4) == (1, 2, 3, 4)
+
+        reopened = VersionedDataset(base)
+        pairs = lambda frame: sorted(zip(frame['source'], frame['target']))
+        assert pairs(reopened.edges_frame()) == [('2', '4'), ('4', '1'), ('5', '1')]
+        assert pairs(reopened.edges_frame(2)) == [('1', '3'), ('2', '3'), ('2', '4'), ('3', '4'), ('4', '1'), ('5', '1')]
+        popularity = reopened.load_popularity().set_index('user_id')
+        assert list(popularity.index) == ['1', '2', '4', '5'] and popularity.loc['2', 'avg_popularity'] == 2.5
+        assert popularity.loc['1', 'avg_popularity_of_all'] == 7.0 and pd.isna(popularity.loc['5', 'avg_popularity_of_all'])
+        assert list(reopened.load_users()['user_id']) == ['1', '2', '4']
+        assert reopened.load_edges().node_ids.tolist() == ['4', '1', '2', '5']
+        # create3的用户类别和明星用户与边读取同一版本：被删除的用户不再计入
+        pd.DataFrame({'user_id': ['1', '3']}).to_csv(os.path.join(base, 'high_fans_users.csv'), index=False)
+        assert reopened.removed_users() == {'3'} and reopened.removed_users(3) == set()
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert create3.load_celebrity_users(reopened) == {'1'}
+            assert create3.load_user_categories(reopened) == {'1': 'A', '2': 'B', '4': 'C'}
+
+        reopened.rollback(2)
+        assert pairs(VersionedDataset(base).edges_frame()) == pairs(reopened.edges_frame(2))
+        assert 'avg_popularity_of_all' not in VersionedDataset(base).load_popularity().columns
+        v3b = reopened.commit("回滚后重新删除", nodes_removed=['5'])
+        assert v3b == 3 and reopened.latest_version == 3
+        assert not os.path.exists(os.path.join(base, 'versions', 'v0004_nodes_removed.csv'))
+        assert pairs(reopened.edges_frame()) == [('1', '3'), ('2', '3'), ('2', '4'), ('3', '4'), ('4', '1')]
+        assert before == {name: open(os.path.join(base, name), 'rb').read() for name in before}
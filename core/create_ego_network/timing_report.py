@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+
+import numpy as np
+import pandas as pd
+
+# 二跳网络规模分组（节点数）的边界：按数量级分组，便于容量规划
+SIZE_BUCKETS = [0, 10, 100, 1_000, 10_000, 100_000, np.inf]
+PERCENTILES = (50, 95, 99)
+
+
+def peak_rss_mb():
+    """当前进程迄今为止的峰值常驻内存（MB）；无法获取时返回None
+
+    Unix用 resource.getrusage（Linux单位为KB，macOS为字节），Windows用 GetProcessMemoryInfo。
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / (1024 * 1024)
+    except (ImportError, AttributeError, OSError):
+        pass
+    return None
+
+
+def timing_record(user_id, metrics, timings, peak_rss):
+    """timings.jsonl中的一行：用户、二跳网络规模、各阶段耗时（秒）和计算该用户的进程的峰值内存（MB）"""
+    return {
+        'user_id': user_id,
+        'node_count': metrics.get('node_count'),
+        'edge_count': metrics.get('edge_count'),
+        'peak_rss_mb': peak_rss,
+        'timings': timings,
+    }
+
+
+def load_timings(timings_path):
+    """读取timings.jsonl，返回长表DataFrame：每行为 (用户, 阶段) 的耗时，附带二跳网络规模和峰值内存"""
+    rows = []
+    with open(timings_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            for stage, seconds in record.get('timings', {}).items():
+                rows.append((record['user_id'], record.get('node_count'), record.get('edge_count'),
+                             record.get('peak_rss_mb'), stage, seconds))
+    return pd.DataFrame(rows, columns=['user_id', 'node_count', 'edge_count', 'peak_rss_mb', 'stage', 'seconds'])
+
+
+def _percentile_table(df, by):
+    grouped = df.groupby(by, observed=True)['seconds']
+    table = grouped.agg(users='count', total_seconds='sum', max_seconds='max')
+    for p in PERCENTILES:
+        table[f'p{p}_seconds'] = grouped.quantile(p / 100)
+    return table
+
+
+def build_timing_report(df, top=10):
+    """按阶段、以及按 阶段 × 二跳网络规模分组 统计 p50/p95/p99 耗时，并找出总耗时最多的用户
+
+    返回 (按阶段汇总, 按规模分组汇总, 最慢用户) 三个DataFrame。share为该阶段/分组占全部指标耗时的比例
+    （'total'阶段为每个用户的总耗时，不计入share的分母）。
+    """
+    stages = df[df['stage'] != 'total']
+    grand_total = stages['seconds'].sum() or 1.0
+
+    by_stage = _percentile_table(df, 'stage')
+    by_stage['share'] = by_stage['total_seconds'] / grand_total
+    by_stage.loc[by_stage.index == 'total', 'share'] = np.nan
+
+    labels = [f"{int(lo)}-{int(hi) - 1}" if np.isfinite(hi) else f">={int(lo)}"
+              for lo, hi in zip(SIZE_BUCKETS[:-1], SIZE_BUCKETS[1:])]
+    sized = df.assign(ego_size=pd.cut(df['node_count'], SIZE_BUCKETS, right=False, labels=labels))
+    by_size = _percentile_table(sized, ['stage', 'ego_size'])
+    by_size['share'] = by_size['total_seconds'] / grand_total
+    by_size.loc[by_size.index.get_level_values('stage') == 'total', 'share'] = np.nan
+
+    per_user = stages.pivot_table(index='user_id', columns='stage', values='seconds', aggfunc='sum')
+    slowest = per_user.sum(axis=1).sort_values(ascending=False).head(top).rename('total_seconds').to_frame()
+    slowest['slowest_stage'] = per_user.loc[slowest.index].idxmax(axis=1)
+    sizes = df.drop_duplicates('user_id').set_index('user_id')[['node_count', 'edge_count', 'peak_rss_mb']]
+    slowest = slowest.join(sizes)
+    return by_stage, by_size, slowest
+
+
+def write_timing_report(timings_path, output_path=None, top=10):
+    """从timings.jsonl生成耗时报告CSV（默认与timings.jsonl同目录的timing_report.csv）并打印要点；返回输出路径"""
+    df = load_timings(timings_path)
+    if len(df) == 0:
+        print(f"⚠️ {timings_path} 中没有耗时记录")
+        return None
+    by_stage, by_size, slowest = build_timing_report(df, top=top)
+    output_path = output_path or os.path.join(os.path.dirname(timings_path), 'timing_report.csv')
+
+    report = pd.concat([
+        by_stage.reset_index().assign(ego_size='all'),
+        by_size.reset_index().assign(ego_size=lambda t: t['ego_size'].astype(str)),
+    ], ignore_index=True)
+    columns = ['stage', 'ego_size', 'users'] + [f'p{p}_seconds' for p in PERCENTILES] + \
+              ['max_seconds', 'total_seconds', 'share']
+    report[columns].to_csv(output_path, index=False)
+
+    print(f"\n⏱️ 各阶段耗时分位数（秒，共 {df['user_id'].nunique()} 个用户）:")
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        print(by_stage[['users', 'p50_seconds', 'p95_seconds', 'p99_seconds', 'max_seconds', 'share']]
+              .sort_values('max_seconds', ascending=False).round(4).to_string())
+        print(f"\n🐢 总耗时最多的 {len(slowest)} 个用户:")
+        print(slowest.round(3).to_string())
+    print(f"耗时报告已保存到: {output_path}")
+    return output_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python timing_report.py <timings.jsonl> [输出CSV]")
+        sys.exit(2)
+    write_timing_report(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
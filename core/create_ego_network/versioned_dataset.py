@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from network_loader import normalize_ids, intern_edges, load_edges, load_users, load_popularity
+
+# 版本化网络目录：edges.csv / users.csv / popularity.csv 为不可变的基线（版本0），
+# 之后每次清洗/补边/补影响力只在 versions/ 下追加一组小的增量文件，并在manifest.json中登记：
+#   v0001_nodes_removed.csv       删除的用户（连同其全部边、users/popularity中的行）
+#   v0001_edges_removed.csv       删除的边（source, target）
+#   v0001_edges_added.csv         新增的边（source, target）
+#   v0001_popularity_updates.csv  popularity的按用户更新/新增行（user_id + 要更新的列）
+# 读取时从基线开始按版本顺序应用增量；回滚只改manifest中的当前版本，不复制任何整表文件。
+VERSIONS_DIR = 'versions'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_FORMAT = 1
+DELTA_KINDS = ('nodes_removed', 'edges_removed', 'edges_added', 'popularity_updates')
+
+
+def _read_pairs(path):
+    df = pd.read_csv(path, usecols=['source', 'target'], dtype={'source': str, 'target': str})
+    return pd.DataFrame({'source': normalize_ids(df['source']).values, 'target': normalize_ids(df['target']).values})
+
+
+def _read_user_ids(path):
+    df = pd.read_csv(path, usecols=['user_id'], dtype={'user_id': str})
+    return normalize_ids(df['user_id']).values
+
+
+def _pair_mask(frame, pairs):
+    """frame中 (source, target) 属于pairs的行"""
+    if len(frame) == 0 or len(pairs) == 0:
+        return np.zeros(len(frame), dtype=bool)
+    return pd.MultiIndex.from_frame(frame[['source', 'target']]).isin(
+        pd.MultiIndex.from_frame(pairs[['source', 'target']]))
+
+
+def _upsert(df, updates):
+    """按user_id更新df中已有用户的列（新列对其余用户为NaN），不存在的用户追加为新行"""
+    updates = updates.drop_duplicates('user_id', keep='last')
+    positions = pd.Index(updates['user_id']).get_indexer(df['user_id'])
+    hit = positions >= 0
+    df = df.copy()
+    for col in updates.columns:
+        if col == 'user_id':
+            continue
+        if col not in df.columns:
+            df[col] = np.nan
+        df.loc[hit, col] = updates[col].to_numpy()[positions[hit]]
+    new_rows = updates[~updates['user_id'].isin(df['user_id'])]
+    if len(new_rows):
+        df = pd.concat([df, new_rows], ignore_index=True)
+    return df
+
+
+class VersionedDataset:
+    """一个网络目录的版本化视图：基线文件 + 按版本追加的增量文件 + manifest
+
+    没有manifest时即为只有基线的数据集，读取结果与直接读取CSV完全一致。
+    回滚到旧版本后，较新的版本仍保留在manifest中（可以再“回滚”回去）；在旧版本上提交新版本时丢弃它们。
+    """
+
+    def __init__(self, network_dir):
+        self.network_dir = network_dir
+        self.versions_dir = os.path.join(network_dir, VERSIONS_DIR)
+        self.manifest_path = os.path.join(self.versions_dir, MANIFEST_FILE)
+        self.edges_file = os.path.join(network_dir, 'edges.csv')
+        self.users_file = os.path.join(network_dir, 'users.csv')
+        self.popularity_file = os.path.join(network_dir, 'popularity.csv')
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {'format': MANIFEST_FORMAT, 'current': 0, 'versions': []}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        os.makedirs(self.versions_dir, exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    @property
+    def current_version(self):
+        return self.manifest['current']
+
+    @property
+    def latest_version(self):
+        return self.manifest['versions'][-1]['version'] if self.manifest['versions'] else 0
+
+    def versions(self):
+        return list(self.manifest['versions'])
+
+    def _applied(self, version=None):
+        """读取version（默认当前版本）时需要依次应用的版本记录"""
+        version = self.current_version if version is None else version
+        if not 0 <= version <= self.latest_version:
+            raise ValueError(f"版本 {version} 不存在（可用: 0-{self.latest_version}）")
+        return [v for v in self.manifest['versions'] if v['version'] <= version]
+
+    def _delta_path(self, entry, kind):
+        name = entry['files'].get(kind)
+        return os.path.join(self.versions_dir, name) if name else None
+
+    # ---------- 读取（应用增量） ----------
+
+    def edges_frame(self, version=None):
+        """应用增量后的边表：规范化后的 source/target 字符串DataFrame（保留基线中的重复边）"""
+        applied = self._applied(version)
+        df = pd.read_csv(self.edges_file, usecols=['source', 'target'], dtype={'source': str, 'target': str})
+        frame = pd.DataFrame({'source': normalize_ids(df['source']).values, 'target': normalize_ids(df['target']).values})
+        for entry in applied:
+            path = self._delta_path(entry, 'nodes_removed')
+            if path:
+                removed = _read_user_ids(path)
+                frame = frame[~(frame['source'].isin(removed) | frame['target'].isin(removed))]
+            path = self._delta_path(entry, 'edges_removed')
+            if path:
+                frame = frame[~_pair_mask(frame, _read_pairs(path))]
+            path = self._delta_path(entry, 'edges_added')
+            if path:
+                frame = pd.concat([frame, _read_pairs(path)], ignore_index=True)
+        return frame.reset_index(drop=True)
+
+    def removed_users(self, version=None):
+        """截至version（默认当前版本）被删除的全部用户ID（规范化后的字符串集合）"""
+        removed = set()
+        for entry in self._applied(version):
+            path = self._delta_path(entry, 'nodes_removed')
+            if path:
+                removed.update(_read_user_ids(path).tolist())
+        return removed
+
+    def load_edges(self, deduplicate=True, version=None):
+        """与network_loader.load_edges相同的EdgeTable；没有增量时直接读取基线"""
+        if not self._applied(version):
+            return load_edges(self.edges_file, deduplicate=deduplicate)
+        frame = self.edges_frame(version)
+        return intern_edges(frame['source'].values, frame['target'].values, deduplicate=deduplicate)
+
+    def _user_table(self, path, loader, version, updates_kind=None):
+        applied = self._applied(version)
+        if os.path.exists(path):
+            df = loader(path)
+        elif updates_kind and any(updates_kind in entry['files'] for entry in applied):
+            # 基线中没有该表（如新网络首次补充影响力），从空表开始应用增量
+            df = pd.DataFrame({'user_id': pd.Series([], dtype=object)})
+        else:
+            return None
+        for entry in applied:
+            removed = self._delta_path(entry, 'nodes_removed')
+            if removed:
+                df = df[~df['user_id'].isin(_read_user_ids(removed))]
+            updates = self._delta_path(entry, updates_kind) if updates_kind else None
+            if updates:
+                df = _upsert(df, load_popularity(updates))
+        return df.reset_index(drop=True)
+
+    def load_users(self, version=None):
+        """应用增量后的users表；没有users.csv时返回None"""
+        return self._user_table(self.users_file, load_users, version)
+
+    def load_popularity(self, version=None):
+        """应用增量后的popularity表；没有popularity.csv时返回None"""
+        return self._user_table(self.popularity_file, load_popularity, version, 'popularity_updates')
+
+    # ---------- 提交、回滚、导出 ----------
+
+    def commit(self, note, nodes_removed=None, edges_removed=None, edges_added=None, popularity_updates=None):
+        """把一组增量登记为新版本并设为当前版本，返回版本号；所有增量都为空时不提交，返回当前版本
+
+        nodes_removed为用户ID序列，edges_*为含source/target列的DataFrame（或 (source, target) 列表），
+        popularity_updates为含user_id列的DataFrame。先写增量文件，最后原子替换manifest。
+        """
+        deltas = {
+            'nodes_removed': None if nodes_removed is None else
+            pd.DataFrame({'user_id': normalize_ids(pd.Series(list(nodes_removed), dtype=object)).values}),
+            'edges_removed': None if edges_removed is None else _normalize_pairs(edges_removed),
+            'edges_added': None if edges_added is None else _normalize_pairs(edges_added),
+            'popularity_updates': None if popularity_updates is None else
+            popularity_updates.assign(user_id=normalize_ids(popularity_updates['user_id']).values),
+        }
+        deltas = {kind: df for kind, df in deltas.items() if df is not None and len(df) > 0}
+        if not deltas:
+            return self.current_version
+
+        self._discard_after(self.current_version)
+        version = self.latest_version + 1
+        os.makedirs(self.versions_dir, exist_ok=True)
+        files, stats = {}, {}
+        for kind in DELTA_KINDS:
+            if kind in deltas:
+                files[kind] = f"v{version:04d}_{kind}.csv"
+                deltas[kind].to_csv(os.path.join(self.versions_dir, files[kind]), index=False, encoding='utf-8-sig')
+                stats[kind] = len(deltas[kind])
+        self.manifest['versions'].append({
+            'version': version,
+            'parent': self.current_version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'note': note,
+            'files': files,
+            'stats': stats,
+        })
+        self.manifest['current'] = version
+        self._save_manifest()
+        return version
+
+    def _discard_after(self, version):
+        """删除版本号大于version的版本（在旧版本上提交新版本时调用）"""
+        for entry in self.manifest['versions']:
+            if entry['version'] > version:
+                for name in entry['files'].values():
+                    path = os.path.join(self.versions_dir, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+        self.manifest['versions'] = [v for v in self.manifest['versions'] if v['version'] <= version]
+
+    def rollback(self, version):
+        """把当前版本切换到version（0为基线），只修改manifest"""
+        self._applied(version)
+        self.manifest['current'] = version
+        self._save_manifest()
+
+    def delta_path(self, version, kind):
+        """某个版本的某类增量文件路径；该版本没有这类增量时返回None"""
+        for entry in self.manifest['versions']:
+            if entry['version'] == version:
+                return self._delta_path(entry, kind)
+        return None
+
+    def export(self, output_dir, version=None):
+        """把某个版本导出为完整的 edges/users/popularity CSV（供不读取增量的外部工具使用）"""
+        os.makedirs(output_dir, exist_ok=True)
+        self.edges_frame(version).to_csv(os.path.join(output_dir, 'edges.csv'), index=False, encoding='utf-8-sig')
+        for name, df in (('users.csv', self.load_users(version)), ('popularity.csv', self.load_popularity(version))):
+            if df is not None:
+                df.to_csv(os.path.join(output_dir, name), index=False, encoding='utf-8-sig')
+        return output_dir
+
+
+def _normalize_pairs(edges):
+    frame = edges if isinstance(edges, pd.DataFrame) else pd.DataFrame(list(edges), columns=['source', 'target'])
+    return pd.DataFrame({'source': normalize_ids(frame['source']).values,
+                         'target': normalize_ids(frame['target']).values})
+
+
+def print_versions(dataset):
+    print(f"📚 {dataset.network_dir} 的版本（当前版本: {dataset.current_version}）:")
+    print(f"  {'*' if dataset.current_version == 0 else ' '} v0  基线文件")
+    for entry in dataset.versions():
+        marker = '*' if entry['version'] == dataset.current_version else ' '
+        stats = ', '.join(f"{kind} {count}" for kind, count in entry['stats'].items())
+        print(f"  {marker} v{entry['version']}  {entry['created_at']}  {entry['note']}  ({stats})")
+
+
+if __name__ == "__main__":
+    usage = "用法: python versioned_dataset.py <网络目录> [list | rollback <版本> | export <输出目录> [版本]]"
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(2)
+    dataset = VersionedDataset(sys.argv[1])
+    command = sys.argv[2] if len(sys.argv) > 2 else 'list'
+    if command == 'list':
+        print_versions(dataset)
+    elif command == 'rollback' and len(sys.argv) == 4:
+        dataset.rollback(int(sys.argv[3]))
+        print(f"✅ 已回滚到版本 {dataset.current_version}")
+    elif command == 'export' and len(sys.argv) in (4, 5):
+        version = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        print(f"✅ 已导出到: {dataset.export(sys.argv[3], version)}")
+    else:
+        print(usage)
+        sys.exit(2)
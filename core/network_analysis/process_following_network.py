@@ -1,48 +1,53 @@
 import os
+import sys
 import pandas as pd
 import networkx as nx
 import json
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'create_ego_network'))
+from versioned_dataset import VersionedDataset
+
 def ensure_dir(directory):
     """确保目录存在，如果不存在则创建"""
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def build_neighbor_network(edges_file, users_file=None, popularity_file=None):
-    """根据关系构建邻居网络"""
-    print(f"从 {edges_file} 构建邻居网络...")
+def build_neighbor_network(network_dir):
+    """根据关系构建邻居网络（版本化网络目录在读取时应用清洗、补边等增量）"""
+    print(f"从 {network_dir} 构建邻居网络...")
+    dataset = VersionedDataset(network_dir)
+    if dataset.versions():
+        print(f"📚 数据版本: {dataset.current_version}（共 {dataset.latest_version} 个版本）")
     
-    # 读取边数据
-    edges_df = pd.read_csv(edges_file)
+    # 读取边数据（向量化规范化ID并驻留为整数数组）
+    table = dataset.load_edges(deduplicate=False)
     
     # 创建有向图
     G = nx.DiGraph()
     
     # 添加边
-    for _, edge in edges_df.iterrows():
-        G.add_edge(str(edge['source']), str(edge['target']))
-    
-    # 如果提供了用户信息文件，则添加节点属性
-    if users_file and os.path.exists(users_file):
-        users_df = pd.read_csv(users_file)
-        for _, user in users_df.iterrows():
-            user_id = str(user['user_id'])
-            if user_id in G.nodes:
-                # 添加节点属性
-                for col in users_df.columns:
-                    if col != 'user_id':
-                        G.nodes[user_id][col] = user.get(col)
-    
-    # 如果提供了流行度文件，则添加流行度属性
-    if popularity_file and os.path.exists(popularity_file):
-        pop_df = pd.read_csv(popularity_file)
-        for _, row in pop_df.iterrows():
-            user_id = str(row['user_id'])
-            if user_id in G.nodes:
-                # 添加流行度属性
-                G.nodes[user_id]['avg_popularity'] = row.get('avg_popularity', 0)
-                G.nodes[user_id]['interaction_count'] = row.get('interaction_count', 0)
+    G.add_edges_from(zip(table.node_ids[table.source], table.node_ids[table.target]))
+    
+    # 如果有用户信息表，则添加节点属性
+    users_df = dataset.load_users()
+    if users_df is not None:
+        users_df = users_df[users_df['user_id'].isin(G.nodes)]
+        for user in users_df.to_dict('records'):
+            user_id = user.pop('user_id')
+            # 添加节点属性
+            G.nodes[user_id].update(user)
+    
+    # 如果有流行度表，则添加流行度属性
+    pop_df = dataset.load_popularity()
+    if pop_df is not None:
+        pop_df = pop_df[pop_df['user_id'].isin(G.nodes)]
+        avg_popularity = pop_df['avg_popularity'] if 'avg_popularity' in pop_df.columns else pd.Series(0, index=pop_df.index)
+        interaction_count = pop_df['interaction_count'] if 'interaction_count' in pop_df.columns else pd.Series(0, index=pop_df.index)
+        for user_id, popularity, interactions in zip(pop_df['user_id'], avg_popularity, interaction_count):
+            # 添加流行度属性
+            G.nodes[user_id]['avg_popularity'] = popularity
+            G.nodes[user_id]['interaction_count'] = interactions
     
     print(f"网络构建完成! 包含 {len(G.nodes)} 个节点和 {len(G.edges)} 条边")
     return G
@@ -124,8 +129,6 @@ def process_network(network_dir, output_dir):
     """处理单个网络目录下的数据"""
     # 确定文件路径
     edges_file = os.path.join(network_dir, 'edges.csv')
-    users_file = os.path.join(network_dir, 'users.csv')
-    popularity_file = os.path.join(network_dir, 'popularity.csv')
     
     # 检查必要文件是否存在
     if not os.path.exists(edges_file):
@@ -133,7 +136,7 @@ def process_network(network_dir, output_dir):
         return
     
     # 构建网络
-    G = build_neighbor_network(edges_file, users_file, popularity_file)
+    G = build_neighbor_network(network_dir)
     
     # 分析完整网络
     metrics = analyze_network(G, is_directed=True)
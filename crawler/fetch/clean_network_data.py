@@ -1,7 +1,31 @@
 import os
+import re
+import sys
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import shutil
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'core', 'create_ego_network'))
+from csr_graph import CSRGraph, gather_rows
+from network_loader import normalize_id, normalize_ids
+from versioned_dataset import VersionedDataset
+
+# 二跳网络半径：与被删除用户距离不超过该值的用户，其二跳网络会因删除而改变
+AFFECTED_RADIUS = 2
+
+# 自动检测垃圾枢纽节点：列出的候选数和候选列表文件名
+HUB_CANDIDATES_TOP = 20
+HUB_CANDIDATES_FILE = 'hub_candidates.csv'
+
+def _normalize_user_ids(user_ids):
+    """单个用户ID或用户ID列表 -> 规范化、去重后的列表（保持输入顺序）"""
+    if isinstance(user_ids, (str, int, np.integer)):
+        user_ids = [user_ids]
+    return list(dict.fromkeys(normalize_id(u) for u in user_ids))
+
+def _label(user_ids):
+    """输出文件名中的用户标识：单个用户为其ID，多个用户为 首个ID_and_N_more"""
+    return user_ids[0] if len(user_ids) == 1 else f"{user_ids[0]}_and_{len(user_ids) - 1}_more"
 
 class NetworkDataCleaner:
     def __init__(self, network_path):
@@ -9,260 +33,253 @@ class NetworkDataCleaner:
         self.edges_file = os.path.join(network_path, 'edges.csv')
         self.users_file = os.path.join(network_path, 'users.csv')
         self.popularity_file = os.path.join(network_path, 'popularity.csv')
-        
-    def backup_original_files(self):
-        """备份原始文件"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_dir = os.path.join(self.network_path, f'backup_before_clean_{timestamp}')
-        
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-        
-        files_to_backup = []
-        
-        if os.path.exists(self.edges_file):
-            shutil.copy2(self.edges_file, os.path.join(backup_dir, 'edges.csv'))
-            files_to_backup.append('edges.csv')
-        
-        if os.path.exists(self.users_file):
-            shutil.copy2(self.users_file, os.path.join(backup_dir, 'users.csv'))
-            files_to_backup.append('users.csv')
-        
-        if os.path.exists(self.popularity_file):
-            shutil.copy2(self.popularity_file, os.path.join(backup_dir, 'popularity.csv'))
-            files_to_backup.append('popularity.csv')
-        
-        print(f"✅ 原始文件已备份到: {backup_dir}")
-        print(f"   备份文件: {', '.join(files_to_backup)}")
-        
-        return backup_dir
+        self.high_fans_file = os.path.join(network_path, 'high_fans_users.csv')
+        # 清洗结果作为新的数据版本登记（只写被删除的用户ID），不复制、不重写原始文件
+        self.dataset = VersionedDataset(network_path)
+        
+    def load_celebrity_users(self):
+        """读取high_fans_users.csv中的明星用户（规范化后的用户ID集合），文件不存在时为空集"""
+        if not os.path.exists(self.high_fans_file):
+            return set()
+        high_fans_df = pd.read_csv(self.high_fans_file, dtype={'user_id': str})
+        return set(normalize_ids(high_fans_df['user_id']))
     
-    def analyze_user_impact(self, user_id_to_remove):
-        """分析要删除的用户对网络的影响"""
-        print(f"\n🔍 分析用户 {user_id_to_remove} 对网络的影响...")
+    def rank_hub_candidates(self, top=HUB_CANDIDATES_TOP):
+        """一次读取边表，用度数数组给疑似垃圾枢纽节点排序，保存hub_candidates.csv并返回前top个候选
+        
+        二跳扩张数 = 无向邻居数k × (k-1)：该节点让每个邻居的二跳网络多出其余 k-1 个成员，
+        expansion_share 为它在全网所有“经某个中间节点的二跳关系”中所占的比例。
+        排序：非明星用户在前（明星用户的高度数是真实的，只标注不优先删除），再按二跳扩张数、总度数降序。
+        """
+        G = CSRGraph.from_edge_table(self.dataset.load_edges(deduplicate=False))
+        n = G.number_of_nodes()
+        source, target = G.edge_arrays()
+        source, target = source.astype(np.int64), target.astype(np.int64)
+        # 无向邻居数：互相关注的两条边只算一个邻居，自环不算
+        pairs = np.unique(np.minimum(source, target) * n + np.maximum(source, target))
+        low, high = pairs // n, pairs % n
+        loops = low == high
+        neighbors = np.bincount(low[~loops], minlength=n) + np.bincount(high[~loops], minlength=n)
+        expansion = neighbors.astype(np.int64) * np.maximum(neighbors - 1, 0)
+        total_expansion = max(int(expansion.sum()), 1)
+        
+        celebrity_users = self.load_celebrity_users()
+        is_celebrity = np.isin(G.node_ids.astype(str), list(celebrity_users)) if celebrity_users else np.zeros(n, dtype=bool)
+        total_degree = G.degrees.astype(np.int64)
+        order = np.lexsort((-total_degree, -expansion, is_celebrity))[:top]
+        
+        candidates = pd.DataFrame({
+            'rank': np.arange(1, len(order) + 1),
+            'user_id': G.node_ids[order].astype(str),
+            'in_degree': G.in_degrees[order],
+            'out_degree': G.out_degrees[order],
+            'neighbors': neighbors[order],
+            'expansion': expansion[order],
+            'expansion_share': expansion[order] / total_expansion,
+            'is_celebrity': is_celebrity[order],
+        })
+        candidates_file = os.path.join(self.network_path, HUB_CANDIDATES_FILE)
+        candidates.to_csv(candidates_file, index=False, encoding='utf-8-sig')
+        
+        print(f"\n🔍 疑似垃圾枢纽节点（共 {n:,} 个节点，按二跳扩张数排序，前 {len(candidates)} 个）:")
+        print(candidates.assign(expansion_share=(candidates['expansion_share'] * 100).round(2))
+              .rename(columns={'expansion_share': 'expansion_%'}).to_string(index=False))
+        print(f"✅ 候选列表已保存: {candidates_file}")
+        return candidates
+    
+    def analyze_user_impact(self, user_ids_to_remove):
+        """分析要删除的用户对网络（当前数据版本）的影响，每张表只读取一次"""
+        user_ids = _normalize_user_ids(user_ids_to_remove)
+        print(f"\n🔍 分析 {len(user_ids)} 个用户对网络的影响: {', '.join(user_ids)}")
         
         # 分析edges
         if os.path.exists(self.edges_file):
-            edges_df = pd.read_csv(self.edges_file)
-            edges_df['source'] = edges_df['source'].astype(str)
-            edges_df['target'] = edges_df['target'].astype(str)
-            
-            # 统计相关边
-            as_source = edges_df[edges_df['source'] == user_id_to_remove]
-            as_target = edges_df[edges_df['target'] == user_id_to_remove]
-            total_related_edges = len(as_source) + len(as_target)
+            edges_df = self.dataset.edges_frame()
+            as_source = edges_df['source'].isin(user_ids).values
+            as_target = edges_df['target'].isin(user_ids).values
+            total_related_edges = int((as_source | as_target).sum())
             
             print(f"📊 边数据分析:")
             print(f"   总边数: {len(edges_df):,}")
-            print(f"   作为source的边数: {len(as_source):,} (该用户关注了多少人)")
-            print(f"   作为target的边数: {len(as_target):,} (多少人关注了该用户)")
+            print(f"   作为source的边数: {int(as_source.sum()):,} (这些用户关注了多少人)")
+            print(f"   作为target的边数: {int(as_target.sum()):,} (多少人关注了这些用户)")
             print(f"   相关边总数: {total_related_edges:,}")
-            print(f"   将删除的边占比: {total_related_edges/len(edges_df)*100:.2f}%")
+            if len(edges_df):
+                print(f"   将删除的边占比: {total_related_edges/len(edges_df)*100:.2f}%")
             
             # 分析连接的用户
-            connected_users = set()
-            connected_users.update(as_source['target'].tolist())
-            connected_users.update(as_target['source'].tolist())
+            connected_users = set(edges_df.loc[as_source, 'target']) | set(edges_df.loc[as_target, 'source'])
+            connected_users -= set(user_ids)
             print(f"   直接连接的用户数: {len(connected_users):,}")
         
-        # 分析users
-        if os.path.exists(self.users_file):
-            users_df = pd.read_csv(self.users_file)
-            users_df['user_id'] = users_df['user_id'].astype(str)
-            
-            user_exists = user_id_to_remove in users_df['user_id'].values
-            print(f"📊 用户数据分析:")
-            print(f"   总用户数: {len(users_df):,}")
-            print(f"   目标用户存在: {'是' if user_exists else '否'}")
-        
-        # 分析popularity
-        if os.path.exists(self.popularity_file):
-            popularity_df = pd.read_csv(self.popularity_file)
-            popularity_df['user_id'] = popularity_df['user_id'].astype(str)
-            
-            user_exists = user_id_to_remove in popularity_df['user_id'].values
-            print(f"📊 流行度数据分析:")
-            print(f"   总用户数: {len(popularity_df):,}")
-            print(f"   目标用户存在: {'是' if user_exists else '否'}")
+        # 分析users / popularity
+        for label, df in (("用户数据", self.dataset.load_users()), ("流行度数据", self.dataset.load_popularity())):
+            if df is not None:
+                found = int(df['user_id'].isin(user_ids).sum())
+                print(f"📊 {label}分析:")
+                print(f"   总用户数: {len(df):,}")
+                print(f"   目标用户存在: {found}/{len(user_ids)}")
     
-    def clean_edges_data(self, user_id_to_remove):
-        """清洗edges数据"""
-        if not os.path.exists(self.edges_file):
-            print(f"❌ edges.csv文件不存在: {self.edges_file}")
-            return False
-        
-        print(f"\n🧹 清洗edges数据...")
-        
-        # 读取原始数据
-        edges_df = pd.read_csv(self.edges_file)
-        original_count = len(edges_df)
-        
-        # 转换为字符串类型确保一致性
-        edges_df['source'] = edges_df['source'].astype(str)
-        edges_df['target'] = edges_df['target'].astype(str)
-        
-        # 删除包含目标用户的所有边
-        cleaned_edges_df = edges_df[
-            (edges_df['source'] != user_id_to_remove) & 
-            (edges_df['target'] != user_id_to_remove)
-        ]
-        
-        removed_count = original_count - len(cleaned_edges_df)
-        
-        # 保存清洗后的数据
-        new_edges_file = os.path.join(self.network_path, 'new_edges.csv')
-        cleaned_edges_df.to_csv(new_edges_file, index=False, encoding='utf-8-sig')
-        
-        print(f"✅ edges数据清洗完成:")
-        print(f"   原始边数: {original_count:,}")
-        print(f"   删除边数: {removed_count:,}")
-        print(f"   剩余边数: {len(cleaned_edges_df):,}")
-        print(f"   删除比例: {removed_count/original_count*100:.2f}%")
-        print(f"   新文件: {new_edges_file}")
-        
-        return True
+    def commit_removal(self, user_ids_to_remove):
+        """把删除这些用户（连同其全部边、users/popularity中的行）登记为新的数据版本，返回版本号
+        
+        增量文件只包含被删除的用户ID；读取时（create3.py等）由VersionedDataset一次向量化过滤掉。
+        """
+        user_ids = _normalize_user_ids(user_ids_to_remove)
+        parent = self.dataset.current_version
+        version = self.dataset.commit(f"删除垃圾节点: {', '.join(user_ids)}", nodes_removed=user_ids)
+        
+        print(f"\n🧹 已登记新的数据版本:")
+        print(f"   版本: {parent} → {version}")
+        print(f"   删除用户数: {len(user_ids)}")
+        print(f"   增量文件: {self.dataset.delta_path(version, 'nodes_removed')}")
+        return version
     
-    def clean_users_data(self, user_id_to_remove):
-        """清洗users数据"""
-        if not os.path.exists(self.users_file):
-            print(f"⚠️ users.csv文件不存在: {self.users_file}")
-            return True
-        
-        print(f"\n🧹 清洗users数据...")
-        
-        # 读取原始数据
-        users_df = pd.read_csv(self.users_file)
-        original_count = len(users_df)
+    def write_affected_users(self, user_ids_to_remove):
+        """在清洗前的网络（当前数据版本）上找出二跳网络受删除影响的用户，写出affected_users_<用户ID>.csv
         
-        # 转换为字符串类型确保一致性
-        users_df['user_id'] = users_df['user_id'].astype(str)
-        
-        # 删除目标用户
-        cleaned_users_df = users_df[users_df['user_id'] != user_id_to_remove]
-        
-        removed_count = original_count - len(cleaned_users_df)
-        
-        # 保存清洗后的数据
-        new_users_file = os.path.join(self.network_path, 'new_users.csv')
-        cleaned_users_df.to_csv(new_users_file, index=False, encoding='utf-8-sig')
-        
-        print(f"✅ users数据清洗完成:")
-        print(f"   原始用户数: {original_count:,}")
-        print(f"   删除用户数: {removed_count}")
-        print(f"   剩余用户数: {len(cleaned_users_df):,}")
-        print(f"   新文件: {new_users_file}")
-        
-        return True
-    
-    def clean_popularity_data(self, user_id_to_remove):
-        """清洗popularity数据"""
-        if not os.path.exists(self.popularity_file):
-            print(f"⚠️ popularity.csv文件不存在: {self.popularity_file}")
-            return True
-        
-        print(f"\n🧹 清洗popularity数据...")
-        
-        # 读取原始数据
-        popularity_df = pd.read_csv(self.popularity_file)
-        original_count = len(popularity_df)
-        
-        # 转换为字符串类型确保一致性
-        popularity_df['user_id'] = popularity_df['user_id'].astype(str)
-        
-        # 删除目标用户
-        cleaned_popularity_df = popularity_df[popularity_df['user_id'] != user_id_to_remove]
-        
-        removed_count = original_count - len(cleaned_popularity_df)
-        
-        # 保存清洗后的数据
-        new_popularity_file = os.path.join(self.network_path, 'new_popularity.csv')
-        cleaned_popularity_df.to_csv(new_popularity_file, index=False, encoding='utf-8-sig')
-        
-        print(f"✅ popularity数据清洗完成:")
-        print(f"   原始用户数: {original_count:,}")
-        print(f"   删除用户数: {removed_count}")
-        print(f"   剩余用户数: {len(cleaned_popularity_df):,}")
-        print(f"   新文件: {new_popularity_file}")
-        
-        return True
+        只有与被删除用户（无向）距离不超过2的用户，其二跳网络的成员、边或邻居度数会改变；
+        create3.py 以 --resume resume --recompute-users 读取该文件时只重算这些用户，其余用户的指标记录原样沿用。
+        删除多个用户时从它们同时出发做一次多源BFS，distance为到最近的被删除用户的距离。
+        """
+        if not os.path.exists(self.edges_file):
+            return None
+        user_ids = _normalize_user_ids(user_ids_to_remove)
+        G = CSRGraph.from_edge_table(self.dataset.load_edges(deduplicate=False))
+        distance = np.full(G.number_of_nodes(), -1, dtype=np.int32)
+        frontier = G.indices_of(user_ids)
+        frontier = np.unique(frontier[frontier >= 0]).astype(np.int64)
+        removed = frontier
+        distance[frontier] = 0
+        for level in range(1, AFFECTED_RADIUS + 1):
+            candidates = np.unique(np.concatenate([
+                gather_rows(G.out_indptr, G.out_indices, frontier),
+                gather_rows(G.in_indptr, G.in_indices, frontier),
+            ]).astype(np.int64))
+            frontier = candidates[distance[candidates] < 0]
+            if len(frontier) == 0:
+                break
+            distance[frontier] = level
+        reached = np.flatnonzero(distance > 0)
+        affected, distances = G.node_ids[reached].tolist(), distance[reached].tolist()
+        
+        affected_file = os.path.join(self.network_path, f'affected_users_{_label(user_ids)}.csv')
+        pd.DataFrame({'user_id': affected, 'distance': distances}).to_csv(affected_file, index=False, encoding='utf-8-sig')
+        
+        print(f"✅ 受影响用户列表已生成:")
+        print(f"   网络节点数: {G.number_of_nodes():,}")
+        print(f"   图中找到的被删除用户: {len(removed)}/{len(user_ids)}")
+        print(f"   二跳网络受影响的用户数: {len(affected):,}")
+        if G.number_of_nodes():
+            print(f"   受影响比例: {len(affected)/G.number_of_nodes()*100:.2f}%")
+        print(f"   新文件: {affected_file}")
+        return affected_file
     
-    def generate_cleaning_report(self, user_id_to_remove, backup_dir):
+    def generate_cleaning_report(self, user_ids_to_remove, version, affected_file=None):
         """生成清洗报告"""
-        report_file = os.path.join(self.network_path, f'cleaning_report_{user_id_to_remove}.txt')
+        user_ids = _normalize_user_ids(user_ids_to_remove)
+        report_file = os.path.join(self.network_path, f'cleaning_report_{_label(user_ids)}.txt')
         
         with open(report_file, 'w', encoding='utf-8') as f:
             f.write(f"网络数据清洗报告\n")
             f.write(f"{'='*50}\n")
             f.write(f"清洗时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"目标网络: {self.network_path}\n")
-            f.write(f"清洗用户ID: {user_id_to_remove}\n")
-            f.write(f"备份目录: {backup_dir}\n\n")
+            f.write(f"清洗用户ID: {', '.join(user_ids)}\n")
+            f.write(f"数据版本: {version}（清洗前为版本 {version - 1}）\n\n")
             
             f.write(f"清洗原因:\n")
-            f.write(f"该用户是垃圾节点，与大量用户相连，导致二跳邻居网络异常庞大，\n")
+            f.write(f"{'该用户是' if len(user_ids) == 1 else '这些用户是'}垃圾节点，与大量用户相连，导致二跳邻居网络异常庞大，\n")
             f.write(f"严重影响网络指标计算效率。删除后可显著提升计算性能。\n\n")
             
             f.write(f"生成文件:\n")
-            f.write(f"- new_edges.csv: 清洗后的边数据\n")
-            f.write(f"- new_users.csv: 清洗后的用户数据\n")
-            f.write(f"- new_popularity.csv: 清洗后的流行度数据\n\n")
+            f.write(f"- {self.dataset.delta_path(version, 'nodes_removed')}: 本次删除的用户（数据版本增量）\n")
+            if affected_file:
+                f.write(f"- {os.path.basename(affected_file)}: 二跳网络受影响、需要重算指标的用户\n")
+            f.write(f"原始的edges.csv、users.csv、popularity.csv保持不变，读取时按版本应用增量\n\n")
             
             f.write(f"使用建议:\n")
             f.write(f"1. 检查清洗效果是否符合预期\n")
-            f.write(f"2. 如果满意，可将new_*.csv文件重命名替换原文件\n")
-            f.write(f"3. 重新运行create3.py计算网络指标\n")
-            f.write(f"4. 如有问题，可从备份目录恢复原始数据\n")
+            if affected_file:
+                f.write(f"2. 增量重算网络指标（只重算受影响的用户，其余沿用已有结果）:\n")
+                f.write(f"   python create3.py --resume resume --recompute-users {affected_file} ...\n")
+            else:
+                f.write(f"2. 重新运行create3.py计算网络指标\n")
+            f.write(f"3. 如有问题，回滚到清洗前的版本:\n")
+            f.write(f"   python versioned_dataset.py {self.network_path} rollback {version - 1}\n")
         
         print(f"📋 清洗报告已生成: {report_file}")
     
-    def clean_network(self, user_id_to_remove):
-        """执行完整的网络清洗流程"""
+    def clean_network(self, user_ids_to_remove, confirm=True):
+        """执行完整的网络清洗流程；可一次删除多个用户，结果登记为一个新的数据版本"""
+        user_ids = _normalize_user_ids(user_ids_to_remove)
         print(f"🚀 开始清洗网络数据...")
         print(f"📁 目标网络: {self.network_path}")
-        print(f"🗑️ 要删除的用户: {user_id_to_remove}")
+        print(f"🗑️ 要删除的用户 ({len(user_ids)} 个): {', '.join(user_ids)}")
         
         # 分析影响
-        self.analyze_user_impact(user_id_to_remove)
+        self.analyze_user_impact(user_ids)
         
         # 确认操作
-        print(f"\n⚠️ 即将删除用户 {user_id_to_remove} 的所有相关数据")
-        confirm = input("确认继续？(y/n): ").strip().lower()
-        if confirm != 'y':
-            print("❌ 用户取消操作")
-            return False
-        
-        # 备份原始文件
-        backup_dir = self.backup_original_files()
-        
-        # 执行清洗
-        success = True
-        success &= self.clean_edges_data(user_id_to_remove)
-        success &= self.clean_users_data(user_id_to_remove)
-        success &= self.clean_popularity_data(user_id_to_remove)
-        
-        if success:
-            # 生成报告
-            self.generate_cleaning_report(user_id_to_remove, backup_dir)
-            
-            print(f"\n🎉 网络数据清洗完成！")
-            print(f"📁 清洗后的文件:")
-            print(f"   - new_edges.csv")
-            print(f"   - new_users.csv") 
-            print(f"   - new_popularity.csv")
-            print(f"📁 原始文件备份在: {backup_dir}")
-            print(f"\n💡 使用建议:")
-            print(f"   1. 检查清洗效果是否符合预期")
-            print(f"   2. 如果满意，用new_*.csv替换原始文件")
-            print(f"   3. 重新运行create3.py计算网络指标")
-            print(f"   4. 如有问题，从备份目录恢复原始数据")
-            
-            return True
+        if confirm:
+            print(f"\n⚠️ 即将删除以上 {len(user_ids)} 个用户的所有相关数据")
+            answer = input("确认继续？(y/n): ").strip().lower()
+            if answer != 'y':
+                print("❌ 用户取消操作")
+                return False
+        
+        # 受影响用户列表（供create3.py增量重算），需在清洗前的网络上计算
+        affected_file = self.write_affected_users(user_ids)
+        
+        # 执行清洗：登记新的数据版本
+        version = self.commit_removal(user_ids)
+        
+        # 生成报告
+        self.generate_cleaning_report(user_ids, version, affected_file)
+        
+        print(f"\n🎉 网络数据清洗完成！")
+        print(f"📁 数据版本 {version} 的增量文件: {self.dataset.delta_path(version, 'nodes_removed')}")
+        if affected_file:
+            print(f"📁 受影响用户列表: {affected_file}")
+        print(f"\n💡 使用建议:")
+        print(f"   1. 检查清洗效果是否符合预期")
+        if affected_file:
+            print(f"   2. 增量重算网络指标: python create3.py --resume resume --recompute-users {affected_file} ...")
         else:
-            print(f"❌ 清洗过程中出现错误")
-            return False
+            print(f"   2. 重新运行create3.py计算网络指标")
+        print(f"   3. 如有问题，回滚: python versioned_dataset.py {self.network_path} rollback {version - 1}")
+        
+        return True
+
+def parse_user_ids(text):
+    """把以空格或逗号分隔的用户ID输入解析为列表"""
+    return [part for part in re.split(r'[\s,，]+', text.strip()) if part]
+
+def select_hub_candidates(cleaner):
+    """自动检测模式：列出疑似垃圾枢纽节点，按序号选择要删除的用户"""
+    candidates = cleaner.rank_hub_candidates()
+    if len(candidates) == 0:
+        print(f"❌ 网络中没有节点")
+        return []
+    
+    print(f"\n请输入要删除的候选序号（rank），以空格或逗号分隔，如 1 2 5")
+    print(f"  - 输入 all 表示删除全部非明星候选")
+    choice = input("请选择: ").strip().lower()
+    if choice == 'all':
+        picked = candidates[~candidates['is_celebrity']]
+    else:
+        try:
+            ranks = [int(part) for part in parse_user_ids(choice)]
+        except ValueError:
+            print(f"❌ 输入格式错误，请输入序号")
+            return []
+        picked = candidates[candidates['rank'].isin(ranks)]
+    if picked['is_celebrity'].any():
+        print(f"⚠️ 选中的用户中有明星用户: {', '.join(picked.loc[picked['is_celebrity'], 'user_id'])}")
+    return picked['user_id'].tolist()
 
 def get_user_input():
-    """获取用户输入"""
+    """获取用户输入：网络路径和要删除的用户ID列表"""
     print("="*60)
     print("网络数据清洗工具")
     print("="*60)
@@ -281,17 +298,25 @@ def get_user_input():
         print(f"❌ 路径不存在: {network_path}")
         return None, None
     
-    # 获取要删除的用户ID
-    print(f"\n常见垃圾用户ID:")
-    print(f"  - 2671109275 (微博新手指南)")
-    print(f"  - 可以输入其他发现的垃圾用户ID")
+    print(f"\n选择清洗模式:")
+    print(f"1. 手动输入要删除的用户ID")
+    print(f"2. 自动检测垃圾枢纽节点（按度数、二跳扩张数、明星用户排序）")
+    mode = input("请选择 (1/2，默认1): ").strip() or '1'
+    
+    if mode == '2':
+        user_ids = select_hub_candidates(NetworkDataCleaner(network_path))
+    else:
+        # 获取要删除的用户ID
+        print(f"\n常见垃圾用户ID:")
+        print(f"  - 2671109275 (微博新手指南)")
+        print(f"  - 可以输入其他发现的垃圾用户ID，多个ID以空格或逗号分隔")
+        user_ids = parse_user_ids(input(f"\n请输入要删除的用户ID: "))
     
-    user_id = input(f"\n请输入要删除的用户ID: ").strip()
-    if not user_id:
+    if not user_ids:
         print(f"❌ 用户ID不能为空")
         return None, None
     
-    return network_path, user_id
+    return network_path, user_ids
 
 def main():
     """主函数"""
@@ -299,13 +324,13 @@ def main():
     print(f"网络数据清洗开始时间: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     
     # 获取用户输入
-    network_path, user_id_to_remove = get_user_input()
-    if not network_path or not user_id_to_remove:
+    network_path, user_ids_to_remove = get_user_input()
+    if not network_path or not user_ids_to_remove:
         return
     
     # 执行清洗
     cleaner = NetworkDataCleaner(network_path)
-    success = cleaner.clean_network(user_id_to_remove)
+    success = cleaner.clean_network(user_ids_to_remove)
     
     end_time = datetime.now()
     duration = end_time - start_time
@@ -6,6 +6,11 @@ import pandas as pd
 import requests
 from datetime import datetime
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'core', 'create_ego_network'))
+from network_loader import normalize_ids
+from versioned_dataset import VersionedDataset
 
 # 🎯 配置：与fetch3.py保持一致的参数
 TARGET_NETWORK_PATH = 'C:/Tengfei/data/data/topic_networks/topic_孙颖莎'
@@ -146,7 +151,7 @@ class WeiboTotalPopularityHelper:
         return None
 
 def load_existing_popularity_data(network_path):
-    """加载现有的popularity.csv文件"""
+    """加载现有的popularity数据（当前数据版本：popularity.csv + 各版本的增量）"""
     popularity_file = os.path.join(network_path, 'popularity.csv')
     
     if not os.path.exists(popularity_file):
@@ -154,7 +159,7 @@ def load_existing_popularity_data(network_path):
         return None
     
     try:
-        popularity_df = pd.read_csv(popularity_file)
+        popularity_df = VersionedDataset(network_path).load_popularity()
         print(f"✅ 成功加载popularity.csv，包含 {len(popularity_df)} 个用户")
         
         # 检查现有列
@@ -206,21 +211,10 @@ def load_progress(network_path):
         return {}
 
 def update_popularity_csv(original_df, processed_data, network_path):
-    """更新popularity.csv文件，添加avg_popularity_of_all列"""
-    # 创建备份
-    backup_dir = os.path.join(network_path, 'backup')
-    os.makedirs(backup_dir, exist_ok=True)
-    
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = os.path.join(backup_dir, f'popularity_backup_{timestamp}.csv')
-    original_df.to_csv(backup_file, index=False, encoding='utf-8-sig')
-    print(f"✅ 原始popularity.csv已备份: {backup_file}")
-    
-    # 复制原始数据
-    updated_df = original_df.copy()
-    
-    # 🔥 关键修复：统一数据类型为字符串，解决类型匹配问题
-    updated_df['user_id'] = updated_df['user_id'].astype(str)
+    """为popularity添加avg_popularity_of_all列：登记为新的数据版本（只写 user_id + 新列 的增量文件），
+    不备份、不重写popularity.csv"""
+    # 只保留用户ID，构造增量（未处理的用户为0.0）
+    updated_df = pd.DataFrame({'user_id': normalize_ids(original_df['user_id']).values})
     
     # 添加新列
     updated_df['avg_popularity_of_all'] = 0.0
@@ -262,14 +256,15 @@ def update_popularity_csv(original_df, processed_data, network_path):
     print(f"  ❌ 更新失败: {failed_updates}/{total_updates}")
     print(f"  📊 成功率: {successful_updates/total_updates*100:.1f}%")
     
-    # 保存更新后的文件
-    popularity_file = os.path.join(network_path, 'popularity.csv')
-    updated_df.to_csv(popularity_file, index=False, encoding='utf-8-sig')
-    print(f"✅ 更新后的popularity.csv已保存: {popularity_file}")
+    # 登记为新的数据版本
+    dataset = VersionedDataset(network_path)
+    version = dataset.commit("补充总体影响力 avg_popularity_of_all", popularity_updates=updated_df)
+    print(f"✅ 总体影响力已登记为数据版本 {version}: {dataset.delta_path(version, 'popularity_updates')}")
+    print(f"   如需撤销: python versioned_dataset.py {network_path} rollback {version - 1}")
     
     # 🔥 新增：强制验证写入结果
     print(f"\n🔍 验证写入结果...")
-    verification_df = pd.read_csv(popularity_file)
+    verification_df = dataset.load_popularity()
     non_zero_count = (verification_df['avg_popularity_of_all'] > 0).sum()
     total_count = len(verification_df)
     
@@ -293,19 +288,19 @@ def update_popularity_csv(original_df, processed_data, network_path):
     # 显示统计信息
     if non_zero_count > 0:
         print(f"\n📊 影响力对比（基于成功更新的数据）:")
-        if 'avg_popularity' in updated_df.columns:
-            mask_valid = updated_df['avg_popularity_of_all'] > 0
-            valid_data = updated_df[mask_valid]
+        if 'avg_popularity' in verification_df.columns:
+            mask_valid = verification_df['avg_popularity_of_all'] > 0
+            valid_data = verification_df[mask_valid]
             
             if len(valid_data) > 0:
                 print(f"  📊 最新10条平均影响力: {valid_data['avg_popularity'].mean():.2f}")
                 print(f"  📊 总体平均影响力: {valid_data['avg_popularity_of_all'].mean():.2f}")
                 
                 # 统计为0的情况
-                zero_recent = (updated_df['avg_popularity'] == 0).sum()
-                zero_total = (updated_df['avg_popularity_of_all'] == 0).sum()
-                print(f"  📊 最新10条影响力为0的用户: {zero_recent} 个 ({zero_recent/len(updated_df)*100:.1f}%)")
-                print(f"  📊 总体影响力为0的用户: {zero_total} 个 ({zero_total/len(updated_df)*100:.1f}%)")
+                zero_recent = (verification_df['avg_popularity'] == 0).sum()
+                zero_total = (verification_df['avg_popularity_of_all'] == 0).sum()
+                print(f"  📊 最新10条影响力为0的用户: {zero_recent} 个 ({zero_recent/len(verification_df)*100:.1f}%)")
+                print(f"  📊 总体影响力为0的用户: {zero_total} 个 ({zero_total/len(verification_df)*100:.1f}%)")
     
     # 清理进度文件
     progress_file = os.path.join(network_path, 'helper_progress.json')
@@ -322,7 +317,7 @@ def main():
     print(f"🎯 目标网络: {TARGET_NETWORK_PATH}")
     print(f"🔍 任务: 为所有用户补充avg_popularity_of_all（总转赞评/总发帖数）")
     print(f"📊 数据源: weibo.com用户资料页")
-    print(f"🔄 特性: 断点续传、自动备份、进度保存")
+    print(f"🔄 特性: 断点续传、数据版本（可回滚）、进度保存")
     print(f"⚡ 速度参数: 与fetch3.py保持一致")
     print("=" * 80)
     
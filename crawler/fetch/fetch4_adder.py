@@ -12,6 +12,9 @@ from selenium.webdriver.chrome.options import Options
 from datetime import datetime
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'core', 'create_ego_network'))
+from versioned_dataset import VersionedDataset
+
 # 基本配置
 BASE_OUTPUT_DIR = 'C:/Tengfei/data/data/topic_networks'
 COOKIE_PATH = 'C:/Tengfei/data/crawler/crawler_for_weibo_fans-master/cookie.json'
@@ -43,6 +46,8 @@ class TagAdderCrawler:
         self.existing_nodes = set()
         self.edges_data = []    # 现有网络的边（用于追加后写回）
         self.edges_set = set()
+        self.loaded_edge_count = 0  # 载入时的边数，之后追加的为新增边
+        self.loaded_popularity = {}  # 载入时的影响力，写回时只登记新增/变化的行
         self.popularity_map = {}  # 现有 popularity 映射 user_id -> avg_popularity
         self.users_df = None      # 现有 users.csv（若存在）
         self.network_dir = None
@@ -340,34 +345,29 @@ def collect_topic_users(crawler: TagAdderCrawler, topic: str, target: int, thres
 def load_existing_network(crawler: TagAdderCrawler, network_dir: str):
     crawler.network_dir = network_dir
     edges_path = os.path.join(network_dir, 'edges.csv')
-    users_path = os.path.join(network_dir, 'users.csv')
-    popularity_path = os.path.join(network_dir, 'popularity.csv')
 
     if not os.path.exists(edges_path):
         raise FileNotFoundError(f"未找到edges.csv: {edges_path}")
 
-    edges_df = pd.read_csv(edges_path)
-    crawler.edges_data = []
-    crawler.edges_set = set()
-    for _, row in edges_df.iterrows():
-        s = str(row['source']); t = str(row['target'])
-        crawler.edges_data.append((s, t))
-        crawler.edges_set.add((s, t))
-
-    existing_nodes = set(edges_df['source'].astype(str)).union(set(edges_df['target'].astype(str)))
-    if os.path.exists(users_path):
-        users_df = pd.read_csv(users_path)
-        users_df['user_id'] = users_df['user_id'].astype(str)
+    # 当前数据版本：基线文件 + 各版本的增量
+    dataset = VersionedDataset(network_dir)
+    table = dataset.load_edges(deduplicate=False)
+    crawler.edges_data = list(zip(table.node_ids[table.source].tolist(), table.node_ids[table.target].tolist()))
+    crawler.edges_set = set(crawler.edges_data)
+    crawler.loaded_edge_count = len(crawler.edges_data)
+
+    existing_nodes = set(table.node_ids.tolist())
+    users_df = dataset.load_users()
+    if users_df is not None:
         crawler.users_df = users_df
-        existing_nodes |= set(users_df['user_id'].astype(str))
+        existing_nodes |= set(users_df['user_id'])
     crawler.existing_nodes = existing_nodes
 
     crawler.popularity_map = {}
-    if os.path.exists(popularity_path):
-        pop_df = pd.read_csv(popularity_path)
-        if 'user_id' in pop_df.columns and 'avg_popularity' in pop_df.columns:
-            for _, r in pop_df.iterrows():
-                crawler.popularity_map[str(r['user_id'])] = float(r['avg_popularity'])
+    pop_df = dataset.load_popularity()
+    if pop_df is not None and 'avg_popularity' in pop_df.columns:
+        crawler.popularity_map = dict(zip(pop_df['user_id'], pop_df['avg_popularity'].astype(float)))
+    crawler.loaded_popularity = dict(crawler.popularity_map)
 
     print(f"📥 已加载现有网络: 节点≈{len(existing_nodes)}，边 {len(crawler.edges_data)}")
 
@@ -379,19 +379,23 @@ def save_new_tag_users_map(mapping: dict, output_dir: str):
     print(f"📝 已保存新标签用户映射: {out_path}")
 
 def write_back_network(crawler: TagAdderCrawler):
-    """将追加后的边与人气写回现有网络目录"""
-    edges_df = pd.DataFrame(crawler.edges_data, columns=['source', 'target'])
-    edges_path = os.path.join(crawler.network_dir, 'edges.csv')
-    edges_df.to_csv(edges_path, index=False, encoding='utf-8-sig')
-
-    # popularity.csv 追加/覆盖（以map为准）
-    pop_items = sorted(crawler.popularity_map.items(), key=lambda x: x[0])
-    pop_df = pd.DataFrame(pop_items, columns=['user_id', 'avg_popularity'])
-    pop_path = os.path.join(crawler.network_dir, 'popularity.csv')
-    pop_df.to_csv(pop_path, index=False, encoding='utf-8-sig')
-
-    print(f"💾 已写回 edges.csv 与 popularity.csv 到: {crawler.network_dir}")
-    print(f"   边总数: {len(crawler.edges_data)}，影响力用户数: {len(crawler.popularity_map)}")
+    """把追加的边与新增/变化的人气登记为现有网络目录的新数据版本（只写增量文件，不重写edges.csv/popularity.csv）"""
+    new_edges = crawler.edges_data[crawler.loaded_edge_count:]
+    pop_updates = sorted((uid, value) for uid, value in crawler.popularity_map.items()
+                         if crawler.loaded_popularity.get(uid) != value)
+
+    dataset = VersionedDataset(crawler.network_dir)
+    version = dataset.commit(
+        f"整合新人: 新增边 {len(new_edges)} 条",
+        edges_added=pd.DataFrame(new_edges, columns=['source', 'target']),
+        popularity_updates=pd.DataFrame(pop_updates, columns=['user_id', 'avg_popularity']))
+
+    print(f"💾 已登记数据版本 {version} 到: {crawler.network_dir}")
+    print(f"   边总数: {len(crawler.edges_data)}（新增 {len(new_edges)}），影响力用户数: {len(crawler.popularity_map)}（更新 {len(pop_updates)}）")
+    if new_edges:
+        # 新增边的增量文件可直接供create3.py增量重算（--edge-delta），或用 --since-version 与上一版本比较
+        print(f"   新增边: {dataset.delta_path(version, 'edges_added')}")
+        print(f"   如需撤销: python versioned_dataset.py {crawler.network_dir} rollback {version - 1}")
 
 def integrate_new_users_to_network(crawler: TagAdderCrawler, new_user_ids: list):
     """为新人在现网中补充“粉丝边：被关注者→粉丝（博主→粉丝）”，并按需写入影响力"""
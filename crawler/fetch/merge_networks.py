@@ -1,8 +1,13 @@
 import os
+import sys
 import json
 import pandas as pd
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'core', 'create_ego_network'))
+from network_loader import normalize_id
+from versioned_dataset import VersionedDataset
+
 # 配置
 BASE_DIR = 'C:/Tengfei/data/data/domain_networks'
 OUTPUT_DIR = f'{BASE_DIR}/merged_network'
@@ -27,39 +32,30 @@ def merge_networks(user_ids):
         user_dir = f'{BASE_DIR}/user_{user_id}'
         
         print(f"处理用户 {user_id} 的网络数据...")
+        # 版本化网络目录：读取时应用清洗、补边等增量，已删除的节点不会被合并回来
+        dataset = VersionedDataset(user_dir)
+        if dataset.versions():
+            print(f"  数据版本: {dataset.current_version}（共 {dataset.latest_version} 个版本）")
         
         # 加载用户数据
-        users_file = f'{user_dir}/users.csv'
-        if os.path.exists(users_file):
-            users_df = pd.read_csv(users_file)
-            for _, row in users_df.iterrows():
-                uid = str(row['user_id'])
-                # 构建用户数据字典
-                user_data = {col: row[col] for col in users_df.columns if col != 'user_id'}
-                # 更新或添加用户数据
-                all_users[uid] = user_data
+        users_df = dataset.load_users()
+        if users_df is not None:
+            # 更新或添加用户数据（同一ID以后出现的记录为准）
+            all_users.update(users_df.drop_duplicates('user_id', keep='last').set_index('user_id').to_dict('index'))
             print(f"  已加载 {len(users_df)} 个用户")
         
         # 加载边数据
-        edges_file = f'{user_dir}/edges.csv'
-        if os.path.exists(edges_file):
-            edges_df = pd.read_csv(edges_file)
-            for _, row in edges_df.iterrows():
-                # 添加边(作为元组，确保唯一性)
-                edge = (str(row['source']), str(row['target']))
-                all_edges.add(edge)
-            print(f"  已加载 {len(edges_df)} 条边")
+        if os.path.exists(dataset.edges_file):
+            table = dataset.load_edges(deduplicate=False)
+            # 添加边(作为元组，确保唯一性)
+            all_edges.update(zip(table.node_ids[table.source], table.node_ids[table.target]))
+            print(f"  已加载 {len(table.source)} 条边")
         
         # 加载流行度数据
-        popularity_file = f'{user_dir}/popularity.csv'
-        if os.path.exists(popularity_file):
-            pop_df = pd.read_csv(popularity_file)
-            for _, row in pop_df.iterrows():
-                uid = str(row['user_id'])
-                # 构建流行度数据字典
-                pop_data = {col: row[col] for col in pop_df.columns if col != 'user_id'}
-                # 更新或添加流行度数据
-                all_popularity[uid] = pop_data
+        pop_df = dataset.load_popularity()
+        if pop_df is not None:
+            # 更新或添加流行度数据（同一ID以后出现的记录为准）
+            all_popularity.update(pop_df.drop_duplicates('user_id', keep='last').set_index('user_id').to_dict('index'))
             print(f"  已加载 {len(pop_df)} 条流行度数据")
         
         # 加载节点类别
@@ -67,9 +63,10 @@ def merge_networks(user_ids):
         if os.path.exists(categories_file):
             with open(categories_file, 'r', encoding='utf-8') as f:
                 categories = json.load(f)
-                # 合并类别
+                # 合并类别（排除清洗时删除的节点）
+                removed = dataset.removed_users()
                 for category, nodes in categories.items():
-                    all_categories[category].update(nodes)
+                    all_categories[category].update(node for node in nodes if normalize_id(node) not in removed)
             print(f"  已加载节点类别数据")
     
     # 确保输出目录存在
@@ -8,6 +8,11 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from datetime import datetime
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'core', 'create_ego_network'))
+from network_loader import normalize_ids
+from versioned_dataset import VersionedDataset
 
 # 🎯 配置：匹配fetch3.py的设置
 TARGET_NETWORK_PATH = 'C:/Tengfei/data/data/domain_network3/user_3855570307'
@@ -203,11 +208,8 @@ def load_network_data(network_path):
     print(f"📁 加载网络数据:")
     print(f"  - 边数据: {edges_file}")
     
-    edges_df = pd.read_csv(edges_file)
-    
-    # 转换为字符串类型确保一致性
-    edges_df['source'] = edges_df['source'].astype(str)
-    edges_df['target'] = edges_df['target'].astype(str)
+    # 当前数据版本的边（edges.csv + 各版本的增量），ID已规范化为字符串
+    edges_df = VersionedDataset(network_path).edges_frame()
     
     print(f"  📊 边数据: {len(edges_df)} 条边")
     
@@ -288,46 +290,31 @@ def load_progress(network_path):
         return set(), []
 
 def save_final_results(original_edges_df, new_edges, network_path):
-    """保存最终结果"""
+    """保存最终结果：新发现的边登记为新的数据版本（只写新增边的增量文件），不备份、不重写edges.csv"""
     if not new_edges:
         print("✅ 没有发现新边，无需更新edges.csv")
         return
     
-    # 创建新边的DataFrame
+    # 创建新边的DataFrame，去掉重复边和已在网络中的边
     new_edges_df = pd.DataFrame(new_edges, columns=['source', 'target'])
-    
-    # 合并原有边和新边
-    updated_edges_df = pd.concat([original_edges_df, new_edges_df], ignore_index=True)
-    
-    # 去重（防止重复边）
-    before_dedup = len(updated_edges_df)
-    updated_edges_df = updated_edges_df.drop_duplicates()
-    after_dedup = len(updated_edges_df)
-    
-    if before_dedup > after_dedup:
-        print(f"⚠️ 去重: {before_dedup} → {after_dedup} (-{before_dedup-after_dedup}条重复边)")
-    
-    # 保存备份
-    backup_dir = os.path.join(network_path, 'backup')
-    os.makedirs(backup_dir, exist_ok=True)
-    
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = os.path.join(backup_dir, f'edges_backup_{timestamp}.csv')
-    original_edges_df.to_csv(backup_file, index=False, encoding='utf-8-sig')
-    print(f"✅ 原始edges已备份: {backup_file}")
-    
-    # 保存更新后的edges
-    edges_file = os.path.join(network_path, 'edges.csv')
-    updated_edges_df.to_csv(edges_file, index=False, encoding='utf-8-sig')
-    print(f"✅ 更新后的edges已保存: {edges_file}")
+    new_edges_df = pd.DataFrame({'source': normalize_ids(new_edges_df['source']).values,
+                                 'target': normalize_ids(new_edges_df['target']).values}).drop_duplicates()
+    merged = new_edges_df.merge(original_edges_df[['source', 'target']].drop_duplicates(),
+                                on=['source', 'target'], how='left', indicator=True)
+    new_edges_df = new_edges_df[(merged['_merge'] == 'left_only').values]
+    if len(new_edges_df) < len(new_edges):
+        print(f"⚠️ 去重: {len(new_edges)} → {len(new_edges_df)} (-{len(new_edges)-len(new_edges_df)}条重复或已存在的边)")
+    
+    dataset = VersionedDataset(network_path)
+    version = dataset.commit(f"补充遗漏的边 {len(new_edges_df)} 条", edges_added=new_edges_df)
+    new_edges_file = dataset.delta_path(version, 'edges_added')
+    print(f"✅ 新增边已登记为数据版本 {version}")
     print(f"  📊 原始边数: {len(original_edges_df)}")
-    print(f"  📊 新增边数: {len(new_edges)}")
-    print(f"  📊 最终边数: {len(updated_edges_df)}")
-    
-    # 保存新边详情
-    new_edges_file = os.path.join(network_path, f'new_edges_found_{timestamp}.csv')
-    new_edges_df.to_csv(new_edges_file, index=False, encoding='utf-8-sig')
+    print(f"  📊 新增边数: {len(new_edges_df)}")
+    print(f"  📊 最终边数: {len(original_edges_df) + len(new_edges_df)}")
     print(f"✅ 新发现边的详情: {new_edges_file}")
+    print(f"💡 增量重算指标: python create3.py --resume resume --since-version {version - 1} ...（只重算二跳网络受影响的用户）")
+    print(f"💡 如需撤销: python versioned_dataset.py {network_path} rollback {version - 1}")
     
     # 删除进度文件
     progress_file = os.path.join(network_path, 'refind_progress.json')
@@ -346,7 +333,7 @@ def main():
     print(f"🚀 处理方法: 重新爬取这些用户的粉丝列表，补充遗漏的边")
     print(f"🛡️ 边过滤: 只添加指向网络中已有用户的边，严格保持网络边界")
     print(f"🔄 断点续传: 支持中断后继续")
-    print(f"💾 数据安全: 自动备份原始edges.csv")
+    print(f"💾 数据安全: 新增边登记为新的数据版本，原始edges.csv不变，可回滚")
     print(f"🔥 修复内容: 只分析edges网络中的用户，不包含users.csv中的冗余D类用户")
     print("=" * 80)
     
@@ -549,7 +536,7 @@ def main():
         
         if len(new_edges) > 0:
             print(f"🎉 发现 {len(new_edges)} 条遗漏的边！")
-            print(f"📊 这些边已补充到edges.csv中")
+            print(f"📊 这些边已作为新的数据版本补充到网络中")
             print(f"💡 说明：之前的爬取过程中确实存在遗漏")
         else:
             print(f"✅ 没有发现遗漏的边")